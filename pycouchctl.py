@@ -2,47 +2,181 @@
 
 import json
 import argparse
-from typing import Dict, Any
+import gzip
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain
+from typing import BinaryIO, Deque, Dict, Any, Iterator, List, Optional, Tuple
 from pycouchdb.client import Client
+from pycouchdb.json import Json
+from pycouchdb.stream import RowParser
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
+READ_SIZE = 1024 * 1024
+SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
 
-def load(db_name:str, client: Client):
-    with open(f'{db_name}.json', 'r') as jfile:
-        db_data = json.load(jfile)
-        if db_name in client:
-            client.delete(db_name)
-        client.create(db_name)
-        db = client.get_db(db_name)
-        print(f'Restoring {db_name}')
-        for doc in db_data[db_name]:
-            db.add(doc)
 
+def dump_path(db_name:str, compress:Optional[str] = None) -> str:
+    return f'{db_name}.ndjson{SUFFIXES[compress]}'
 
-def dump(db_name:str, client: Client):
+
+def open_dump(path:str, mode:str) -> BinaryIO:
+    """Open dump file, compression is chosen by file suffix, mode is 'rb' or 'wb'"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, compresslevel=6)
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise SystemExit('zstd compression requires zstandard module')
+        fh = open(path, mode)
+        if mode == 'wb':
+            return zstandard.ZstdCompressor(threads=-1).stream_writer(fh)
+        return zstandard.ZstdDecompressor().stream_reader(fh)
+    return open(path, mode)
+
+
+def read_docs(db_name:str) -> Iterator[Dict[str, Any]]:
+    """Yield documents from ndjson dump (plain, .gz or .zst) or from json dump"""
+    for compress in SUFFIXES:
+        if os.path.exists(path := dump_path(db_name, compress)):
+            with open_dump(path, 'rb') as fh:
+                rest = b''
+                while data := fh.read(READ_SIZE):
+                    lines = (rest + data).split(b'\n')
+                    rest = lines.pop()
+                    for line in lines:
+                        if line.strip():
+                            yield Json.loads(line)
+                if rest.strip():
+                    yield Json.loads(rest)
+            return
+
+    with open(f'{db_name}.json', 'rb') as jfile:
+        parser = RowParser(keys=(db_name,))
+        while data := jfile.read(READ_SIZE):
+            yield from parser.feed(data)
+        parser.close()
+
+
+def load(db_name:str, client: Client, chunk_size:int = 1000, workers:int = 4, preserve_revs:bool = False):
+    """Restore database from dump, file is parsed in chunks and documents are
+    sent with _bulk_docs by pool of workers"""
+    # dump is opened and first document parsed before existing database is deleted,
+    # so missing or broken dump does not drop it
+    docs = read_docs(db_name)
+    first = next(docs, None)
+    if db_name in client:
+        client.delete(db_name)
+    client.create(db_name)
+    db = client.get_db(db_name)
+    print(f'Restoring {db_name}')
+
+    def send(docs: List[Dict[str, Any]]) -> int:
+        ret = db.add_many(docs, new_edits=not preserve_revs)
+        return len([result for result in ret if 'error' in result])
+
+    pending: Deque[Tuple[Future, int]] = deque()
+    stored = errors = 0
+    start = time.monotonic()
+
+    def wait_oldest():
+        nonlocal stored, errors
+        future, count = pending.popleft()
+        errors += future.result()
+        stored += count
+        elapsed = time.monotonic() - start
+        print(f'\r{db_name}: {stored} docs, {stored / elapsed:.0f} docs/s', end='', flush=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        chunk: List[Dict[str, Any]] = []
+        for doc in chain([first] if first is not None else [], docs):
+            if not preserve_revs:
+                doc.pop('_rev', None)
+            chunk.append(doc)
+            if len(chunk) >= chunk_size:
+                pending.append((executor.submit(send, chunk), len(chunk)))
+                chunk = []
+                # keep only few chunks in memory
+                while len(pending) > workers * 2:
+                    wait_oldest()
+        if chunk:
+            pending.append((executor.submit(send, chunk), len(chunk)))
+        while pending:
+            wait_oldest()
+    print(f'\r{db_name}: {stored} docs in {time.monotonic() - start:.1f}s, {errors} errors')
+
+
+def dump(db_name:str, client: Client, preserve_revs:bool = False):
     print(f'Dump database: {db_name} to file {db_name}.json')
     _data: Dict[str, Any] = {db_name: []}
     db = client.get_db(db_name)
     for doc_id in db:
         doc = db[doc_id]
-        del doc['_rev']
+        if not preserve_revs:
+            del doc['_rev']
         _data[db_name].append(doc)
     
     with open(f'{db_name}.json', 'w') as jfile:
         json.dump(_data, jfile, indent=4)
 
 
+def dump_ndjson(db_name:str, client: Client, compress:Optional[str] = None,
+                preserve_revs:bool = False, page_size:int = 1000):
+    """Dump database to newline delimited json, documents are read page by page
+    from _all_docs and written as they arrive"""
+    path = dump_path(db_name, compress)
+    print(f'Dump database: {db_name} to file {path}')
+    db = client.get_db(db_name)
+    count = 0
+    start = time.monotonic()
+    with open_dump(path, 'wb') as fh:
+        for doc in db.get_all_docs(page_size=page_size):
+            if not preserve_revs:
+                doc.pop('_rev', None)
+            fh.write(Json.dumps(doc).encode() + b'\n')
+            count += 1
+    elapsed = time.monotonic() - start
+    size = os.path.getsize(path) / 1024 / 1024
+    print(f'{db_name}: {count} docs, {size:.1f} MB in {elapsed:.1f}s, {count / max(elapsed, 1e-6):.0f} docs/s')
+
+
+def dump_ndjson_many(db_names:List[str], client: Client, compress:Optional[str] = None,
+                     preserve_revs:bool = False, jobs:int = 1):
+    """Dump databases to ndjson files, jobs databases are dumped in parallel"""
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for job in [executor.submit(dump_ndjson, db_name, client, compress, preserve_revs)
+                    for db_name in db_names]:
+            job.result()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(usage='%(prog)s [options] [packages]')
     parser.add_argument('dbs', nargs='*')
     parser.add_argument('-u', '--url', help='url sever')
     parser.add_argument('-d', '--dump', action="store_true", help="Dump database to json file")
     parser.add_argument('-r', '--restore', action="store_true", help="Restore database from json file")
+    parser.add_argument('-c', '--chunk-size', type=int, default=1000, help="Documents in one _bulk_docs request")
+    parser.add_argument('-w', '--workers', type=int, default=4, help="Concurrent _bulk_docs requests")
+    parser.add_argument('--preserve-revs', action="store_true",
+                        help="Keep _rev in dump and restore with new_edits=false")
+    parser.add_argument('--ndjson', action="store_true",
+                        help="Dump to newline delimited json file, restore detects it by file name")
+    parser.add_argument('-z', '--compress', choices=['gzip', 'zstd'], help="Compression of ndjson dump")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="Databases dumped in parallel")
     
     args = parser.parse_args()
     client = Client(args.url)
-    if args.dump:
+    if args.dump and (args.ndjson or args.compress):
+        dump_ndjson_many(args.dbs, client, compress=args.compress, preserve_revs=args.preserve_revs,
+                         jobs=args.jobs)
+    elif args.dump:
         for db_name in args.dbs:
-            dump(db_name, client)
+            dump(db_name, client, preserve_revs=args.preserve_revs)
     elif args.restore:
         for db_name in args.dbs:
-            load(db_name, client)
\ No newline at end of file
+            load(db_name, client, chunk_size=args.chunk_size, workers=args.workers,
+                 preserve_revs=args.preserve_revs)
\ No newline at end of file
@@ -17,6 +17,8 @@ __version__ = "0.4"
 __all__ = [
     'Server',
     'Client',
+    'AsyncClient',
+    'AsyncDatabase',
     'Document',
     'Database',
     'UrllibConn',
@@ -26,6 +28,8 @@ __all__ = [
 
 from .server import Server
 from .client import Client
+from .asyncclient import AsyncClient
+from .asyncdb import AsyncDatabase
 from .db import Database
 from .doc import Document
 from .exceptions import ServerError, DatabaseError, DocumentError
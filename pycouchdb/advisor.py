@@ -0,0 +1,160 @@
+from __future__ import annotations
+import warnings
+from .exceptions import DatabaseError, IndexWarning
+from .json import Json
+from .query import FindQuery, IndexQuery
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .db import Database
+
+
+class QueryAdvice:
+    """Result of IndexAdvisor check
+
+    Attributes:
+        index (dict): index chosen by server (index from _explain)
+        full_scan (bool): query is answered from _all_docs
+        partial (bool): chosen index does not cover all fields of selector
+        uncovered (list): selector and sort fields which are not in chosen index
+        use_index (list): existing index [ddoc, name] covering query which was not chosen
+        proposed (IndexQuery): index which would cover query, None when it is covered
+    """
+    def __init__(self, index: Dict[str, Any], uncovered: List[str],
+                 use_index: Optional[List[str]] = None, proposed: Optional[IndexQuery] = None) -> None:
+        self.index = index
+        self.full_scan = index.get('type') == 'special'
+        self.partial = not self.full_scan and bool(uncovered)
+        self.uncovered = uncovered
+        self.use_index = use_index
+        self.proposed = proposed
+
+    @property
+    def ok(self) -> bool:
+        return not (self.full_scan or self.partial)
+
+    @property
+    def message(self) -> str:
+        if self.ok:
+            return f"Query uses index {self.index.get('name')}"
+        if self.full_scan:
+            ret = 'Query scans _all_docs'
+        else:
+            ret = f"Index {self.index.get('name')} does not cover fields {', '.join(self.uncovered)}"
+        if self.use_index:
+            ret += f", existing index {'/'.join(self.use_index)} covers it, set use_index"
+        elif self.proposed is not None:
+            ret += f", proposed index on {', '.join(self.proposed.fields)}"
+        return ret
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class IndexAdvisor:
+    """Checks with _explain which index is used by FindQuery and compares
+    selector and sort fields with indexes of database. Query answered from
+    _all_docs or from index covering only part of selector is reported
+    with IndexWarning, or DatabaseError in strict mode. Result is remembered
+    for every shape of query (fields, sort and use_index), so after first
+    check it costs nothing.
+
+    Args:
+        db (Database): database
+        strict (bool): raise DatabaseError instead of warning
+
+    Example:
+        >>> db.advisor = IndexAdvisor(db, strict=True)
+        >>> db.find(query)  # raises DatabaseError for full scan
+        >>> advice = db.advisor.advise(query)
+        >>> db.set_index(advice.proposed)
+    """
+    def __init__(self, db: Database, strict: bool = False) -> None:
+        self.db = db
+        self.strict = strict
+        self._checked: Dict[str, QueryAdvice] = {}
+
+    def advise(self, query: FindQuery) -> QueryAdvice:
+        """Explain query and compare it with indexes of database
+
+        Returns:
+            QueryAdvice: chosen index and proposed one
+        """
+        plan = self.db.explain(query)
+        indexes = self.db.get_indexes().get('indexes', [])
+        return analyze(query, plan.get('index', {}), indexes)
+
+    def check(self, query: FindQuery) -> QueryAdvice:
+        """Advise query once per its shape and warn or raise when it is not covered by index
+
+        Raises:
+            DatabaseError: in strict mode when query is not covered
+        """
+        key = Json.dumps([sorted(selector_fields(query.selector)), sort_fields(query.sort), query.use_index])
+        if (advice := self._checked.get(key)) is None:
+            advice = self._checked[key] = self.advise(query)
+        if not advice.ok:
+            if self.strict:
+                raise DatabaseError(messeage=advice.message)
+            warnings.warn(advice.message, IndexWarning, stacklevel=3)
+        return advice
+
+    def clear(self) -> None:
+        """Forget checked queries, e.g. after creating index"""
+        self._checked.clear()
+
+
+def analyze(query: FindQuery, index: Dict[str, Any], indexes: List[Dict[str, Any]]) -> QueryAdvice:
+    """Compare query with chosen index (from _explain) and list of indexes (from _index)"""
+    fields = selector_fields(query.selector)
+    sort = sort_fields(query.sort)
+    wanted = list(dict.fromkeys(list(fields) + sort))
+    index_fields = _index_fields(index)
+    uncovered = [field for field in wanted if field not in index_fields]
+    if index.get('type') != 'special' and not uncovered:
+        return QueryAdvice(index, [])
+
+    # existing json index over all fields which server did not choose
+    for candidate in indexes:
+        if candidate.get('type') == 'json' and candidate.get('name') != index.get('name'):
+            candidate_fields = _index_fields(candidate)
+            if set(wanted) <= set(candidate_fields) and set(candidate_fields) <= set(fields):
+                return QueryAdvice(index, uncovered, use_index=[candidate.get('ddoc', ''), candidate.get('name', '')])
+
+    proposed = IndexQuery()
+    # equality fields first, then sort fields, range fields at the end
+    equal = [field for field, equality in fields.items() if equality]
+    ranged = [field for field, equality in fields.items() if not equality]
+    proposed.fields = list(dict.fromkeys(equal + sort + ranged))
+    proposed.name = '-'.join(proposed.fields).replace('.', '_')
+    return QueryAdvice(index, uncovered, proposed=proposed if proposed.fields else None)
+
+
+def selector_fields(selector: Dict[str, Any], prefix: str = '') -> Dict[str, bool]:
+    """Fields of selector which can be used by index
+
+    Returns:
+        dict: field name and True when field is compared for equality
+    """
+    ret: Dict[str, bool] = {}
+    for key, value in selector.items():
+        if key == '$and':
+            for sub in value:
+                ret.update(selector_fields(sub, prefix))
+        elif key.startswith('$'):
+            # $or, $nor, $not can not be answered from index range
+            continue
+        elif isinstance(value, dict) and value and not any(sub.startswith('$') for sub in value):
+            ret.update(selector_fields(value, f'{prefix}{key}.'))
+        else:
+            ret[f'{prefix}{key}'] = not isinstance(value, dict) or list(value) == ['$eq']
+    return ret
+
+
+def sort_fields(sort: List[Any]) -> List[str]:
+    return [item if isinstance(item, str) else next(iter(item)) for item in sort]
+
+
+def _index_fields(index: Dict[str, Any]) -> List[str]:
+    return [field if isinstance(field, str) else next(iter(field))
+            for field in index.get('def', {}).get('fields', [])]
@@ -0,0 +1,371 @@
+# Copyright 2019 - 2021 AngrySoft Sebastian Zwierzchowski
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from __future__ import annotations
+import asyncio
+import random
+from .connections import AsyncConnection
+from .exceptions import DatabaseError
+from .json import Json
+from .query import FindQuery
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+
+class AsyncDatabase:
+
+    def __init__(self, name:str, connection: AsyncConnection):
+        """Class for db operations in asyncio code, mirror of pycouchdb.db.Database
+
+        Args:
+            name (str): Database name
+            connection (AsyncConnection): instance of async connection to server
+        """
+        self.conn = connection
+        self.name = name
+
+    async def doc_info(self, doc_id:str) -> Dict[str, Any]:
+        """Minimal amount of information about the specified document.
+
+        Args:
+            docid (str): Document ID.
+
+        Returns:
+            dict: Dictionary with keys rev - revision, size - size of document , date
+
+        Raises:
+            DatabaseError
+        """
+
+        if (resp := await self.conn.head(path=f'{self.name}/{doc_id}')).status in (200, 304):
+            return {'rev': resp.get_headers().get('ETag', '').strip('"'),
+                    'size': resp.get_headers().get('Content-Length'),
+                    'date': resp.get_headers().get('Date')}
+        else:
+            raise DatabaseError(resp.status)
+
+    async def add(self, doc:Dict[Any, Any]) -> Tuple[str, str]:
+        """Creates a new document in database
+
+        Args:
+            doc (dict): Document ID.
+
+        Returns:
+            tuple: document id, revision
+
+        Raises:
+            DatabaseError
+        """
+
+        if type(doc.get('_id', '')) is not str:
+            raise DatabaseError("_id: need to be a str")
+
+        if (resp := await self.conn.post(path=self.name, data=doc)).status in (201, 202):
+            ret = resp.get_data()
+            return ret.get('id'), ret.get('rev')
+        else:
+            raise DatabaseError(resp.status)
+
+    async def add_many(self, docs: List[Dict[Any, Any]]):
+        resp = await self.conn.post(path=f'{self.name}/_bulk_docs', data={'docs': docs})
+        if resp.status == 201:
+            return resp.get_data()
+        elif resp.status == 400:
+            raise DatabaseError(messeage='The request provided invalid JSON data')
+        else:
+            raise DatabaseError(resp.status)
+
+    async def get(self, doc_id:str, attachments:bool=False, att_encoding_info:bool=False, rev: str = '') -> Dict[str, Any]:
+        """Get document by id
+
+        Args:
+            doc_id (str): Document ID
+            attachments (bool): Includes attachments bodies in response.Default is false
+            att_encoding_info (bool): Includes encoding
+            rev (str): Retrieves document of specified revision
+
+        Returns:
+            dict: Document, empty dict if document doesn't exists
+
+        Raises:
+            DatabaseError
+        """
+        query: Dict[str, Any] = {}
+
+        if attachments:
+            query['attachments'] =  'true'
+
+        if att_encoding_info:
+            query['att_encoding_info'] = 'true'
+
+        if rev:
+            query['rev'] = rev
+
+        resp = await self.conn.get(f'{self.name}/{doc_id}', query=query)
+        if resp.status in (200, 304):
+            return resp.get_data()
+        elif resp.status == 400:
+            raise DatabaseError(messeage='The format of the request or revision was invalid')
+        elif resp.status == 404:
+            return {}
+        else:
+            raise DatabaseError(resp.status)
+
+    async def get_many(self,  ids: List[Dict[str, str]]) -> List[Dict[Any, Any]]:
+        """Get document list
+
+        Args:
+            ids (list): list of dict {'id': 'someid'}
+
+        Returns:
+            list: Document list
+
+        Raises:
+            DatabaseError
+        """
+        resp = await self.conn.post(path=f'{self.name}/_bulk_get', data={'docs': ids})
+        if resp.status == 200:
+            ret = resp.get_data()
+            return ret.get('results', [])
+        elif resp.status == 400:
+            raise DatabaseError(messeage='The request provided invalid JSON data or invalid query parameter')
+        else:
+            raise DatabaseError(resp.status)
+
+    async def iter_many(self, ids: List[Dict[str, str]], chunk_size:int = 100) -> AsyncIterator[Dict[str, Any]]:
+        """Async iterator over documents fetched with _bulk_get in chunks of chunk_size ids
+
+        Args:
+            ids (list): list of dict {'id': 'someid'}
+            chunk_size (int): number of ids send in one request
+
+        Yields:
+            dict: result row for single id as returned by _bulk_get
+        """
+        for i in range(0, len(ids), chunk_size):
+            for row in await self.get_many(ids[i:i + chunk_size]):
+                yield row
+
+    async def update(self, doc_id:str, doc: Dict[str, Any], rev:str= '',
+                     merge: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                     retries:int = 0, backoff:float = 0.05, partial:bool = False) -> Tuple[str, str]:
+        """Update document in database, see Database.update
+
+        Args:
+            doc_id (str): Document ID.
+            doc(dict): Document
+            rev(str): Document’s revision if updating an existing document.
+            merge(callable): function returning new document from stored one
+            retries(int): number of retries after conflict
+            backoff(float): delay in seconds before first retry, doubled for every next one
+            partial(bool): doc given with rev contains only changed fields
+
+        Returns:
+            tuple: document id, revision
+
+        Raises:
+            DatabaseError
+        """
+        if merge is None:
+            merge = lambda stored: dict(stored, **doc)
+
+        if rev and not partial:
+            _doc = dict(doc, _rev=rev)
+        else:
+            _doc = await self._merged(doc_id, merge)
+            if rev:
+                # given revision must still be the latest one, otherwise write fails with 409
+                _doc['_rev'] = rev
+
+        attempt = 0
+        while True:
+            query = {'rev': _doc['_rev']} if _doc.get('_rev') else {}
+            resp = await self.conn.put(path=f'{self.name}/{doc_id}', data=_doc, query=query)
+            if resp.status in (201, 202):
+                ret = resp.get_data()
+                return ret.get('id'), ret.get('rev')
+            elif resp.status == 409 and attempt < retries:
+                await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+                attempt += 1
+                _doc = await self._merged(doc_id, merge)
+            elif resp.status == 400:
+                raise DatabaseError(400, messeage='Invalid request body or parameters')
+            elif resp.status == 404:
+                raise DatabaseError(404, messeage='Specified database or document ID doesn’t exists')
+            elif resp.status == 409:
+                raise DatabaseError(409, messeage='Specified revision is not the latest for target document')
+            else:
+                raise DatabaseError(resp.status)
+
+    async def _merged(self, doc_id:str, merge: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        stored = await self.get(doc_id)
+        _doc = merge(dict(stored))
+        if stored.get('_rev'):
+            _doc['_rev'] = stored['_rev']
+        return _doc
+
+    async def update_many(self, docs_list: List[Dict[str, str]]):
+        resp = await self.conn.post(path=f'{self.name}/_bulk_docs', data={'docs': docs_list})
+        if resp.status == 201:
+            return resp.get_data()
+        elif resp.status == 400:
+            raise DatabaseError(messeage='The request provided invalid JSON data')
+        else:
+            raise DatabaseError(resp.status)
+
+    async def delete(self, doc_id:str, rev:str='') -> Tuple[str, str]:
+        """Marks the specified document as deleted
+
+        Args:
+            doc_id (str): Document ID
+
+        Return:
+            tuple: document id rev
+
+        Raises:
+            DatabaseError
+        """
+        query: Dict[str, Any] = {}
+
+        if rev:
+            query['rev'] = rev
+        else:
+            info = await self.doc_info(doc_id)
+            query={'rev': info.get('rev', '')}
+
+        resp = await self.conn.delete(path=f'{self.name}/{doc_id}', query=query)
+        if resp.status in (200, 202):
+            ret = resp.get_data()
+            return ret.get('id'), ret.get('rev')
+        elif resp.status == 400:
+            raise DatabaseError(messeage='Invalid request body or parameters')
+        elif resp.status == 404:
+            raise DatabaseError(messeage='Specified database or document ID doesn’t exists')
+        elif resp.status == 409:
+            raise DatabaseError(messeage='Specified revision is not the latest for target document')
+        else:
+            raise DatabaseError(resp.status)
+
+    async def list_documents(self) -> List[Dict[str, Any]]:
+        """List all documents names in database
+
+        Return:
+            list: Document names"""
+
+        ret: List[Dict[str, Any]] = []
+        if (resp := await self.conn.get(path=f'{self.name}/_all_docs')).status == 200:
+            ret = resp.get_data().get('rows', [])
+        return ret
+
+    async def get_all_docs(self, page_size:int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Async iterator for all documents in database,
+        documents are read from _all_docs with include_docs in pages of page_size rows
+
+        Yields:
+            dict: Document
+        """
+        query: Dict[str, Any] = {'include_docs': 'true', 'limit': page_size + 1}
+        while True:
+            resp = await self.conn.get(path=f'{self.name}/_all_docs', query=query)
+            if resp.status != 200:
+                raise DatabaseError(resp.status)
+            rows = resp.get_data().get('rows', [])
+            for row in rows[:page_size]:
+                yield row['doc']
+            if len(rows) <= page_size:
+                break
+            query['startkey'] = Json.dumps(rows[page_size]['id'])
+
+    async def find(self, query: FindQuery):
+        resp = await self.conn.post(path=f'{self.name}/_find', data=query.to_json())
+        if resp.status == 200:
+            return resp.get_data()
+        elif resp.status == 400:
+            raise DatabaseError(messeage='Invalid request')
+        else:
+            raise DatabaseError(resp.status)
+
+    async def find_iter(self, query: FindQuery, page_size:int = 0,
+                        on_page: Optional[Callable[[Dict[str, Any]], None]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async iterator for all documents matching query,
+        next pages are requested with bookmark until server returns empty page
+
+        Args:
+            query (FindQuery): query, all options are sent with every page
+            page_size (int): documents in one page, default is query.limit
+            on_page (callable): called after every page with bookmark, warning and execution_stats
+
+        Yields:
+            dict: Document
+        """
+        data = query.to_json()
+        data['limit'] = page_size or query.limit
+        while True:
+            ret = await self.conn.post(path=f'{self.name}/_find', data=data)
+            if ret.status != 200:
+                raise DatabaseError(ret.status)
+            page = ret.get_data()
+            docs = page.get('docs', [])
+            for doc in docs:
+                yield doc
+            if on_page is not None:
+                on_page({key: value for key, value in page.items() if key != 'docs'})
+            if len(docs) < data['limit'] or not page.get('bookmark'):
+                break
+            data['bookmark'] = page['bookmark']
+            data.pop('skip', None)
+
+    async def get_attachment(self, doc_id:str, name:str, rev:str = '', chunk_size:int = 65536,
+                             meta: Optional[Dict[str, Any]] = None) -> AsyncIterator[bytes]:
+        """Download attachment in chunks, body is read from streamed response, see Database.get_attachment
+
+        Args:
+            doc_id (str): Document ID
+            name (str): attachment name
+            rev (str): Document revision
+            chunk_size (int): maximum size of chunk
+            meta (dict): if given is filled with content_type, length and digest before first chunk
+
+        Yields:
+            bytes: chunk of attachment
+
+        Raises:
+            DatabaseError
+        """
+        query = {'rev': rev} if rev else {}
+        resp = await self.conn.get(path=f'{self.name}/{doc_id}/{name}', query=query,
+                                   headers={'Accept': '*/*'}, stream=True)
+        if resp.status != 200:
+            await resp.close()
+            if resp.status == 404:
+                raise DatabaseError(404, messeage='Specified database, document or attachment was not found')
+            raise DatabaseError(resp.status)
+        if meta is not None:
+            headers = resp.get_headers()
+            meta.update({'content_type': headers.get('Content-Type'),
+                         'length': headers.get('Content-Length'),
+                         'digest': headers.get('Content-MD5') or headers.get('ETag', '').strip('"')})
+        async for chunk in resp.aiter_bytes(chunk_size):
+            yield chunk
+
+    async def contains(self, item:str) -> bool:
+        resp = await self.conn.head(path=f'{self.name}/{item}')
+        if resp.status in (200, 304):
+            return True
+        elif resp.status == 404:
+            return False
+        else:
+            raise DatabaseError(resp.status)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        for row in await self.list_documents():
+            yield row['id']
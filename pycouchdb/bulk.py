@@ -0,0 +1,172 @@
+from __future__ import annotations
+import time
+from concurrent.futures import Future
+from threading import Condition, Thread
+from .exceptions import DatabaseError
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .db import Database
+
+
+class BulkWriter:
+    """Write-behind buffer for documents. Writes are collected and sent
+    with _bulk_docs from background thread when max_docs or max_bytes is
+    reached or oldest buffered document waits flush_interval seconds.
+    Unlike add_batch every write is durable when its future is done.
+
+    Args:
+        db (Database): target database
+        max_docs (int): documents in one _bulk_docs request
+        max_bytes (int): approximate size of one _bulk_docs request
+        flush_interval (float): maximum time in seconds document waits in buffer
+        max_buffered (int): add blocks when so many documents wait, default 4 * max_docs
+
+    Example:
+        >>> with db.bulk_writer(max_docs=1000) as writer:
+        ...     futures = [writer.add(event) for event in events]
+        >>> futures[0].result()
+        ('8f9a...', '1-2c4f...')
+    """
+    def __init__(self, db: Database, max_docs: int = 500, max_bytes: int = 4 * 1024 * 1024,
+                 flush_interval: float = 1.0, max_buffered: int = 0) -> None:
+        self.db = db
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered or 4 * max_docs
+        self._buffer: List[Tuple[Dict[str, Any], int, Future]] = []
+        self._bytes = 0
+        self._oldest = 0.0
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = Condition()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, doc: Dict[str, Any]) -> Future:
+        """Buffer document for writing
+
+        Args:
+            doc (dict): document, with _rev when it updates existing one
+
+        Returns:
+            Future: result is tuple (id, rev), exception is DatabaseError with reason from server
+
+        Raises:
+            DatabaseError: writer is closed
+        """
+        size = len(self.db.conn.json.dumpb(doc))
+        future: Future = Future()
+        with self._cond:
+            while len(self._buffer) >= self.max_buffered and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                raise DatabaseError(messeage='BulkWriter is closed')
+            first = not self._buffer
+            if first:
+                self._oldest = time.monotonic()
+            self._buffer.append((doc, size, future))
+            self._bytes += size
+            if first or self._full():
+                # first document starts flush timer of background thread
+                self._cond.notify_all()
+        return future
+
+    def update(self, doc_id: str, doc: Dict[str, Any], rev: str = '') -> Future:
+        """Buffer new version of document, doc replaces stored document
+
+        Args:
+            doc_id (str): Document ID
+            doc (dict): Document
+            rev (str): revision of stored document, if not given doc['_rev'] is used
+
+        Returns:
+            Future: see add
+        """
+        doc = dict(doc, _id=doc_id)
+        if rev:
+            doc['_rev'] = rev
+        return self.add(doc)
+
+    def flush(self) -> None:
+        """Send all buffered documents and wait for responses"""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._buffer or self._in_flight:
+                self._cond.wait()
+
+    def close(self) -> None:
+        """Flush buffered documents and stop background thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def __enter__(self) -> BulkWriter:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _full(self) -> bool:
+        return len(self._buffer) >= self.max_docs or self._bytes >= self.max_bytes
+
+    def _wait_time(self) -> Optional[float]:
+        """Seconds to wait before next flush, None when there is nothing to flush"""
+        if self._closed or self._flush_requested or self._full():
+            return 0.0
+        if not self._buffer:
+            return None
+        return self._oldest + self.flush_interval - time.monotonic()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while (wait := self._wait_time()) is None or wait > 0:
+                    self._cond.wait(wait)
+                if not self._buffer:
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    if self._closed:
+                        return
+                    continue
+                count = size = 0
+                for _, doc_size, _ in self._buffer[:self.max_docs]:
+                    if count and size + doc_size > self.max_bytes:
+                        break
+                    count += 1
+                    size += doc_size
+                batch = self._buffer[:count]
+                del self._buffer[:count]
+                self._bytes -= size
+                self._in_flight += 1
+                self._cond.notify_all()
+            try:
+                self._write(batch)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    def _write(self, batch: List[Tuple[Dict[str, Any], int, Future]]) -> None:
+        try:
+            results = self.db.update_many([doc for doc, _, _ in batch])
+        except DatabaseError as err:
+            for _, _, future in batch:
+                future.set_exception(err)
+            return
+        except Exception as err:
+            for _, _, future in batch:
+                future.set_exception(DatabaseError(messeage=str(err)))
+            return
+
+        for (_, _, future), ret in zip(batch, results):
+            if 'error' in ret:
+                future.set_exception(DatabaseError(messeage=f"{ret.get('error')}: {ret.get('reason', '')}"))
+            else:
+                future.set_result((ret.get('id'), ret.get('rev')))
+        for _, _, future in batch[len(results):]:
+            future.set_exception(DatabaseError(messeage='Missing result in _bulk_docs response'))
@@ -1,2 +1,196 @@
+from __future__ import annotations
+import time
+from collections import OrderedDict
+from threading import Lock, Thread
+from .json import Json, JsonCodec, default_codec
+from typing import Any, Dict, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .changes import ChangesFeed
+
+
+class CacheEntry:
+    __slots__ = ('rev', 'data', 'codec', 'stored', 'validated')
+
+    def __init__(self, rev: str, data: bytes, codec: JsonCodec) -> None:
+        self.rev = rev
+        # document is kept serialized by codec of connection, every hit gets its own copy
+        self.data = data
+        self.codec = codec
+        self.stored = self.validated = time.monotonic()
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    def load(self) -> Dict[str, Any]:
+        return self.codec.loads(self.data)
+
+
 class Cache:
-    pass
\ No newline at end of file
+    """Bounded LRU cache of documents used by Database.get.
+    Cached document is revalidated with If-None-Match: "<rev>", unchanged
+    document comes back as 304 without body.
+
+    Args:
+        max_items (int): maximum number of documents
+        max_bytes (int): maximum size of serialized documents
+        ttl (float): seconds after which entry is dropped, 0 for no limit
+        fresh_for (float): seconds after store or revalidation when entry is
+                           returned without asking server, 0 always revalidates
+
+    Example:
+        >>> cache = Cache(max_items=5000, fresh_for=1.0)
+        >>> db = client.get_db('config', cache=cache)
+        >>> cache.follow(db.changes('continuous', since='now'))
+        >>> cache.stats()
+    """
+    def __init__(self, max_items: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 0.0, fresh_for: float = 0.0) -> None:
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.fresh_for = fresh_for
+        self._data: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+        self._stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'revalidations': 0, 'stale': 0,
+                                       'evictions': 0, 'invalidations': 0}
+
+    def lookup(self, key: str) -> Tuple[Optional[CacheEntry], bool]:
+        """Find entry for key
+
+        Returns:
+            tuple: entry or None, True if entry can be used without revalidation
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl and now - entry.stored > self.ttl:
+                self._remove(key)
+                self._stats['evictions'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None, False
+            self._data.move_to_end(key)
+            if self.fresh_for and now - entry.validated < self.fresh_for:
+                self._stats['hits'] += 1
+                return entry, True
+            return entry, False
+
+    def revalidated(self, entry: CacheEntry) -> Dict[str, Any]:
+        """Server confirmed entry is current (304), returns copy of document"""
+        with self._lock:
+            entry.validated = time.monotonic()
+            self._stats['revalidations'] += 1
+        return entry.load()
+
+    def put(self, key: str, doc: Dict[str, Any], rev: str = '', codec: Optional[JsonCodec] = None) -> None:
+        """Store document, documents bigger than max_bytes are not cached
+
+        Args:
+            key (str): key
+            doc (dict): document
+            rev (str): version used for revalidation, default is _rev of document
+            codec (JsonCodec): codec serializing document, default one when not given
+        """
+        codec = codec or default_codec
+        entry = CacheEntry(rev or doc.get('_rev', ''), codec.dumpb(doc), codec)
+        if entry.size > self.max_bytes:
+            self.invalidate(key)
+            return
+        with self._lock:
+            if key in self._data:
+                self._stats['stale'] += 1
+                self._remove(key)
+            self._data[key] = entry
+            self._bytes += entry.size
+            while len(self._data) > self.max_items or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self._stats['evictions'] += 1
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                self._stats['invalidations'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters
+
+        Returns:
+            dict: hits (served without request), misses, revalidations (304),
+                  stale (revalidation returned new document), evictions, invalidations,
+                  items and bytes
+        """
+        with self._lock:
+            ret = self._stats.copy()
+            ret.update({'items': len(self._data), 'bytes': self._bytes})
+            return ret
+
+    def follow(self, feed: ChangesFeed) -> Thread:
+        """Invalidate documents changed in feed, feed is consumed in daemon thread
+
+        Args:
+            feed (ChangesFeed): usually db.changes('continuous', since='now')
+
+        Returns:
+            Thread: started thread, feed.stop() finishes it
+        """
+        def run():
+            for item in feed:
+                for change in (item if isinstance(item, list) else [item]):
+                    self.invalidate(f"{feed.db.name}/{change['id']}")
+
+        thread = Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self, key: str) -> None:
+        self._bytes -= self._data.pop(key).size
+
+
+class QueryCache(Cache):
+    """Cache of view results. Results are stored with ETag of response and
+    revalidated with If-None-Match, server answers 304 without body until
+    index changes. Responses without ETag are not cached, CouchDB does not
+    send it for _find, so find is always requested from server. Streamed
+    results (view_iter) and pages of _all_docs read by get_all_docs,
+    list_documents or iteration over database bypass cache.
+
+    Args:
+        max_items (int): maximum number of results
+        max_bytes (int): maximum size of serialized results
+        ttl (float): seconds after which entry is dropped, 0 for no limit
+        fresh_for (float): seconds after store or revalidation when result is
+                           returned without asking server
+
+    Example:
+        >>> db = client.get_db('metrics', query_cache=QueryCache(max_bytes=32 * 1024 * 1024))
+        >>> db.view('stats', 'by_day', ViewQuery(group=True))
+    """
+    def __init__(self, max_items: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 0.0, fresh_for: float = 0.0) -> None:
+        super().__init__(max_items=max_items, max_bytes=max_bytes, ttl=ttl, fresh_for=fresh_for)
+
+    @staticmethod
+    def key(path: str, query: Dict[str, Any] = {}, data: Any = None) -> str:
+        """Key of request independent of order of options"""
+        return Json.dumps([path, _normalized(query), _normalized(data)])
+
+
+def _normalized(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {key: _normalized(value) for key, value in sorted(obj.items())}
+    if isinstance(obj, (list, tuple)):
+        return [_normalized(value) for value in obj]
+    return obj
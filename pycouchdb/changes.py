@@ -0,0 +1,360 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from fnmatch import fnmatchcase
+from .exceptions import DatabaseError, ServerError
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .connections import Connection
+    from .db import Database
+
+
+class Checkpoint(ABC):
+    """Storage for last processed sequence of changes feed"""
+
+    @abstractmethod
+    def load(self) -> str:
+        """Return stored sequence or empty string"""
+        pass
+
+    @abstractmethod
+    def save(self, seq: str) -> None:
+        pass
+
+
+class MemoryCheckpoint(Checkpoint):
+    def __init__(self, seq: str = '') -> None:
+        self.seq = seq
+
+    def load(self) -> str:
+        return self.seq
+
+    def save(self, seq: str) -> None:
+        self.seq = seq
+
+
+class LocalDocCheckpoint(Checkpoint):
+    """Keeps sequence in _local document of database, local documents are not
+    replicated and do not show up in _changes or _all_docs.
+
+    Args:
+        db (Database): database where checkpoint is stored
+        name (str): id of checkpoint, stored as _local/<name>
+    """
+    def __init__(self, db: Database, name: str) -> None:
+        self.db = db
+        self.path = f'{db.name}/_local/{name}'
+        self._rev = ''
+
+    def load(self) -> str:
+        if (resp := self.db.conn.get(path=self.path)).status == 200:
+            doc = resp.get_data()
+            self._rev = doc.get('_rev', '')
+            return doc.get('seq', '')
+        elif resp.status == 404:
+            return ''
+        else:
+            raise DatabaseError(resp.status)
+
+    def save(self, seq: str) -> None:
+        doc: Dict[str, Any] = {'seq': seq}
+        if self._rev:
+            doc['_rev'] = self._rev
+        resp = self.db.conn.put(path=self.path, data=doc)
+        if resp.status in (201, 202):
+            self._rev = resp.get_data().get('rev', '')
+        else:
+            raise DatabaseError(resp.status)
+
+
+class ChangesFeed:
+    """Iterator over database _changes feed.
+
+    Feed types:
+        normal: all changes since given sequence, iteration ends with last one
+        longpoll: like normal but when there is nothing new waits for changes, repeated until stop
+        continuous: one open response streaming changes as they happen, reconnects until stop
+
+    With checkpoint, feed starts from stored sequence and stores sequence of
+    processed changes every checkpoint_every changes, so consumer after restart
+    resumes where it finished. Change is treated as processed when the consumer
+    asks for the next one, save_checkpoint stores the last yielded change at once.
+
+    Args:
+        db (Database): database
+        feed (str): normal, longpoll or continuous
+        since (str): start sequence, if empty sequence from checkpoint is used
+        checkpoint (Checkpoint): storage for processed sequence
+        checkpoint_every (int): how many processed changes between checkpoint saves,
+                                in batch mode checkpoint is saved after batch reaching it
+        batch_size (int): if set iterator yields lists of up to batch_size changes,
+                          not full batch is yielded when feed is idle
+        include_docs (bool): include document body in change
+        filter (str): name of filter function design_doc/filter_name
+        selector (dict): mango selector, changes are filtered by _selector filter
+        doc_ids (list): only changes of given documents, _doc_ids filter
+        heartbeat (int): milliseconds between empty lines keeping connection alive,
+                         by default half of connection timeout
+        timeout (int): milliseconds after which server closes longpoll/continuous response
+        limit (int): maximum number of changes in one response
+        params (dict): other query parameters, e.g. style='all_docs'
+    """
+    def __init__(self, db: Database, feed: str = 'normal', since: str = '', checkpoint: Optional[Checkpoint] = None,
+                 checkpoint_every: int = 100, batch_size: int = 0, include_docs: bool = False, filter: str = '',
+                 selector: Optional[Dict[str, Any]] = None, doc_ids: Optional[List[str]] = None,
+                 heartbeat: int = 0, timeout: int = 0, limit: int = 0, **params: Any) -> None:
+        if feed not in ('normal', 'longpoll', 'continuous'):
+            raise ValueError(f'Unknown feed type {feed}')
+        self.db = db
+        self.feed = feed
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.batch_size = batch_size
+        self.last_seq: str = since or (checkpoint.load() if checkpoint is not None else '')
+        self._saved_seq = self.last_seq
+        self._yielded_seq = self.last_seq
+        self._stopped = False
+
+        self.query: Dict[str, Any] = {'feed': feed}
+        self.query.update(params)
+        self.body: Optional[Dict[str, Any]] = None
+        if include_docs:
+            self.query['include_docs'] = 'true'
+        if limit:
+            self.query['limit'] = limit
+        if timeout:
+            self.query['timeout'] = timeout
+        if feed != 'normal':
+            # heartbeat has to be shorter than socket timeout of connection
+            conn_timeout = getattr(db.conn, 'timeout', 0) or 60
+            self.query['heartbeat'] = heartbeat or min(30000, int(conn_timeout * 500))
+        if filter:
+            self.query['filter'] = filter
+        elif selector is not None:
+            self.query['filter'] = '_selector'
+            self.body = {'selector': selector}
+        elif doc_ids is not None:
+            self.query['filter'] = '_doc_ids'
+            self.body = {'doc_ids': doc_ids}
+
+    def stop(self) -> None:
+        """Finish iteration after current change or heartbeat"""
+        self._stopped = True
+
+    def save_checkpoint(self) -> None:
+        """Store sequence of last yielded change as processed"""
+        self._save(self._yielded_seq)
+
+    def __iter__(self) -> Iterator[Any]:
+        items = self._batches() if self.batch_size else self._changes()
+        processed_seq = self._yielded_seq
+        count = size = 0
+        try:
+            for item, seq in items:
+                # consumer asked for next item, so previous one is processed
+                if processed_seq != self._yielded_seq:
+                    processed_seq = self._yielded_seq
+                    # changes are counted also in batch mode, not batches
+                    count += size
+                    if count >= self.checkpoint_every:
+                        self._save(processed_seq)
+                        count = 0
+                self._yielded_seq = seq
+                size = len(item) if self.batch_size else 1
+                yield item
+            self._save(self.last_seq)
+        except GeneratorExit:
+            self._save(processed_seq)
+            raise
+
+    def _save(self, seq: str) -> None:
+        if self.checkpoint is not None and seq and seq != self._saved_seq:
+            self.checkpoint.save(seq)
+            self._saved_seq = seq
+
+    def _batches(self) -> Iterator[Any]:
+        batch: List[Dict[str, Any]] = []
+        for change, seq in self._changes(idle=True):
+            if change is not None:
+                batch.append(change)
+            if batch and (change is None or len(batch) >= self.batch_size):
+                yield batch, batch[-1]['seq']
+                batch = []
+
+    def _changes(self, idle: bool = False) -> Iterator[Any]:
+        # with idle None is yielded when feed has nothing more for now
+        while not self._stopped:
+            query = self.query.copy()
+            if self.last_seq:
+                query['since'] = self.last_seq
+
+            if self.body is not None:
+                resp = self.db.conn.post(path=f'{self.db.name}/_changes', data=self.body, query=query, stream=True)
+            else:
+                resp = self.db.conn.get(path=f'{self.db.name}/_changes', query=query, stream=True)
+            if resp.status != 200:
+                raise DatabaseError(resp.status)
+
+            if self.feed == 'continuous':
+                changes = self._continuous(resp.iter_bytes())
+            else:
+                changes = self._results(resp)
+
+            for change in changes:
+                if change is None:
+                    if idle:
+                        yield None, self.last_seq
+                elif 'seq' in change:
+                    self.last_seq = change['seq']
+                    yield change, change['seq']
+                if self._stopped:
+                    return
+
+            if idle:
+                yield None, self.last_seq
+            if self.feed == 'normal':
+                return
+
+    def _results(self, resp: Any) -> Iterator[Optional[Dict[str, Any]]]:
+        meta: Dict[str, Any] = {}
+        yield from resp.iter_rows(keys=('results',), meta=meta)
+        if meta.get('last_seq'):
+            self.last_seq = meta['last_seq']
+
+    def _continuous(self, chunks: Iterable[bytes]) -> Iterator[Optional[Dict[str, Any]]]:
+        for line in iter_lines(chunks):
+            if not line.strip():
+                # heartbeat
+                yield None
+                continue
+            change = self.db.conn.json.loads(line)
+            if 'last_seq' in change:
+                self.last_seq = change['last_seq']
+            else:
+                yield change
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Split streamed body into lines"""
+    rest = b''
+    for chunk in chunks:
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        yield from lines
+    if rest:
+        yield rest
+
+
+class DbUpdatesWatcher:
+    """Long-running watcher of server _db_updates feed, events are dispatched to
+    handlers registered for database name patterns. For databases with changes
+    handler a _changes reader is run only when the database was updated, so there
+    is no need to poll every database. Database without stored checkpoint (always
+    the case with default MemoryCheckpoint after start) is read from since=0, so the
+    first update delivers all its changes, pass changes_checkpoint with persistent
+    storage to resume instead.
+
+    Args:
+        conn (Connection): connection to server
+        since (str): start sequence, if empty sequence from checkpoint is used, 'now' by default
+        checkpoint (Checkpoint): storage for processed _db_updates sequence
+        changes_checkpoint (Callable): factory returning Checkpoint for database name,
+                                       MemoryCheckpoint by default
+        heartbeat (int): milliseconds between empty lines, by default half of connection timeout
+        timeout (int): milliseconds after which server closes response, watcher reconnects
+
+    Example:
+        >>> watcher = server.watch_db_updates()
+        >>> watcher.on('tenant-*', lambda event: print(event['db_name'], event['type']))
+        >>> watcher.on_changes('tenant-*', lambda db_name, changes: index(db_name, changes), include_docs=True)
+        >>> watcher.run()
+    """
+    def __init__(self, conn: Connection, since: str = '', checkpoint: Optional[Checkpoint] = None,
+                 changes_checkpoint: Optional[Callable[[str], Checkpoint]] = None,
+                 heartbeat: int = 0, timeout: int = 0) -> None:
+        self.conn = conn
+        self.checkpoint = checkpoint
+        self.changes_checkpoint = changes_checkpoint or (lambda db_name: MemoryCheckpoint())
+        self.last_seq: str = since or (checkpoint.load() if checkpoint is not None else '') or 'now'
+        self._handlers: List[Tuple[str, Callable[[Dict[str, Any]], Any]]] = []
+        self._changes_handlers: List[Tuple[str, Callable[[str, List[Dict[str, Any]]], Any], Dict[str, Any]]] = []
+        self._checkpoints: Dict[str, Checkpoint] = {}
+        self._stopped = False
+
+        conn_timeout = getattr(conn, 'timeout', 0) or 60
+        self.query: Dict[str, Any] = {'feed': 'continuous',
+                                      'heartbeat': heartbeat or min(30000, int(conn_timeout * 500))}
+        if timeout:
+            self.query['timeout'] = timeout
+
+    def on(self, pattern: str, handler: Callable[[Dict[str, Any]], Any]) -> None:
+        """Call handler with every event (db_name, type, seq) of databases matching fnmatch pattern"""
+        self._handlers.append((pattern, handler))
+
+    def on_changes(self, pattern: str, handler: Callable[[str, List[Dict[str, Any]]], Any], **changes_options: Any) -> None:
+        """After update of database matching pattern read its _changes since last
+        processed sequence (from the beginning when there is none) and call handler
+        with database name and list of changes
+
+        Args:
+            pattern (str): fnmatch pattern of database names
+            handler (Callable): handler(db_name, changes)
+            changes_options: options of ChangesFeed, e.g. include_docs=True
+        """
+        self._changes_handlers.append((pattern, handler, changes_options))
+
+    def stop(self) -> None:
+        """Finish run after current event or heartbeat"""
+        self._stopped = True
+
+    def run(self) -> None:
+        """Watch _db_updates until stop, reconnecting when server closes feed"""
+        for event in self.events():
+            self.dispatch(event)
+            if self.checkpoint is not None:
+                self.checkpoint.save(self.last_seq)
+
+    def events(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over _db_updates events until stop"""
+        while not self._stopped:
+            query = self.query.copy()
+            query['since'] = self.last_seq
+            resp = self.conn.get(path='_db_updates', query=query, stream=True)
+            if resp.status != 200:
+                raise ServerError(resp.status)
+
+            for line in iter_lines(resp.iter_bytes()):
+                if line.strip():
+                    event = self.conn.json.loads(line)
+                    if 'last_seq' in event:
+                        self.last_seq = event['last_seq']
+                    else:
+                        self.last_seq = event.get('seq', self.last_seq)
+                        yield event
+                if self._stopped:
+                    return
+
+    def dispatch(self, event: Dict[str, Any]) -> None:
+        """Pass event to matching handlers"""
+        db_name = event.get('db_name', '')
+        for pattern, handler in self._handlers:
+            if fnmatchcase(db_name, pattern):
+                handler(event)
+
+        if event.get('type') == 'deleted':
+            self._checkpoints.pop(db_name, None)
+            return
+        if event.get('type') != 'updated':
+            return
+        for pattern, changes_handler, options in self._changes_handlers:
+            if fnmatchcase(db_name, pattern):
+                self._read_changes(db_name, changes_handler, options)
+
+    def _read_changes(self, db_name: str, handler: Callable[[str, List[Dict[str, Any]]], Any], options: Dict[str, Any]) -> None:
+        from .db import Database
+
+        if (checkpoint := self._checkpoints.get(db_name)) is None:
+            checkpoint = self._checkpoints[db_name] = self.changes_checkpoint(db_name)
+        options = dict(options, batch_size=options.get('batch_size', 1000))
+        for changes in ChangesFeed(Database(db_name, self.conn), checkpoint=checkpoint, **options):
+            handler(db_name, changes)
@@ -1,30 +1,44 @@
 
 from re import search
+from .cache import Cache, QueryCache
 from .connections import Connection
 from .connections.urllibcon import UrllibConn
 from .db import Database
 from .exceptions import ServerError
-from typing import Callable, List
+from .json import JsonCodec, get_codec
+from typing import Callable, List, Optional, Union
 
 
 class Client:
-    """Main class to connect to Database"""
+    """Main class to connect to Database
     
-    def __init__(self, url:str, connection_engine: Callable[[str], Connection] = UrllibConn) -> None:
+    Args:
+        url (str): url to database server
+        connection_engine (Callable): connection class or factory taking url
+        json_codec (str|JsonCodec): codec of request and response bodies, orjson, ujson, json
+            or JsonCodec instance, ujson when installed or json by default
+    """
+    
+    def __init__(self, url:str, connection_engine: Callable[[str], Connection] = UrllibConn,
+                 json_codec: Optional[Union[str, JsonCodec]] = None) -> None:
         self.conn: Connection = connection_engine(url)
+        if json_codec is not None:
+            self.conn.json = get_codec(json_codec)
         
-    def get_db(self, name:str):
+    def get_db(self, name:str, cache: Optional[Cache] = None, query_cache: Optional[QueryCache] = None):
         """Return database instance
         
         Args:
             name (str): Database name
+            cache (Cache): optional document cache, can be shared between databases
+            query_cache (QueryCache): optional cache of view results
         
         Returns:
             class: instance of pycouchdb.db.Database: 
         """
         
         if (resp := self.conn.head(path=name)).status == 200:
-            return Database(name, self.conn)
+            return Database(name, self.conn, cache=cache, query_cache=query_cache)
         else:
             raise ServerError(resp.status)
 
@@ -1,19 +1,59 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Iterator, Optional, Sequence, Tuple
+from ..json import JsonCodec, default_codec
+from ..metrics import RequestEvent, RequestHook
+from ..stream import ROW_KEYS, iter_rows
+from .compression import Transfer
 
 class Connection(ABC):
+    # codec of request and response bodies, Client replaces it when json_codec is given
+    json: JsonCodec = default_codec
+    # without hooks engines do not create events at all
+    hooks: Sequence[RequestHook] = ()
+    
+    def add_hook(self, hook: RequestHook) -> None:
+        """Call hook before every request, after response and on error, see pycouchdb.metrics"""
+        # list is replaced, so threads in the middle of request keep iterating the old one
+        self.hooks = [*self.hooks, hook]
+    
+    def remove_hook(self, hook: RequestHook) -> None:
+        self.hooks = [item for item in self.hooks if item is not hook]
+    
+    def _before_request(self, method:str, path:str, data:Any) -> RequestEvent:
+        event = RequestEvent(method, path, len(data) if isinstance(data, bytes) else 0)
+        for hook in self.hooks:
+            hook.before_request(event)
+        return event
+    
+    def _after_response(self, event: RequestEvent, status:int, received:int = 0, reused:bool = False,
+                        retries:int = 0) -> None:
+        event.duration = time.perf_counter() - event.started
+        event.status = status
+        event.received = received
+        event.reused = reused
+        event.retries = retries
+        for hook in self.hooks:
+            hook.after_response(event)
+    
+    def _on_error(self, event: RequestEvent, error: BaseException, retries:int = 0) -> None:
+        event.duration = time.perf_counter() - event.started
+        event.error = error
+        event.retries = retries
+        for hook in self.hooks:
+            hook.on_error(event)
     
     @abstractmethod
     def __init__(self, url:str) -> None:
         pass
     
     @abstractmethod
-    def get(self, path:str='', query:Dict[str,Any]={}) -> Response:
+    def get(self, path:str='', query:Dict[str,Any]={}, headers:Dict[str, str]={}, stream:bool=False) -> Response:
         pass
     
     @abstractmethod
-    def post(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}) -> Response:
+    def post(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}, stream:bool=False) -> Response:
         pass
     
     @abstractmethod
@@ -28,7 +68,43 @@ class Connection(ABC):
     def head(self, path:str, query:Dict[str, Any]={}) -> Response:
         pass
     
+
+class AsyncConnection(ABC):
+    json: JsonCodec = default_codec
+    
+    @abstractmethod
+    def __init__(self, url:str) -> None:
+        pass
+    
+    @abstractmethod
+    async def get(self, path:str='', query:Dict[str,Any]={}, headers:Dict[str, str]={}, stream:bool=False) -> Response:
+        pass
+    
+    @abstractmethod
+    async def post(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}) -> Response:
+        pass
+    
+    @abstractmethod
+    async def put(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}) -> Response:
+        pass
+    
+    @abstractmethod
+    async def delete(self, path:str, query:Dict[str, Any]={}) -> Response:
+        pass
+    
+    @abstractmethod
+    async def head(self, path:str, query:Dict[str, Any]={}) -> Response:
+        pass
+    
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
 class Response(ABC):
+    json: JsonCodec = default_codec
+    # bytes and time of request, engines with transfer counters set it
+    transfer: Optional[Transfer] = None
+
     @property
     @abstractmethod
     def status(self) -> int:
@@ -41,6 +117,23 @@ class Response(ABC):
     @abstractmethod
     def get_headers(self) -> Any:
         pass
+    
+    @abstractmethod
+    def iter_bytes(self, chunk_size:int = 65536) -> Iterator[bytes]:
+        """Iterate over body in chunks, for response requested with stream=True
+        body is read from socket while iterating"""
+        pass
+    
+    def iter_rows(self, keys:Tuple[str, ...] = ROW_KEYS, raw:bool = False, meta:Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+        """Iterate over rows of {"rows": [...]}, {"docs": [...]} or {"results": [...]} body
+        parsing one row at a time, see pycouchdb.stream.RowParser
+        
+        Args:
+            keys (tuple): names of top level keys holding rows
+            raw (bool): yield rows as bytes with JSON
+            meta (dict): updated with remaining envelope fields (total_rows, bookmark ...) after last row
+        """
+        return iter_rows(self.iter_bytes(), keys=keys, raw=raw, meta=meta, codec=self.json)
 
     
     
@@ -0,0 +1,278 @@
+import asyncio
+import ssl
+from base64 import b64encode
+from http.client import HTTPMessage
+from urllib.parse import urlparse
+from urllib.parse import quote, urlencode
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from . import AsyncConnection, Response
+from ..json import JsonCodec
+
+
+_Stream = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class AsyncConn(AsyncConnection):
+    """Non-blocking HTTP/1.1 connection for asyncio.
+    Keeps a pool of keep-alive sockets so many coroutines can talk to the
+    server at once without a thread per request.
+
+    Args:
+        url (str): url to database server
+        timeout (int): timeout in seconds for single request
+        max_connections (int): maximum number of sockets open at the same time
+
+    Body of response requested with stream=True is read by aiter_bytes, its socket
+    and connection slot are held until the body is read or response is closed.
+    """
+    def __init__(self, url:str = 'http://localhost:5984', timeout:int=5, max_connections:int=100) -> None:
+        self.headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+        url_data = urlparse(url)
+        self.timeout = timeout
+        self.user = url_data.username
+        self.password = url_data.password
+        self.host = url_data.hostname or 'localhost'
+        self.port = int(url_data.port or 5984)
+        self.ssl: Optional[ssl.SSLContext] = ssl.create_default_context() if url_data.scheme == 'https' else None
+        self.max_connections = max_connections
+        self._idle: List[_Stream] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        if self.user and self.password:
+            self.headers['Authorization'] = f"Basic {b64encode(f'{self.user}:{self.password}'.encode('utf-8')).decode('ascii')}"
+        self.headers['Host'] = f'{self.host}:{self.port}'
+
+    async def get(self, path:str='', query:Dict[str,Any]={}, headers:Dict[str, str]={}, stream:bool=False) -> Response:
+        return await self.request(method='GET', path=path, query=query, headers=headers, stream=stream)
+
+    async def post(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}) -> Response:
+        return await self.request(path, method='POST', data=data, headers=headers, query=query)
+
+    async def put(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}) -> Response:
+        return await self.request(path, method='PUT', data=data, headers=headers, query=query)
+
+    async def delete(self, path:str, query:Dict[str, Any]={}) -> Response:
+        return await self.request(path, method='DELETE', query=query)
+
+    async def head(self, path:str, query:Dict[str, Any]={}) -> Response:
+        return await self.request(path, method='HEAD', query=query)
+
+    async def request(self, path:str, method:str='GET', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={},
+                      stream:bool=False) -> Response:
+        _headers = self.headers.copy()
+        _headers.update(headers)
+        if type(data) in (dict, list):
+            data = self.json.dumpb(data)
+        elif type(data) is str:
+            data = data.encode('utf8')
+        body: bytes = data or b''
+        _headers['Content-Length'] = str(len(body))
+
+        _query:str = ""
+        if query:
+            _query = f"?{urlencode(query)}"
+
+        head = f'{method} /{quote(path)}{_query} HTTP/1.1\r\n'
+        head += ''.join([f'{k}: {v}\r\n' for (k,v) in _headers.items()])
+        raw_request = f'{head}\r\n'.encode('latin-1') + body
+
+        slots = self._get_slots()
+        await slots.acquire()
+        streamed = False
+        try:
+            while True:
+                reader, writer, reused = await self._acquire()
+                try:
+                    writer.write(raw_request)
+                    await writer.drain()
+                    if stream:
+                        status, resp_headers, keep_alive = await asyncio.wait_for(self._read_head(reader), self.timeout)
+                        resp_body = b''
+                    else:
+                        status, resp_headers, resp_body, keep_alive = await asyncio.wait_for(
+                            self._read_response(reader, method), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if reused:
+                        # keep-alive socket was closed by server while idle
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+
+                if stream and _has_body(method, status):
+                    def release(reusable: bool) -> None:
+                        # socket with unread body can not be reused
+                        self._release(reader, writer, keep_alive and reusable)
+                        slots.release()
+
+                    streamed = True
+                    return AsyncResponse(status, resp_headers, json=self.json,
+                                         stream=self._read_body(reader, resp_headers), release=release)
+                self._release(reader, writer, keep_alive)
+                return AsyncResponse(status, resp_headers, resp_body, json=self.json)
+        finally:
+            if not streamed:
+                slots.release()
+
+    async def close(self) -> None:
+        """Close all idle connections"""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    def _release(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, reusable: bool) -> None:
+        if reusable:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # semaphore is created lazily so it is bound to the running loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        return self._slots
+
+    async def _acquire(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+        return reader, writer, False
+
+    async def _read_response(self, reader: asyncio.StreamReader, method:str) -> Tuple[int, HTTPMessage, bytes, bool]:
+        code, headers, keep_alive = await self._read_head(reader)
+        body = b''
+        if not _has_body(method, code):
+            pass
+        elif headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = await self._read_chunked(reader)
+        elif (length := headers.get('Content-Length')) is not None:
+            body = await reader.readexactly(int(length))
+        else:
+            body = await reader.read()
+            keep_alive = False
+
+        return code, headers, body, keep_alive
+
+    async def _read_head(self, reader: asyncio.StreamReader) -> Tuple[int, HTTPMessage, bool]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by server')
+        version, status, *_ = status_line.decode('latin-1').split(None, 2)
+
+        headers = HTTPMessage()
+        while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+            key, _, val = line.decode('latin-1').partition(':')
+            headers[key.strip()] = val.strip()
+
+        keep_alive = headers.get('Connection', '').lower() != 'close' and version != 'HTTP/1.0'
+        return int(status), headers, keep_alive
+
+    async def _read_body(self, reader: asyncio.StreamReader, headers: HTTPMessage) -> AsyncIterator[bytes]:
+        """Yield body chunks as they come, every read is limited by timeout"""
+        if headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size_line = await asyncio.wait_for(reader.readline(), self.timeout)
+                size = int(size_line.split(b';', 1)[0].strip(), 16)
+                if size == 0:
+                    while (await asyncio.wait_for(reader.readline(), self.timeout)) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return
+                yield await asyncio.wait_for(reader.readexactly(size), self.timeout)
+                await asyncio.wait_for(reader.readexactly(2), self.timeout)
+        elif (length := headers.get('Content-Length')) is not None:
+            left = int(length)
+            while left:
+                chunk = await asyncio.wait_for(reader.read(min(left, 65536)), self.timeout)
+                if not chunk:
+                    raise asyncio.IncompleteReadError(chunk, left)
+                left -= len(chunk)
+                yield chunk
+        else:
+            while chunk := await asyncio.wait_for(reader.read(65536), self.timeout):
+                yield chunk
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> bytes:
+        chunks: List[bytes] = []
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # skip trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+
+def _has_body(method: str, code: int) -> bool:
+    return method != 'HEAD' and code not in (204, 304) and code >= 200
+
+
+class AsyncResponse(Response):
+    def __init__(self, status:int, headers:Any = {},  data: bytes = b'', json: Optional[JsonCodec] = None,
+                 stream: Optional[AsyncIterator[bytes]] = None, release: Optional[Callable[[bool], None]] = None):
+        if json is not None:
+            self.json = json
+        self._status = status
+        self._headers = headers
+        self._data = data
+        self._stream = stream
+        self._release = release
+
+    @property
+    def status(self):
+        return self._status
+
+    def get_data(self) -> Any:
+        if self._stream is not None:
+            raise RuntimeError('Body of streamed response is read with aiter_bytes')
+        ret = {}
+        if self._data:
+            ret = self.json.loads(self._data)
+        return ret
+
+    def get_headers(self):
+        return self._headers
+
+    def iter_bytes(self, chunk_size:int = 65536) -> Iterator[bytes]:
+        if self._stream is not None:
+            raise RuntimeError('Body of streamed response is read with aiter_bytes')
+        view = memoryview(self._data)
+        for i in range(0, len(view), chunk_size):
+            yield bytes(view[i:i + chunk_size])
+
+    async def aiter_bytes(self, chunk_size:int = 65536) -> AsyncIterator[bytes]:
+        """Iterate over body in chunks of at most chunk_size, streamed body is read from socket"""
+        if self._stream is None:
+            for chunk in self.iter_bytes(chunk_size):
+                yield chunk
+            return
+        stream, self._stream = self._stream, None
+        complete = False
+        try:
+            async for chunk in stream:
+                view = memoryview(chunk)
+                for i in range(0, len(view), chunk_size):
+                    yield bytes(view[i:i + chunk_size])
+            complete = True
+        finally:
+            self._done(complete)
+
+    async def close(self) -> None:
+        """Release connection of not consumed streamed response"""
+        if self._stream is not None:
+            self._stream = None
+            self._done(False)
+
+    def _done(self, reusable: bool) -> None:
+        if self._release is not None:
+            release, self._release = self._release, None
+            release(reusable)
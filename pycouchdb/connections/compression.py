@@ -0,0 +1,120 @@
+import gzip
+import time
+import zlib
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+
+class Transfer:
+    """Transferred bytes and time of single request, available as transfer of response.
+    Counters of streamed response grow while its body is read.
+
+    Attributes:
+        sent (int): request body bytes on the wire, streamed bodies are not counted
+        sent_raw (int): request body bytes before compression
+        received (int): response body bytes on the wire
+        received_raw (int): response body bytes after decoding
+        duration (float): seconds from start of request until last received body bytes
+    """
+    __slots__ = ('sent', 'sent_raw', 'received', 'received_raw', 'started', 'duration')
+
+    def __init__(self) -> None:
+        self.sent = 0
+        self.sent_raw = 0
+        self.received = 0
+        self.received_raw = 0
+        self.started = time.perf_counter()
+        self.duration = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'sent': self.sent, 'sent_raw': self.sent_raw, 'received': self.received,
+                'received_raw': self.received_raw, 'duration': self.duration}
+
+
+class GzipCodec:
+    """gzip compression of request bodies and decoding of responses for connection
+    engines, with counters of transferred bytes. Counters are updated also when
+    compression is disabled, so traffic with and without it can be compared.
+    Methods taking transfer update also counters of single request.
+
+    Args:
+        enabled (bool): send Accept-Encoding: gzip and compress request bodies
+        min_size (int): request bodies smaller than min_size are sent as they are
+        level (int): gzip compression level
+    """
+    def __init__(self, enabled: bool = False, min_size: int = 1024, level: int = 5) -> None:
+        self.enabled = enabled
+        self.min_size = min_size
+        self.level = level
+        self._lock = Lock()
+        self._stats = {'requests': 0, 'sent': 0, 'sent_raw': 0, 'received': 0, 'received_raw': 0}
+
+    def request_headers(self) -> Dict[str, str]:
+        return {'Accept-Encoding': 'gzip'} if self.enabled else {}
+
+    def encode_body(self, data: Any, headers: Dict[str, str], transfer: Optional[Transfer] = None) -> Any:
+        """Compress request body and set Content-Encoding in headers, streamed
+        bodies (file or iterator) are sent as they are"""
+        if not isinstance(data, bytes):
+            self.count_sent(0, 0, transfer)
+            return data
+        raw = len(data)
+        if self.enabled and raw >= self.min_size:
+            compressed = gzip.compress(data, compresslevel=self.level)
+            if len(compressed) < raw:
+                headers['Content-Encoding'] = 'gzip'
+                data = compressed
+        self.count_sent(raw, len(data), transfer)
+        return data
+
+    def decode_body(self, body: bytes, encoding: str, transfer: Optional[Transfer] = None) -> bytes:
+        """Decode whole response body"""
+        raw = body
+        if encoding == 'gzip' and body:
+            raw = gzip.decompress(body)
+        self.count_received(len(raw), len(body), transfer)
+        return raw
+
+    def iter_decoded(self, chunks: Iterable[bytes], encoding: str, transfer: Optional[Transfer] = None) -> Iterator[bytes]:
+        """Decode streamed response body chunk by chunk"""
+        if encoding != 'gzip':
+            for chunk in chunks:
+                self.count_received(len(chunk), len(chunk), transfer)
+                yield chunk
+            return
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            data = decoder.decompress(chunk)
+            self.count_received(len(data), len(chunk), transfer)
+            if data:
+                yield data
+        if data := decoder.flush():
+            self.count_received(len(data), 0, transfer)
+            yield data
+
+    def count_sent(self, raw: int, wire: int, transfer: Optional[Transfer] = None) -> None:
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['sent_raw'] += raw
+            self._stats['sent'] += wire
+        if transfer is not None:
+            transfer.sent_raw += raw
+            transfer.sent += wire
+
+    def count_received(self, raw: int, wire: int, transfer: Optional[Transfer] = None) -> None:
+        with self._lock:
+            self._stats['received_raw'] += raw
+            self._stats['received'] += wire
+        if transfer is not None:
+            transfer.received_raw += raw
+            transfer.received += wire
+            transfer.duration = time.perf_counter() - transfer.started
+
+    def stats(self) -> Dict[str, int]:
+        """Transfer counters
+
+        Returns:
+            dict: requests, sent and received (bytes on the wire), sent_raw and received_raw (bytes before compression)
+        """
+        with self._lock:
+            return self._stats.copy()
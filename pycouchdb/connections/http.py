@@ -1,30 +1,38 @@
 from urllib.parse import urlparse
 from base64 import b64encode
-from threading import RLock
 from . import Connection, Response
-from ..json import Json
-from urllib.parse import quote
-from typing import Dict, Any
+from .compression import GzipCodec, Transfer
+from .pool import ConnectionPool
+from ..json import JsonCodec
+from urllib.parse import quote, urlencode
+from typing import Any, Callable, Dict, Iterator, Optional
 import http.client
 
 
 class HttpClientConn(Connection):
-    def __init__(self, url: str, timeout:int = 5) -> None:
-        self.lock = RLock()
+    """Connection engine with thread-safe pool of keep-alive connections
+
+    Args:
+        url (str): url to database server
+        timeout (int): socket timeout in seconds
+        pool_size (int): maximum number of connections to host
+        idle_timeout (float): seconds after which idle connection is closed
+        compress (bool): accept gzip responses and compress request bodies
+        compress_min_size (int): smallest request body which is compressed
+    """
+    def __init__(self, url: str, timeout:int = 5, pool_size:int = 10, idle_timeout:float = 60.0,
+                 compress:bool = False, compress_min_size:int = 1024) -> None:
         self.headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+        self.codec = GzipCodec(compress, compress_min_size)
         self.url_data = urlparse(url)
         self.timeout = timeout
         self.user = self.url_data.username
         self.password = self.url_data.password
         
-        # self.errors_retryable = (errno.EPIPE, errno.ETIMEDOUT, errno.ECONNRESET, errno.ECONNREFUSED,
-        #                          errno.ECONNABORTED, errno.EHOSTDOWN, errno.EHOSTUNREACH,
-        #                          errno.ENETRESET, errno.ENETUNREACH, errno.ENETDOWN)
-        
         if self.user and self.password:
             self.headers['Authorization'] = f"Basic {b64encode(f'{self.user}:{self.password}'.encode('utf-8')).decode('ascii')}"
         
-        self.conn = self._make_conn()
+        self.pool = ConnectionPool(self._make_conn, max_size=pool_size, idle_timeout=idle_timeout)
     
     def _make_conn(self):
         if self.url_data.scheme == 'https':
@@ -36,11 +44,11 @@ class HttpClientConn(Connection):
                                               port=self.url_data.port or 5984,
                                               timeout=self.timeout)
     
-    def get(self, path:str='', query:Dict[str,Any]={}):
-        return self.request(method='GET', path=path, query=query)
+    def get(self, path:str='', query:Dict[str,Any]={}, headers:Dict[str, str]={}, stream:bool=False):
+        return self.request(method='GET', path=path, query=query, headers=headers, stream=stream)
 
-    def post(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}):
-        return self.request(path, method='POST', data=data, headers=headers, query=query)
+    def post(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}, stream:bool=False):
+        return self.request(path, method='POST', data=data, headers=headers, query=query, stream=stream)
 
     def put(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}):
         return self.request(path, method='PUT', data=data, headers=headers, query=query)
@@ -51,49 +59,137 @@ class HttpClientConn(Connection):
     def head(self, path:str, query:Dict[str, Any]={}):
         return self.request(path, method='HEAD', query=query)
     
-    def request(self, path:str, method:str='GET', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}, retry:int=3) -> Response:
-        headers.update(self.headers)
+    def request(self, path:str, method:str='GET', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}, retry:int=1, stream:bool=False) -> Response:
+        _headers = self.headers.copy()
+        _headers.update(self.codec.request_headers())
+        _headers.update(headers)
         if type(data) is dict:
-            data = Json.dumps(data)
-            data = data.encode('utf8')
+            data = self.json.dumpb(data)
+        transfer = Transfer()
+        data = self.codec.encode_body(data, _headers, transfer)
         _query:str = ""
         if query:
-            _query = f"?{'&'.join([f'{k}={v}' for (k,v) in query.items()])}"
+            _query = f"?{urlencode(query)}"
         
-        with self.lock:
+        event = self._before_request(method, path, data) if self.hooks else None
+        retries = 0
+        while True:
+            conn, reused = self.pool.acquire()
             try:
-                self.conn.request(method=method, url=f'/{quote(path)}{_query}', body=data, headers=headers)
-                resp = self.conn.getresponse()
-                # self.conn.close()
-                return HTTPClientResponse(resp.status, resp.getheaders(), data=resp.read())
-            except BrokenPipeError:
-                self.conn = self._make_conn()
-                if retry > 0:
-                    return self.request(path=path, method=method, data=data, headers=headers, query=query, retry=retry-1)
-                
+                conn.request(method=method, url=f'/{quote(path)}{_query}', body=data, headers=_headers)
+                resp = conn.getresponse()
+                encoding = resp.getheader('Content-Encoding', '')
+                if stream:
+                    # connection goes back to pool when body is consumed
+                    ret = HTTPClientResponse(resp.status, resp.getheaders(), stream=resp,
+                                             release=lambda reusable: self.pool.release(conn, reusable),
+                                             codec=self.codec, encoding=encoding, json=self.json,
+                                             transfer=transfer)
+                    if event is not None:
+                        self._after_response(event, resp.status, reused=reused, retries=retries)
+                    return ret
+                ret = HTTPClientResponse(resp.status, resp.getheaders(),
+                                         data=self.codec.decode_body(resp.read(), encoding, transfer),
+                                         json=self.json, transfer=transfer)
+            except (ConnectionError, http.client.BadStatusLine) as err:
+                self.pool.release(conn, reusable=False)
+                # server closed keep-alive connection between health check and request,
+                # streamed body (file or iterator) can not be sent again
+                if reused and retry > 0 and (data is None or isinstance(data, bytes)):
+                    retry -= 1
+                    retries += 1
+                    continue
+                if event is not None:
+                    self._on_error(event, err, retries=retries)
+                raise
+            except BaseException as err:
+                self.pool.release(conn, reusable=False)
+                if event is not None:
+                    self._on_error(event, err, retries=retries)
+                raise
+            self.pool.release(conn, reusable=not resp.will_close)
+            if event is not None:
+                self._after_response(event, ret.status, received=len(ret._data), reused=reused, retries=retries)
+            return ret
+    
+    def transfer_stats(self) -> Dict[str, int]:
+        """Counters of transferred bytes see GzipCodec.stats"""
+        return self.codec.stats()
+    
+    def pool_stats(self) -> Dict[str, int]:
+        """Connection pool statistics see ConnectionPool.stats"""
+        return self.pool.stats()
+    
+    def close(self) -> None:
+        self.pool.close()
+    
     def __del__(self):
-        self.conn.close()
+        self.pool.close()
         
 
 class HTTPClientResponse(Response):
-    def __init__(self, status:int, headers:Any = {},  data: Any = ''):
+    def __init__(self, status:int, headers:Any = {},  data: Any = b'',
+                 stream: Optional[http.client.HTTPResponse] = None, release: Optional[Callable[[bool], None]] = None,
+                 codec: Optional[GzipCodec] = None, encoding:str = '', json: Optional[JsonCodec] = None,
+                 transfer: Optional[Transfer] = None):
         self._status = status
         self._headers = headers
         self._data = data
-
+        self._stream = stream
+        self._release = release
+        self._codec = codec or GzipCodec()
+        self._encoding = encoding
+        self.transfer = transfer or Transfer()
+        if json is not None:
+            self.json = json
 
     @property
     def status(self):
         return self._status
 
     def get_data(self) -> Any:
+        if self._stream is not None:
+            self._data = b''.join(self.iter_bytes())
         # try:
         ret = {}
         if self._data:
-            ret = Json.loads(self._data)
+            ret = self.json.loads(self._data)
         return ret
         # except json.JSONDecodeError:
         #     raise ServerError(self.body)
 
     def get_headers(self):
-        return dict(self._headers)
\ No newline at end of file
+        return dict(self._headers)
+    
+    def iter_bytes(self, chunk_size:int = 65536) -> Iterator[bytes]:
+        if self._stream is None:
+            if self._data:
+                yield self._data
+            return
+        resp, self._stream = self._stream, None
+        complete = False
+        try:
+            yield from self._codec.iter_decoded(self._read(resp, chunk_size), self._encoding, self.transfer)
+            complete = True
+            # read1 does not mark response as closed at the end of body
+            resp.close()
+        finally:
+            # connection with unread body can not be reused
+            if self._release is not None:
+                self._release(complete and not resp.will_close)
+    
+    @staticmethod
+    def _read(resp: http.client.HTTPResponse, chunk_size:int) -> Iterator[bytes]:
+        while chunk := resp.read1(chunk_size):
+            yield chunk
+    
+    def close(self) -> None:
+        """Release connection of not consumed streamed response"""
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+            if self._release is not None:
+                self._release(False)
+    
+    def __del__(self):
+        self.close()
@@ -0,0 +1,105 @@
+import select
+import time
+from threading import Condition
+from typing import Any, Callable, Dict, List, Tuple
+import http.client
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive http.client connections to single host
+
+    Args:
+        factory (Callable): function returning new, not connected HTTPConnection
+        max_size (int): maximum number of connections to host
+        idle_timeout (float): seconds after which idle connection is closed
+        block_timeout (float): seconds to wait for free connection when pool is full, None waits forever
+    """
+    def __init__(self, factory: Callable[[], http.client.HTTPConnection], max_size:int = 10,
+                 idle_timeout:float = 60.0, block_timeout:Any = None) -> None:
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.block_timeout = block_timeout
+        self._cond = Condition()
+        self._idle: List[Tuple[http.client.HTTPConnection, float]] = []
+        self._in_use = 0
+        self._stats: Dict[str, int] = {'created': 0, 'reused': 0, 'discarded': 0, 'evicted': 0, 'waits': 0}
+
+    def acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """Get connection from pool, blocks when max_size connections are in use
+
+        Returns:
+            tuple: connection, True if connection was reused
+        """
+        with self._cond:
+            while True:
+                self._evict_expired()
+                while self._idle:
+                    conn, _ = self._idle.pop()
+                    if self._is_alive(conn):
+                        self._in_use += 1
+                        self._stats['reused'] += 1
+                        return conn, True
+                    conn.close()
+                    self._stats['discarded'] += 1
+
+                if self._in_use < self.max_size:
+                    self._in_use += 1
+                    self._stats['created'] += 1
+                    return self.factory(), False
+
+                self._stats['waits'] += 1
+                if not self._cond.wait(timeout=self.block_timeout):
+                    raise PoolTimeout(f'No free connection in pool after {self.block_timeout}s')
+
+    def release(self, conn: http.client.HTTPConnection, reusable:bool = True) -> None:
+        """Return connection to pool, not reusable connection is closed"""
+        with self._cond:
+            self._in_use -= 1
+            if reusable and conn.sock is not None:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                conn.close()
+                self._stats['discarded'] += 1
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """Pool statistics
+
+        Returns:
+            dict: max_size, in_use, idle and counters of created, reused, discarded,
+                  evicted (idle timeout) connections and waits for free connection
+        """
+        with self._cond:
+            ret = self._stats.copy()
+            ret.update({'max_size': self.max_size, 'in_use': self._in_use, 'idle': len(self._idle)})
+            return ret
+
+    def close(self) -> None:
+        """Close all idle connections"""
+        with self._cond:
+            while self._idle:
+                self._idle.pop()[0].close()
+
+    def _evict_expired(self) -> None:
+        deadline = time.monotonic() - self.idle_timeout
+        # idle list is ordered by release time, oldest first
+        while self._idle and self._idle[0][1] < deadline:
+            self._idle.pop(0)[0].close()
+            self._stats['evicted'] += 1
+
+    @staticmethod
+    def _is_alive(conn: http.client.HTTPConnection) -> bool:
+        # idle keep-alive socket should have nothing to read,
+        # readable means server closed it (EOF) or sent garbage
+        if conn.sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
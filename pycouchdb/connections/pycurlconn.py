@@ -1,140 +1,414 @@
 from urllib.parse import urlparse
 import pycurl
+import time
+from collections import deque
 from io import BytesIO
 from base64 import b64encode
-from threading import RLock
+from threading import local
 from . import Connection, Response
-from ..json import Json
-from urllib.parse import quote
-from typing import Dict, Any
+from ..metrics import RequestEvent
+from .compression import GzipCodec, Transfer
+from ..json import JsonCodec
+from urllib.parse import quote, urlencode
+from typing import Deque, Dict, Any, Iterable, Iterator, List, Optional
 
 
 class PyCurlConn(Connection):
-    def __init__(self, url: str, timeout:int = 5) -> None:
-        self.lock = RLock()
+    """Connection engine based on pycurl.
+    Every thread keeps its own reusable curl handles with their connections, all handles
+    share only DNS cache and SSL sessions through CurlShare.
+    Many requests can be run at once from single thread with perform_many.
+    Streamed requests use own handle, their body is read while iterating over it,
+    so continuous feeds are not limited by timeout as long as data or heartbeats come.
+
+    Args:
+        url (str): url to database server
+        timeout (int): timeout in seconds for single request
+        compress (bool): accept gzip responses (decoded by libcurl) and compress request bodies
+        compress_min_size (int): smallest request body which is compressed
+    """
+    def __init__(self, url: str, timeout:int = 5, compress:bool = False, compress_min_size:int = 1024) -> None:
         self.headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+        self.codec = GzipCodec(compress, compress_min_size)
         url_data = urlparse(url)
         self.timeout = timeout
         self.user = url_data.username
         self.password = url_data.password
         self.url = f'{url_data.scheme}://{url_data.hostname}:{int(url_data.port or 5984)}'
-        self.curl = None
         if self.user and self.password:
             self.headers['Authorization'] = f"Basic {b64encode(f'{self.user}:{self.password}'.encode('utf-8')).decode('ascii')}"
-    
-    def get(self, path: str, query: Dict[str, Any]) -> Response:
-        buffer = BytesIO()
-        ret = PyCurlResponse()
-        self.curl = pycurl.Curl()
-        self.set_url(path=path, query=query)
-        self.curl.setopt(pycurl.WRITEFUNCTION, buffer.write)
-        self.curl.perform()
-        ret.set_status(self.curl.getinfo(pycurl.HTTP_CODE))
-        ret.set_data(buffer.getvalue())
-        self.curl.close()
-        return ret
-    
-    def post(self, path: str, data: Any, headers: Dict[str, str] = {}, query: Dict[str, Any] = {}) -> Response:
-        buffer = BytesIO()
-        self.curl = pycurl.Curl()
-        self.set_url(path=path, query=query)
-        ret = PyCurlResponse()
-        self.curl.setopt(pycurl.WRITEFUNCTION, buffer.write)
-        if data:
-            self.curl.setopt(pycurl.POSTFIELDS, self.set_data(data))
-        self.curl.perform()
-        ret.set_status(self.curl.getinfo(pycurl.HTTP_CODE))
-        ret.set_data(buffer.getvalue())
-        self.curl.close()
-        return ret
-    
-    def put(self, path: str, data: Any = {}, headers: Dict[str, str] = {}, query: Dict[str, Any] = {}) -> Response:
-        buffer = BytesIO()
-        ret = PyCurlResponse()
-        self.curl = pycurl.Curl()
-        self.set_url(path=path, query=query)
-        self.curl.setopt(pycurl.HEADERFUNCTION, ret.put_header)
-        self.curl.setopt(pycurl.WRITEFUNCTION, buffer.write)
-        self.curl.setopt(pycurl.CUSTOMREQUEST, 'PUT')
-        if data:
-            self.curl.setopt(pycurl.POSTFIELDS, self.set_data(data))
-        self.curl.perform()
-        ret.set_status(self.curl.getinfo(pycurl.HTTP_CODE))
-        ret.set_data(buffer.getvalue())
-        self.curl.close()
-        return ret
-    
+
+        self.share = pycurl.CurlShare()
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+        self._local = local()
+
+    def get(self, path: str = '', query: Dict[str, Any] = {}, headers: Dict[str, str] = {}, stream:bool = False) -> Response:
+        return self.request(path, method='GET', query=query, headers=headers, stream=stream)
+
+    def post(self, path: str = '', data: Any = None, headers: Dict[str, str] = {}, query: Dict[str, Any] = {}, stream:bool = False) -> Response:
+        return self.request(path, method='POST', data=data, headers=headers, query=query, stream=stream)
+
+    def put(self, path: str = '', data: Any = None, headers: Dict[str, str] = {}, query: Dict[str, Any] = {}) -> Response:
+        return self.request(path, method='PUT', data=data, headers=headers, query=query)
+
     def delete(self, path: str, query: Dict[str, Any] = {}) -> Response:
-        buffer = BytesIO()
-        self.curl = pycurl.Curl()
-        ret = PyCurlResponse()
-        self.set_url(path=path, query=query)
-        self.curl.setopt(pycurl.WRITEFUNCTION, buffer.write)
-        self.curl.setopt(pycurl.CUSTOMREQUEST, 'DELETE')
-        self.curl.perform()
-        ret.set_status(self.curl.getinfo(pycurl.HTTP_CODE))
-        ret.set_data(buffer.getvalue())
-        self.curl.close()
-        return ret
-    
+        return self.request(path, method='DELETE', query=query)
+
     def head(self, path: str, query: Dict[str, Any] = {}) -> Response:
+        return self.request(path, method='HEAD', query=query)
+
+    def request(self, path:str, method:str='GET', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={},
+                stream:bool = False) -> Response:
+        if stream:
+            return self._stream(path, method=method, data=data, headers=headers, query=query)
+        curl = self._handle()
+        ret = PyCurlResponse(json=self.json)
         buffer = BytesIO()
-        ret = PyCurlResponse()
-        self.curl = pycurl.Curl()
-        self.set_url(path=path, query=query)
-        self.curl.setopt(pycurl.HEADERFUNCTION, ret.put_header)
-        self.curl.setopt(pycurl.NOBODY, True)
-        self.curl.perform()
-        ret.set_status(self.curl.getinfo(pycurl.HTTP_CODE))
+        data = self._prepare(curl, ret, buffer, path=path, method=method, data=data, headers=headers, query=query)
+        event = self._before_request(method, path, data) if self.hooks else None
+        try:
+            curl.perform()
+        except pycurl.error as err:
+            if event is not None:
+                self._on_error(event, err)
+            raise
+        ret.set_status(curl.getinfo(pycurl.HTTP_CODE))
         ret.set_data(buffer.getvalue())
-        self.curl.close()
+        self._count_received(curl, buffer, ret.transfer)
+        if event is not None:
+            self._finished(event, curl, ret)
         return ret
-        
+
+    def _stream(self, path:str, method:str, data:Any, headers:Dict[str, str], query:Dict[str, Any]) -> Response:
+        """Start request and return response after its headers, body is read by iter_bytes"""
+        curl = self._new_handle()
+        ret = PyCurlResponse(json=self.json)
+        reader = _CurlStream(self, curl, ret)
+        data = self._prepare(curl, ret, reader, path=path, method=method, data=data, headers=headers, query=query)
+        # whole transfer of feed is not limited, _CurlStream fails when no data comes for timeout
+        curl.setopt(pycurl.TIMEOUT, 0)
+        curl.setopt(pycurl.CONNECTTIMEOUT, self.timeout)
+        curl.setopt(pycurl.HEADERFUNCTION, reader.header)
+        event = self._before_request(method, path, data) if self.hooks else None
+        try:
+            reader.start()
+        except pycurl.error as err:
+            if event is not None:
+                self._on_error(event, err)
+            raise
+        ret.set_status(curl.getinfo(pycurl.HTTP_CODE))
+        ret._stream = reader
+        if event is not None:
+            self._finished(event, curl, ret)
+        return ret
+
+    def perform_many(self, requests: List[Dict[str, Any]], max_in_flight:int = 16) -> List[Response]:
+        """Run many requests at once from current thread using CurlMulti
+
+        Args:
+            requests (list): list of dicts with keys path, method and optional data, headers, query
+            max_in_flight (int): maximum number of requests send at the same time
+
+        Returns:
+            list: responses in order of requests
+
+        Raises:
+            pycurl.error: first transfer error, after all other requests are finished
+
+        Example:
+            >>> conn.perform_many([{'method': 'GET', 'path': f'db/{doc_id}'} for doc_id in ids])
+        """
+        multi = self._multi()
+        free: List[pycurl.Curl] = self._local.multi_handles
+        results: List[Optional[Response]] = [None] * len(requests)
+        pending = list(enumerate(requests))
+        pending.reverse()
+        error: Optional[pycurl.error] = None
+        active = 0
+
+        while pending or active:
+            while pending and active < max_in_flight:
+                index, req = pending.pop()
+                curl = free.pop() if free else self._new_handle()
+                curl.index = index
+                curl.response = PyCurlResponse(json=self.json)
+                curl.buffer = BytesIO()
+                data = self._prepare(curl, curl.response, curl.buffer, **req)
+                curl.event = self._before_request(req.get('method', 'GET'), req['path'], data) if self.hooks else None
+                multi.add_handle(curl)
+                active += 1
+
+            while multi.perform()[0] == pycurl.E_CALL_MULTI_PERFORM:
+                pass
+
+            while True:
+                queued, ok_list, err_list = multi.info_read()
+                for curl in ok_list:
+                    curl.response.set_status(curl.getinfo(pycurl.HTTP_CODE))
+                    curl.response.set_data(curl.buffer.getvalue())
+                    self._count_received(curl, curl.buffer, curl.response.transfer)
+                    results[curl.index] = curl.response
+                    if curl.event is not None:
+                        self._finished(curl.event, curl, curl.response)
+                for curl, errno, errmsg in err_list:
+                    if error is None:
+                        error = pycurl.error(errno, errmsg)
+                    if curl.event is not None:
+                        self._on_error(curl.event, pycurl.error(errno, errmsg))
+                for curl in ok_list + [err[0] for err in err_list]:
+                    multi.remove_handle(curl)
+                    curl.buffer = curl.response = curl.event = None
+                    free.append(curl)
+                    active -= 1
+                if not queued:
+                    break
+
+            if active:
+                multi.select(1.0)
+
+        if error is not None:
+            raise error
+        return results
+
+    def transfer_stats(self) -> Dict[str, int]:
+        """Counters of transferred bytes see GzipCodec.stats"""
+        return self.codec.stats()
+
+    def _finished(self, event: RequestEvent, curl: pycurl.Curl, ret: 'PyCurlResponse') -> None:
+        # no new connection was made when existing one was reused
+        self._after_response(event, ret.status, received=len(ret._data),
+                             reused=curl.getinfo(pycurl.NUM_CONNECTS) == 0)
+
+    def _count_received(self, curl: pycurl.Curl, buffer: Any, transfer: Transfer) -> None:
+        # SIZE_DOWNLOAD is size of body before libcurl decoded it
+        self.codec.count_received(buffer.tell(), int(curl.getinfo(pycurl.SIZE_DOWNLOAD)), transfer)
+
+    def close(self) -> None:
+        """Close curl handles of current thread"""
+        if (curl := getattr(self._local, 'curl', None)) is not None:
+            curl.close()
+            del self._local.curl
+        if (multi := getattr(self._local, 'multi', None)) is not None:
+            for curl in self._local.multi_handles:
+                curl.close()
+            multi.close()
+            del self._local.multi
+
+    def _handle(self) -> pycurl.Curl:
+        curl = getattr(self._local, 'curl', None)
+        if curl is None:
+            curl = self._local.curl = self._new_handle()
+        return curl
+
+    def _multi(self) -> pycurl.CurlMulti:
+        multi = getattr(self._local, 'multi', None)
+        if multi is None:
+            multi = self._local.multi = pycurl.CurlMulti()
+            self._local.multi_handles = []
+        return multi
+
+    def _new_handle(self) -> pycurl.Curl:
+        curl = pycurl.Curl()
+        curl.setopt(pycurl.SHARE, self.share)
+        return curl
+
+    def _prepare(self, curl: pycurl.Curl, ret: 'PyCurlResponse', buffer: Any, path:str, method:str='GET',
+                 data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}) -> Any:
+        """Set options of handle for request, returns request body as it is sent"""
+        # reset clears options only, share and connections of handle stay attached
+        curl.reset()
+        curl.setopt(pycurl.TIMEOUT, self.timeout)
+        # body is encoded first, compression sets Content-Encoding header
+        _headers = dict(self.codec.request_headers(), **headers)
+        data = self.codec.encode_body(self.set_data(data), _headers, ret.transfer)
+        self.set_url(curl, path=path, headers=_headers, query=query)
+        curl.setopt(pycurl.HEADERFUNCTION, ret.put_header)
+        curl.setopt(pycurl.WRITEFUNCTION, buffer.write)
+        if self.codec.enabled:
+            curl.setopt(pycurl.ENCODING, 'gzip')
+        if method == 'HEAD':
+            curl.setopt(pycurl.NOBODY, True)
+        elif method != 'GET':
+            curl.setopt(pycurl.CUSTOMREQUEST, method)
+            if method in ('POST', 'PUT'):
+                if data is None or isinstance(data, bytes):
+                    curl.setopt(pycurl.POSTFIELDS, data or b'')
+                else:
+                    # file-like object or iterator of bytes is sent with chunked encoding
+                    curl.setopt(pycurl.UPLOAD, True)
+                    curl.setopt(pycurl.READFUNCTION, data.read if hasattr(data, 'read') else _IterReader(data).read)
+        return data
+
     def set_data(self, data:Any):
         if type(data) is dict:
-            data = Json.dumps(data)
-            data = data.encode('utf8')
+            data = self.json.dumpb(data)
         return data
-    
-    def set_url(self, path:str, headers:Dict[str, str]={}, query:Dict[str, Any]={}) -> None:
-        headers.update(self.headers)
-        
+
+    def set_url(self, curl: pycurl.Curl, path:str, headers:Dict[str, str]={}, query:Dict[str, Any]={}) -> None:
+        _headers = self.headers.copy()
+        _headers.update(headers)
+
         _query:str = ""
         if query:
-            _query = f"?{'&'.join([f'{k}={v}' for (k,v) in query.items()])}"
-            
-        self.curl.setopt(pycurl.URL, f'{self.url}/{quote(path)}{_query}')
-        if headers:
-            self.curl.setopt(pycurl.HTTPHEADER, [f'{k}:{v}' for (k,v) in headers.items()])
-        
+            _query = f"?{urlencode(query)}"
+
+        curl.setopt(pycurl.URL, f'{self.url}/{quote(path)}{_query}')
+        curl.setopt(pycurl.HTTPHEADER, [f'{k}:{v}' for (k,v) in _headers.items()])
+
+
+
+class _IterReader:
+    """File-like read over iterator of bytes for curl READFUNCTION"""
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._rest = b''
+
+    def read(self, size: int) -> bytes:
+        while not self._rest:
+            if (chunk := next(self._chunks, None)) is None:
+                return b''
+            self._rest = chunk
+        ret, self._rest = self._rest[:size], self._rest[size:]
+        return ret
+
+
+class _CurlStream:
+    """Transfer of streamed response run by own CurlMulti from the thread reading the body.
+    Like socket timeout of other engines, it fails when nothing is received for timeout of connection.
+    """
+    def __init__(self, conn: PyCurlConn, curl: pycurl.Curl, ret: 'PyCurlResponse') -> None:
+        self.conn = conn
+        self.curl = curl
+        self.ret = ret
+        self.multi: Optional[pycurl.CurlMulti] = None
+        self.chunks: Deque[bytes] = deque()
+        self.size = 0
+        self.done = False
+        self.received_at = time.monotonic()
+
+    def header(self, line: bytes) -> None:
+        self.received_at = time.monotonic()
+        self.ret.put_header(line)
+
+    def write(self, chunk: bytes) -> None:
+        self.received_at = time.monotonic()
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+
+    def tell(self) -> int:
+        return self.size
+
+    def start(self) -> None:
+        """Run transfer until headers of final response are received"""
+        self.multi = pycurl.CurlMulti()
+        self.multi.add_handle(self.curl)
+        try:
+            self._perform()
+            while not self.ret._complete and not self.done:
+                self._wait()
+        except BaseException:
+            self.close()
+            raise
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            while True:
+                if self.chunks:
+                    yield self.chunks.popleft()
+                elif self.done:
+                    return
+                else:
+                    self._wait()
+        finally:
+            self.close()
+
+    def _wait(self) -> None:
+        timeout = self.conn.timeout
+        if time.monotonic() - self.received_at > timeout:
+            raise pycurl.error(pycurl.E_OPERATION_TIMEDOUT, f'Nothing received for {timeout} seconds')
+        self.multi.select(min(1.0, timeout))
+        self._perform()
+
+    def _perform(self) -> None:
+        while self.multi.perform()[0] == pycurl.E_CALL_MULTI_PERFORM:
+            pass
+        _, ok_list, err_list = self.multi.info_read()
+        if ok_list or err_list:
+            self.done = True
+        if err_list:
+            _, errno, errmsg = err_list[0]
+            raise pycurl.error(errno, errmsg)
+
+    def close(self) -> None:
+        if self.multi is None:
+            return
+        self.conn._count_received(self.curl, self, self.ret.transfer)
+        self.multi.remove_handle(self.curl)
+        self.multi.close()
+        self.curl.close()
+        self.multi = None
+        self.done = True
 
 
 class PyCurlResponse(Response):
-    def __init__(self, status:int = 500, data:Any = {}) -> None:
+    def __init__(self, status:int = 500, data:Any = b'', json: Optional[JsonCodec] = None) -> None:
+        if json is not None:
+            self.json = json
+        self.transfer = Transfer()
         self._status = status
         self._data = data
-        self._headers = {}
-    
+        self._headers: Dict[str, str] = {}
+        # headers of final response were received, streamed body is read by _stream
+        self._complete = False
+        self._stream: Optional[_CurlStream] = None
+
     def set_status(self, status:int):
         self._status = status
-        
+
     @property
     def status(self) -> int:
         return self._status
-    
+
     def set_data(self, data:Any):
         self._data = data
-    
+
     def get_data(self) -> Any:
-         return Json.loads(self._data) 
-    
+        if self._stream is not None:
+            self._data = b''.join(self.iter_bytes())
+        ret = {}
+        if self._data:
+            ret = self.json.loads(self._data)
+        return ret
+
     def get_headers(self) -> Any:
         return self._headers.copy()
-    
+
+    def iter_bytes(self, chunk_size:int = 65536) -> Iterator[bytes]:
+        if self._stream is not None:
+            stream, self._stream = self._stream, None
+            yield from stream
+            return
+        view = memoryview(self._data)
+        for i in range(0, len(view), chunk_size):
+            yield bytes(view[i:i + chunk_size])
+
+    def close(self) -> None:
+        """Stop transfer of not consumed streamed response"""
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
     def put_header(self, head_line:bytes):
-        if (line := head_line.decode()).find(":") > 0:
+        if head_line.startswith(b'HTTP/'):
+            # new status line after redirect or 100 Continue
+            self._headers.clear()
+            self._status = int(head_line.split(b' ', 2)[1])
+        elif not head_line.strip():
+            # end of header block, 1xx responses are followed by final one
+            self._complete = self._status >= 200
+        elif (line := head_line.decode('latin-1')).find(":") > 0:
                 key , val = line.split(':', 1)
                 self._headers[key.strip()] = val.strip()
-        
-        
-    
\ No newline at end of file
+
+
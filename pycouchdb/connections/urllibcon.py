@@ -1,19 +1,28 @@
 import urllib.error
 from urllib.parse import urlparse
-from urllib.parse import quote
+from urllib.parse import quote, urlencode
 from urllib.request import urlopen, Request
-from threading import RLock
 from base64 import b64encode
 from http.client import HTTPResponse
-from ..json import Json
+from ..json import JsonCodec
 from . import Connection , Response
-from typing import Dict, Any
+from .compression import GzipCodec, Transfer
+from typing import Dict, Any, Iterator, Optional
 
-# TODO auth , connectionpool ?
+# TODO auth
 class UrllibConn(Connection):
-    def __init__(self, url:str = 'http://localhost:5984', timeout:int=5):
-        self.lock = RLock()
+    """Connection engine based on urllib, opens new connection for every request.
+    Requests from many threads run in parallel, for persistent connections use HttpClientConn
+
+    Args:
+        url (str): url to database server
+        timeout (int): timeout in seconds
+        compress (bool): accept gzip responses and compress request bodies
+        compress_min_size (int): smallest request body which is compressed
+    """
+    def __init__(self, url:str = 'http://localhost:5984', timeout:int=5, compress:bool = False, compress_min_size:int = 1024):
         self.headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+        self.codec = GzipCodec(compress, compress_min_size)
         url_data = urlparse(url)
         self.timeout = timeout
         self.user = url_data.username
@@ -27,11 +36,11 @@ class UrllibConn(Connection):
         if self.user and self.password:
             self.headers['Authorization'] = f"Basic {b64encode(f'{self.user}:{self.password}'.encode('utf-8')).decode('ascii')}"
     
-    def get(self, path:str='', query:Dict[str,Any]={}):
-        return self.request(method='GET', path=path, query=query)
+    def get(self, path:str='', query:Dict[str,Any]={}, headers:Dict[str, str]={}, stream:bool=False):
+        return self.request(method='GET', path=path, query=query, headers=headers, stream=stream)
 
-    def post(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}):
-        return self.request(path, method='POST', data=data, headers=headers, query=query)
+    def post(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}, stream:bool=False):
+        return self.request(path, method='POST', data=data, headers=headers, query=query, stream=stream)
 
     def put(self, path:str='', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}):
         return self.request(path, method='PUT', data=data, headers=headers, query=query)
@@ -42,44 +51,89 @@ class UrllibConn(Connection):
     def head(self, path:str, query:Dict[str, Any]={}):
         return self.request(path, method='HEAD', query=query)
     
-    def request(self, path:str, method:str='GET', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}) -> Response:
-        headers.update(self.headers)
+    def request(self, path:str, method:str='GET', data:Any=None, headers:Dict[str, str]={}, query:Dict[str, Any]={}, stream:bool=False) -> Response:
+        _headers = self.headers.copy()
+        _headers.update(self.codec.request_headers())
+        _headers.update(headers)
         if type(data) is dict:
-            data = Json.dumps(data)
-            data = data.encode('utf8')
+            data = self.json.dumpb(data)
+        transfer = Transfer()
+        data = self.codec.encode_body(data, _headers, transfer)
         _query:str = ""
         if query:
-            _query = f"?{'&'.join([f'{k}={v}' for (k,v) in query.items()])}"
+            _query = f"?{urlencode(query)}"
             
-        req = Request(url=f'{self.url}/{quote(path)}{_query}', method=method, data=data, headers=headers)
-        with self.lock:    
-            try:
-                resp = urlopen(req)
-                return UrllibResponse(resp)
-            except urllib.error.HTTPError as err:
-                return UrllibResponseError(err)
+        req = Request(url=f'{self.url}/{quote(path)}{_query}', method=method, data=data, headers=_headers)
+        event = self._before_request(method, path, data) if self.hooks else None
+        ret: UrllibResponse
+        try:
+            resp = urlopen(req)
+            ret = UrllibResponse(resp, stream=stream, codec=self.codec, json=self.json, transfer=transfer)
+        except urllib.error.HTTPError as err:
+            ret = UrllibResponseError(err, codec=self.codec, json=self.json, transfer=transfer)
+        except Exception as err:
+            if event is not None:
+                self._on_error(event, err)
+            raise
+        if event is not None:
+            self._after_response(event, ret.status, received=len(ret.body or b''))
+        return ret
+    
+    def transfer_stats(self) -> Dict[str, int]:
+        """Counters of transferred bytes see GzipCodec.stats"""
+        return self.codec.stats()
 
 class UrllibResponse(Response):
-    def __init__(self, resp: HTTPResponse):
+    def __init__(self, resp: HTTPResponse, stream:bool = False, codec: Optional[GzipCodec] = None,
+                 json: Optional[JsonCodec] = None, transfer: Optional[Transfer] = None):
         self.resp = resp
+        if json is not None:
+            self.json = json
         self._headers: Dict[str, str] = {}
-        if resp.readable:
-            self.body = resp.read()
+        self.codec = codec or GzipCodec()
+        self.transfer = transfer or Transfer()
+        self.encoding = resp.headers.get('Content-Encoding', '')
+        self.body: Optional[bytes] = None
+        if not stream:
+            self.body = self.codec.decode_body(resp.read(), self.encoding, self.transfer)
             
     @property
     def status(self):
         return self.resp.status
 
     def get_data(self) -> Any:
+        if self.body is None:
+            self.body = b''.join(self.iter_bytes())
         # try:
-        return Json.loads(self.body.decode())
+        return self.json.loads(self.body)
         # except json.JSONDecodeError:
         #     raise ServerError(self.body)
 
     def get_headers(self):
         return self.resp.headers
+    
+    def iter_bytes(self, chunk_size:int = 65536) -> Iterator[bytes]:
+        if self.body is not None:
+            yield self.body
+            return
+        try:
+            yield from self.codec.iter_decoded(self._read(chunk_size), self.encoding, self.transfer)
+        finally:
+            self.resp.close()
+    
+    def _read(self, chunk_size:int) -> Iterator[bytes]:
+        # read1 returns what is available, so feeds with heartbeats are not blocked
+        while chunk := self.resp.read1(chunk_size):
+            yield chunk
 
 class UrllibResponseError(UrllibResponse):
-    def __init__(self, resp: urllib.error.HTTPError):
+    def __init__(self, resp: urllib.error.HTTPError, codec: Optional[GzipCodec] = None,
+                 json: Optional[JsonCodec] = None, transfer: Optional[Transfer] = None):
         self.resp = resp
-        self._headers: Dict[str, str] = {}
\ No newline at end of file
+        if json is not None:
+            self.json = json
+        self._headers: Dict[str, str] = {}
+        self.codec = codec or GzipCodec()
+        self.transfer = transfer or Transfer()
+        self.encoding = resp.headers.get('Content-Encoding', '')
+        self.body = self.codec.decode_body(resp.read(), self.encoding, self.transfer)
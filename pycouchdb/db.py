@@ -12,23 +12,40 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from __future__ import annotations
-from .connections import Connection
+import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from .advisor import IndexAdvisor
+from .bulk import BulkWriter
+from .cache import Cache, QueryCache
+from .changes import ChangesFeed, Checkpoint
+from .connections import Connection, Response
+from .doc import Document
 from .exceptions import DatabaseError
-from .query import FindQuery, IndexQuery
-from typing import Any, Dict, Iterator, List, Tuple
+from .json import Json
+from .multipart import iter_documents
+from .query import FindQuery, IndexQuery, ViewQuery
+from .session import Session
+from .stream import iter_rows, object_fields
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-# TODO Attchement
 class Database:
     
-    def __init__(self, name:str, connection: Connection):
+    def __init__(self, name:str, connection: Connection, cache: Optional[Cache] = None,
+                 query_cache: Optional[QueryCache] = None):
         """Class for db operations
         
         Args:
             name (str): Database name
             connection (Connection): instance of connection to server  
+            cache (Cache): optional document cache used by get
+            query_cache (QueryCache): optional cache of view results
         """
         self.conn = connection
         self.name = name
+        self.cache = cache
+        self.query_cache = query_cache
+        self.advisor: Optional[IndexAdvisor] = None
 
     def doc_info(self, doc_id:str) -> Dict[str, Any]:
         """Minimal amount of information about the specified document.
@@ -88,8 +105,49 @@ class Database:
         else:
             raise DatabaseError(resp.status, messeage=f"Err {doc}")
     
-    def add_many(self, docs: List[Dict[Any, Any]]):
-        resp = self.conn.post(path=f'{self.name}/_bulk_docs', data={'docs': docs})
+    def bulk_writer(self, max_docs: int = 500, max_bytes: int = 4 * 1024 * 1024,
+                    flush_interval: float = 1.0, max_buffered: int = 0) -> BulkWriter:
+        """Buffered writer which sends documents with _bulk_docs from background thread,
+        see pycouchdb.bulk.BulkWriter
+
+        Args:
+            max_docs (int): documents in one request
+            max_bytes (int): approximate size of one request
+            flush_interval (float): maximum time in seconds document waits in buffer
+            max_buffered (int): add blocks when so many documents wait
+
+        Returns:
+            BulkWriter: writer, use it as context manager to flush on exit
+        """
+        return BulkWriter(self, max_docs=max_docs, max_bytes=max_bytes,
+                          flush_interval=flush_interval, max_buffered=max_buffered)
+
+    def session(self) -> Session:
+        """Unit of work with identity map and change tracking, see pycouchdb.session.Session
+
+        Returns:
+            Session: session, use it as context manager to commit on exit
+        """
+        return Session(self)
+
+    def add_many(self, docs: List[Dict[Any, Any]], new_edits: bool = True):
+        """Creates documents with _bulk_docs
+        
+        Args:
+            docs (list): documents, lazy Document is sent as raw JSON
+            new_edits (bool): if False documents are stored with revisions from their _rev,
+                              used to restore or replicate documents
+        
+        Returns:
+            list: result for every document, with new_edits=False only errors
+        
+        Raises:
+            DatabaseError
+        """
+        options: Dict[str, Any] = {}
+        if not new_edits:
+            options['new_edits'] = False
+        resp = self.conn.post(path=f'{self.name}/_bulk_docs', data=self._bulk_docs_body(docs, options))
         if resp.status == 201:
             return resp.get_data()
         elif resp.status == 400:
@@ -107,6 +165,8 @@ class Database:
             doc_id (str): Document ID
             attachments (bool): Includes attachments bodies in response.Default is false
             att_encoding_info (bool): Includes encoding
+            atts_since (list): Includes bodies of attachments changed since given revisions,
+                               others are returned as stubs
         
         Returns: 
             Document
@@ -136,57 +196,185 @@ class Database:
         headers: Dict[str,str] = {}
         
         if attachments:
-            headers.update({'Accept': 'application/json, multipart/related, multipart/mixed, text/plain'})
             query['attachments'] =  'true'
         
+        if atts_since:
+            query['atts_since'] = Json.dumps(atts_since)
+        
         if att_encoding_info:
             query['att_encoding_info'] = 'true'
         
         if rev:
             query['rev'] = rev
         
+        # only plain reads of latest revision go through cache
+        key = f'{self.name}/{doc_id}'
+        entry = None
+        if self.cache is not None and not query:
+            entry, fresh = self.cache.lookup(key)
+            if fresh:
+                return entry.load()
+            if entry is not None:
+                headers['If-None-Match'] = f'"{entry.rev}"'
         
-        resp = self.conn.get(f'{self.name}/{doc_id}', query=query)
-        if resp.status in (200, 304):
-            return resp.get_data()
+        resp = self.conn.get(key, query=query, headers=headers)
+        if resp.status == 304 and entry is not None:
+            return self.cache.revalidated(entry)
+        elif resp.status in (200, 304):
+            doc = resp.get_data()
+            if self.cache is not None and not query:
+                self.cache.put(key, doc, codec=self.conn.json)
+            return doc
         elif resp.status == 400:
             raise DatabaseError(messeage='The format of the request or revision was invalid')
         elif resp.status == 404:
             # Specified database or document ID doesn’t exists
+            if self.cache is not None:
+                self.cache.invalidate(key)
             return {}
         else:
             raise DatabaseError(resp.status)
     
-    def get_many(self,  ids: List[Dict[str, str]]) -> List[Dict[Any, Any]]:
+    def get_many(self,  ids: List[Dict[str, str]], attachments:bool = False, lazy:bool = False) -> List[Dict[Any, Any]]:
         """Get document list
         
         Args:
             ids (list): list of dict {'id': 'someid'}
+            attachments (bool): include attachments, they are transferred as multipart
+                                and their raw bodies are in _attachments[name]['data']
+            lazy (bool): documents are Document instances holding raw JSON, parsed on first access,
+                         ignored with attachments
             
         Returns: 
-            list: Document list
+            list: Document list, {'id': ..., 'docs': [{'ok': doc} or {'error': ...}]} for every id
         
         Raises:
             DatabaseError
         """
-        headers:Dict[str,str] = {'Accept': 'application/json, multipart/related, multipart/mixed'}
-                
-        resp = self.conn.post(path=f'{self.name}/_bulk_get', data={'docs': ids}, headers=headers)
-        if resp.status == 200:
-            ret = resp.get_data()
-            return ret.get('results', [])
-        elif resp.status == 400:
-            raise DatabaseError(messeage='The request provided invalid JSON data or invalid query parameter')
+        if lazy and not attachments:
+            return self._bulk_get_lazy(ids)
+        if not attachments:
+            resp = self.conn.post(path=f'{self.name}/_bulk_get', data={'docs': ids})
+            if resp.status == 200:
+                ret = resp.get_data()
+                return ret.get('results', [])
+            raise self._bulk_get_error(resp.status)
+        
+        results: List[Dict[str, Any]] = []
+        for doc in self.iter_many(ids, attachments=True):
+            doc_id = doc.get('_id', doc.get('id'))
+            if not results or results[-1]['id'] != doc_id:
+                results.append({'id': doc_id, 'docs': []})
+            results[-1]['docs'].append({'error': doc} if 'error' in doc else {'ok': doc})
+        return results
+    
+    def _bulk_get_lazy(self, ids: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        resp = self.conn.post(path=f'{self.name}/_bulk_get', data={'docs': ids}, stream=True)
+        if resp.status != 200:
+            raise self._bulk_get_error(resp.status)
+        loads = self.conn.json.loads
+        results: List[Dict[str, Any]] = []
+        for result in resp.iter_rows(keys=('results',), raw=True):
+            fields = object_fields(result, ('id', 'docs'))
+            docs: List[Dict[str, Any]] = []
+            for item in iter_rows([fields.get('docs', b'[]')], raw=True):
+                value = object_fields(item, ('ok', 'error'))
+                if 'ok' in value:
+                    docs.append({'ok': Document.from_json(value['ok'], db=self, codec=self.conn.json)})
+                else:
+                    docs.append({'error': loads(value.get('error', b'{}'))})
+            results.append({'id': loads(fields.get('id', b'""')), 'docs': docs})
+        return results
+    
+    def iter_many(self, ids: List[Dict[str, str]], attachments:bool = False) -> Iterator[Dict[str, Any]]:
+        """Iterator of documents from _bulk_get, response is requested as multipart/mixed
+        and parsed part by part
+        
+        Args:
+            ids (list): list of dict {'id': 'someid'} with optional rev
+            attachments (bool): include attachments as raw bytes in _attachments[name]['data']
+        
+        Yields:
+            dict: Document or error with id, rev, error and reason
+        
+        Raises:
+            DatabaseError
+        """
+        query = {'attachments': 'true'} if attachments else {}
+        resp = self.conn.post(path=f'{self.name}/_bulk_get', data={'docs': ids}, query=query,
+                              headers={'Accept': 'multipart/mixed'}, stream=True)
+        if resp.status != 200:
+            raise self._bulk_get_error(resp.status)
+        content_type = resp.get_headers().get('Content-Type', '')
+        if content_type.startswith('multipart/'):
+            yield from iter_documents(resp.iter_bytes(), content_type, self.conn.json)
         else:
+            for result in resp.get_data().get('results', []):
+                for doc in result.get('docs', []):
+                    yield doc.get('ok') or doc.get('error', {})
+    
+    def open_revs(self, doc_id:str, revs: Union[str, List[str]] = 'all', attachments:bool = False,
+                  latest:bool = False) -> Iterator[Dict[str, Any]]:
+        """Iterator of leaf revisions of document, response is requested as multipart/mixed
+        
+        Args:
+            doc_id (str): Document ID
+            revs (str or list): 'all' for all leaf revisions or list of revisions
+            attachments (bool): include attachments as raw bytes in _attachments[name]['data']
+            latest (bool): return latest leaf revision for every requested revision
+        
+        Yields:
+            dict: Document or {'missing': rev}
+        
+        Raises:
+            DatabaseError
+        """
+        query: Dict[str, Any] = {'open_revs': revs if revs == 'all' else Json.dumps(revs)}
+        if attachments:
+            query['attachments'] = 'true'
+        if latest:
+            query['latest'] = 'true'
+        resp = self.conn.get(path=f'{self.name}/{doc_id}', query=query,
+                             headers={'Accept': 'multipart/mixed'}, stream=True)
+        if resp.status == 400:
+            raise DatabaseError(400, messeage='The format of the request or revision was invalid')
+        elif resp.status == 404:
+            raise DatabaseError(404, messeage='Specified database or document ID doesn’t exists')
+        elif resp.status != 200:
             raise DatabaseError(resp.status)
+        content_type = resp.get_headers().get('Content-Type', '')
+        if content_type.startswith('multipart/'):
+            yield from iter_documents(resp.iter_bytes(), content_type, self.conn.json)
+        else:
+            for row in resp.get_data():
+                yield row.get('ok', row)
+    
+    def _bulk_get_error(self, status:int) -> DatabaseError:
+        if status == 400:
+            return DatabaseError(400, messeage='The request provided invalid JSON data or invalid query parameter')
+        return DatabaseError(status)
 
-    def update(self, doc_id:str, doc: Dict[str, Any], rev:str= '') -> Tuple[str, str]:
+    def update(self, doc_id:str, doc: Dict[str, Any], rev:str= '',
+               merge: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+               retries:int = 0, backoff:float = 0.05, partial:bool = False) -> Tuple[str, str]:
         """Update document in database
+        
+        When rev is given doc is stored as new version of document in single request,
+        so it has to be the full document (with partial=True it is merged into latest
+        version like without rev, rev is then only checked to be the latest revision).
+        Without rev latest version is read and doc is merged into it (or document is created).
+        On conflict (409) latest version is read again, merge is applied to it and
+        write is retried up to retries times with exponential backoff.
             
         Args:
             doc_id (str): Document ID.
             doc(dict): Document
             rev(str): Document’s revision if updating an existing document.
+            merge(callable): function returning new document from stored one,
+                             default updates stored document with doc
+            retries(int): number of retries after conflict
+            backoff(float): delay in seconds before first retry, doubled for every next one
+            partial(bool): doc given with rev contains only changed fields
             
         Returns:
             tuple: document id, revision
@@ -194,31 +382,60 @@ class Database:
         Raises:
             DatabaseError
             
+        Example:
+            >>> db.update('counter', {}, merge=lambda doc: dict(doc, hits=doc.get('hits', 0) + 1), retries=5)
         """
-        headers = {'Content-Type': 'application/json, multipart/related'}
-        _doc = self.get(doc_id, rev=rev)
-        _doc.update(doc)
+        if merge is None:
+            merge = lambda stored: dict(stored, **doc)
         
-        query = {'rev': _doc.get('_rev')}
-        
-        resp = self.conn.put(path=f'{self.name}/{doc_id}',
-                             data=_doc,
-                             query=query,
-                             headers=headers)
-        if resp.status in (201, 202):
-            ret = resp.get_data()
-            return ret.get('id'), ret.get('rev')
-        elif resp.status == 400:
-            raise DatabaseError(messeage='Invalid request body or parameters')
-        elif resp.status == 404:
-            raise DatabaseError(messeage='Specified database or document ID doesn’t exists')
-        elif resp.status == 409:
-            raise DatabaseError(messeage='Specified revision is not the latest for target document')
+        if rev and not partial:
+            _doc = dict(doc, _rev=rev)
         else:
-            raise DatabaseError(resp.status)
+            _doc = self._merged(doc_id, merge)
+            if rev:
+                # given revision must still be the latest one, otherwise write fails with 409
+                _doc['_rev'] = rev
+        
+        attempt = 0
+        while True:
+            resp = self._put(doc_id, _doc)
+            if resp.status in (201, 202):
+                ret = resp.get_data()
+                return ret.get('id'), ret.get('rev')
+            elif resp.status == 409 and attempt < retries:
+                time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+                attempt += 1
+                _doc = self._merged(doc_id, merge)
+            elif resp.status == 400:
+                raise DatabaseError(400, messeage='Invalid request body or parameters')
+            elif resp.status == 404:
+                raise DatabaseError(404, messeage='Specified database or document ID doesn’t exists')
+            elif resp.status == 409:
+                raise DatabaseError(409, messeage='Specified revision is not the latest for target document')
+            else:
+                raise DatabaseError(resp.status)
+
+    def _merged(self, doc_id:str, merge: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """Latest version of document with merge applied, _rev of stored version is kept"""
+        stored = self.get(doc_id)
+        _doc = merge(dict(stored))
+        if stored.get('_rev'):
+            _doc['_rev'] = stored['_rev']
+        return _doc
+
+    def _put(self, doc_id:str, doc: Dict[str, Any]) -> Response:
+        query = {'rev': doc['_rev']} if doc.get('_rev') else {}
+        resp = self.conn.put(path=f'{self.name}/{doc_id}', data=doc, query=query)
+        if self.cache is not None:
+            self.cache.invalidate(f'{self.name}/{doc_id}')
+        return resp
 
     def update_many(self, docs_list: List[Dict[str, str]]):        
-        resp = self.conn.post(path=f'{self.name}/_bulk_docs', data={'docs': docs_list})
+        resp = self.conn.post(path=f'{self.name}/_bulk_docs', data=self._bulk_docs_body(docs_list))
+        if self.cache is not None:
+            for doc in docs_list:
+                doc_id = doc.id if isinstance(doc, Document) else doc.get('_id')
+                self.cache.invalidate(f"{self.name}/{doc_id}")
         if resp.status == 201:
             return resp.get_data()
         elif resp.status == 400:
@@ -226,6 +443,18 @@ class Database:
         else:
             raise DatabaseError(resp.status)
     
+    def _bulk_docs_body(self, docs: List[Any], options: Dict[str, Any] = {}) -> Any:
+        """_bulk_docs request body, with Document instances it is serialized here
+        and not parsed lazy documents are copied as raw JSON"""
+        if not any(isinstance(doc, Document) for doc in docs):
+            return dict(options, docs=docs)
+        dumpb = self.conn.json.dumpb
+        body = [b'{"docs":[', b','.join(doc.raw if isinstance(doc, Document) else dumpb(doc) for doc in docs), b']']
+        for key, value in options.items():
+            body.append(b',' + dumpb(key) + b':' + dumpb(value))
+        body.append(b'}')
+        return b''.join(body)
+    
     def delete(self, doc_id:str, rev:str='') -> Tuple[str, str]:
         """Marks the specified document as deleted
         
@@ -247,6 +476,8 @@ class Database:
             query={'rev': info.get('rev', '')}
             
         resp = self.conn.delete(path=f'{self.name}/{doc_id}', query=query)
+        if self.cache is not None:
+            self.cache.invalidate(f'{self.name}/{doc_id}')
         if resp.status in (200, 202):
             ret = resp.get_data()
             return ret.get('id'), ret.get('rev')
@@ -259,36 +490,357 @@ class Database:
         else:
             raise DatabaseError(resp.status)
     
-    def list_documents(self) -> List[Dict[str, Any]]:
+    def delete_many(self, ids: Iterable[str], chunk_size:int = 1000) -> List[Dict[str, Any]]:
+        """Marks documents as deleted, revisions are read with one _all_docs request
+        per chunk and deletion stubs are written with _bulk_docs
+        
+        Args:
+            ids (Iterable[str]): Document IDs
+            chunk_size (int): number of documents in one request
+        
+        Returns:
+            list: result for every id, {'ok': True, 'id': ..., 'rev': ...} or {'id': ..., 'error': ..., 'reason': ...}
+        
+        Raises:
+            DatabaseError
+        """
+        results: List[Dict[str, Any]] = []
+        for chunk in _chunks(ids, chunk_size):
+            revs = self._current_revs(chunk)
+            stubs = [{'_id': doc_id, '_rev': revs[doc_id], '_deleted': True} for doc_id in chunk if doc_id in revs]
+            written = {ret.get('id'): ret for ret in self.update_many(stubs)} if stubs else {}
+            for doc_id in chunk:
+                results.append(written.get(doc_id) or {'id': doc_id, 'error': 'not_found', 'reason': 'missing'})
+        return results
+
+    def _current_revs(self, ids: List[str]) -> Dict[str, str]:
+        """Current revisions of not deleted documents"""
+        resp = self.conn.post(path=f'{self.name}/_all_docs', data={'keys': ids})
+        if resp.status != 200:
+            raise DatabaseError(resp.status)
+        return {row['id']: row['value']['rev'] for row in resp.get_data().get('rows', [])
+                if 'value' in row and not row['value'].get('deleted')}
+
+    def put_attachment(self, doc_id:str, name:str, data: Union[bytes, BinaryIO, Iterable[bytes]],
+                       content_type:str = 'application/octet-stream', rev:str = '') -> Tuple[str, str]:
+        """Upload attachment, file-like object or iterator of bytes is streamed with
+        chunked transfer encoding without reading it into memory
+        
+        Args:
+            doc_id (str): Document ID, document is created when it does not exist
+            name (str): attachment name
+            data (bytes, file or iterator): attachment body
+            content_type (str): MIME type of attachment
+            rev (str): Document revision, current one is read when not given
+        
+        Returns:
+            tuple: document id, new revision
+        
+        Raises:
+            DatabaseError
+        
+        Example:
+            >>> with open('report.pdf', 'rb') as fh:
+            ...     db.put_attachment('report-2021', 'report.pdf', fh, content_type='application/pdf')
+        """
+        if not rev:
+            try:
+                rev = self.doc_info(doc_id)['rev']
+            except DatabaseError as err:
+                # not existing document is created with attachment
+                if err.code != 404:
+                    raise
+        query = {'rev': rev} if rev else {}
+        resp = self.conn.put(path=f'{self.name}/{doc_id}/{name}', data=data,
+                             headers={'Content-Type': content_type}, query=query)
+        if self.cache is not None:
+            self.cache.invalidate(f'{self.name}/{doc_id}')
+        if resp.status in (201, 202):
+            ret = resp.get_data()
+            return ret.get('id'), ret.get('rev')
+        elif resp.status == 400:
+            raise DatabaseError(400, messeage='Invalid request body or parameters')
+        elif resp.status == 404:
+            raise DatabaseError(404, messeage='Specified database, document or attachment was not found')
+        elif resp.status == 409:
+            raise DatabaseError(409, messeage='Document’s revision wasn’t specified or it’s not the latest')
+        else:
+            raise DatabaseError(resp.status)
+    
+    def get_attachment(self, doc_id:str, name:str, rev:str = '', chunk_size:int = 65536,
+                       meta: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+        """Download attachment in chunks, body is read from streamed response
+        
+        Args:
+            doc_id (str): Document ID
+            name (str): attachment name
+            rev (str): Document revision
+            chunk_size (int): maximum size of chunk
+            meta (dict): if given is filled with content_type, length and digest before first chunk
+        
+        Yields:
+            bytes: chunk of attachment
+        
+        Raises:
+            DatabaseError
+        
+        Example:
+            >>> with open('report.pdf', 'wb') as fh:
+            ...     for chunk in db.get_attachment('report-2021', 'report.pdf'):
+            ...         fh.write(chunk)
+        """
+        query = {'rev': rev} if rev else {}
+        resp = self.conn.get(path=f'{self.name}/{doc_id}/{name}', query=query,
+                             headers={'Accept': '*/*'}, stream=True)
+        if resp.status == 200:
+            if meta is not None:
+                headers = resp.get_headers()
+                meta.update({'content_type': headers.get('Content-Type'),
+                             'length': headers.get('Content-Length'),
+                             'digest': headers.get('Content-MD5') or headers.get('ETag', '').strip('"')})
+            yield from resp.iter_bytes(chunk_size)
+        elif resp.status == 404:
+            raise DatabaseError(404, messeage='Specified database, document or attachment was not found')
+        else:
+            raise DatabaseError(resp.status)
+    
+    def delete_attachment(self, doc_id:str, name:str, rev:str = '') -> Tuple[str, str]:
+        """Delete attachment
+        
+        Args:
+            doc_id (str): Document ID
+            name (str): attachment name
+            rev (str): Document revision, current one is read when not given
+        
+        Returns:
+            tuple: document id, new revision
+        
+        Raises:
+            DatabaseError
+        """
+        rev = rev or self.doc_info(doc_id)['rev']
+        resp = self.conn.delete(path=f'{self.name}/{doc_id}/{name}', query={'rev': rev})
+        if self.cache is not None:
+            self.cache.invalidate(f'{self.name}/{doc_id}')
+        if resp.status in (200, 202):
+            ret = resp.get_data()
+            return ret.get('id'), ret.get('rev')
+        elif resp.status == 404:
+            raise DatabaseError(404, messeage='Specified database, document or attachment was not found')
+        elif resp.status == 409:
+            raise DatabaseError(409, messeage='Document’s revision wasn’t specified or it’s not the latest')
+        else:
+            raise DatabaseError(resp.status)
+    
+    def list_documents(self, page_size:int = 1000, iterator:bool = False) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
         """List all documents names in database
         
+        Args:
+            page_size (int): number of rows requested from _all_docs at once
+            iterator (bool): return iterator parsing rows one by one from streamed response instead of list
+        
         Return:
-            list: Document names"""
+            list: rows with document id, key and value with rev
         
-        ret: List[Dict[str, Any]] = []
-        if (resp := self.conn.get(path=f'{self.name}/_all_docs')).status == 200:
-            ret = resp.get_data().get('rows', [])
-        return ret
+        Raises:
+            DatabaseError"""
+        
+        rows = self._all_docs_rows(page_size=page_size, read_ahead=False)
+        if iterator:
+            return rows
+        return list(rows)
     
-    def get_all_docs(self) -> Iterator[Dict[str, Any]]:
-        """Returns iterator for all documents in database
+    def get_all_docs(self, page_size:int = 1000, read_ahead:bool = True, lazy:bool = False) -> Iterator[Dict[str, Any]]:
+        """Returns iterator for all documents in database.
+        Documents are read from _all_docs with include_docs in pages of page_size rows,
+        with read_ahead next page is fetched in background while current one is consumed,
+        without it rows are parsed one by one from streamed response.
+        
+        Args:
+            page_size (int): number of documents requested at once
+            read_ahead (bool): fetch next page in background thread
+            lazy (bool): yield Document instances holding raw JSON, parsed on first access
 
         Yields:
             dict: Document
+        
+        Raises:
+            DatabaseError
         """
-        docs:List[Dict[str, Any]] = self.list_documents()
-        for doc in docs:
-            yield self.get(doc["id"])
+        if lazy:
+            for raw in self._all_docs_rows(page_size=page_size, read_ahead=read_ahead, include_docs=True, raw=True):
+                yield Document.from_json(object_fields(raw, ('doc',))['doc'], db=self, codec=self.conn.json)
+            return
+        for row in self._all_docs_rows(page_size=page_size, read_ahead=read_ahead, include_docs=True):
+            yield row['doc']
+    
+    def _all_docs_rows(self, page_size:int = 1000, read_ahead:bool = True, include_docs:bool = False,
+                       raw:bool = False) -> Iterator[Any]:
+        # one extra row is requested, its id is start key of the next page
+        query: Dict[str, Any] = {'limit': page_size + 1}
+        if include_docs:
+            query['include_docs'] = 'true'
+        
+        executor = ThreadPoolExecutor(max_workers=1) if read_ahead else None
+        try:
+            rows: Iterable[Any] = self._all_docs_page(query, stream=executor is None, raw=raw)
+            while True:
+                next_page: Optional[Future[List[Any]]] = None
+                if executor is not None and len(rows) > page_size:
+                    query['startkey'] = Json.dumps(_row_id(rows[page_size]))
+                    next_page = executor.submit(self._all_docs_page, query.copy(), raw=raw)
+                
+                next_id: Optional[str] = None
+                for count, row in enumerate(rows):
+                    if count < page_size:
+                        yield row
+                    else:
+                        next_id = _row_id(row)
+                
+                if next_id is None:
+                    break
+                query['startkey'] = Json.dumps(next_id)
+                rows = next_page.result() if next_page is not None else self._all_docs_page(query, stream=True, raw=raw)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+    
+    def _all_docs_page(self, query: Dict[str, Any], stream:bool = False, raw:bool = False) -> Iterable[Any]:
+        # pages of full scan are read once, they are not stored in query_cache
+        resp = self.conn.get(path=f'{self.name}/_all_docs', query=query, stream=stream)
+        if resp.status != 200:
+            raise DatabaseError(resp.status)
+        if stream:
+            return resp.iter_rows(keys=('rows',), raw=raw)
+        if raw:
+            return list(resp.iter_rows(keys=('rows',), raw=True))
+        return resp.get_data().get('rows', [])
+    
+    def _cached_request(self, path:str, query: Dict[str, Any] = {}, data: Any = None) -> Tuple[int, Dict[str, Any]]:
+        """GET (or POST when data is given) through query_cache, revalidated with If-None-Match
+        
+        Returns:
+            tuple: status and parsed body
+        """
+        cache = self.query_cache
+        if cache is None:
+            raise DatabaseError(messeage='Query cache is not set')
+        key = cache.key(path, query, data)
+        headers: Dict[str, str] = {}
+        entry, fresh = cache.lookup(key)
+        if entry is not None:
+            if fresh:
+                return 200, entry.load()
+            headers['If-None-Match'] = entry.rev
+        
+        if data is None:
+            resp = self.conn.get(path=path, query=query, headers=headers)
+        else:
+            resp = self.conn.post(path=path, data=data, headers=headers, query=query)
+        
+        if resp.status == 304 and entry is not None:
+            return 200, cache.revalidated(entry)
+        elif resp.status == 200:
+            ret = resp.get_data()
+            if etag := resp.get_headers().get('ETag'):
+                cache.put(key, ret, rev=etag, codec=self.conn.json)
+            else:
+                cache.invalidate(key)
+            return 200, ret
+        return resp.status, {}
 
-    def find(self, query: FindQuery):
-        resp = self.conn.post(path=f'{self.name}/_find', data=query.to_json())
+    def find(self, query: FindQuery, iterator:bool = False):
+        """Find documents using declarative JSON querying syntax
+        
+        Args:
+            query (FindQuery): see FindQuery documentation for details
+            iterator (bool): return iterator parsing documents one by one from streamed response
+        
+        Returns:
+            dict: docs, bookmark and warning, or iterator of documents
+        
+        Raises:
+            DatabaseError
+        """
+        if self.advisor is not None:
+            self.advisor.check(query)
+        # _find responses carry no ETag, so they are not stored in query_cache
+        resp = self.conn.post(path=f'{self.name}/_find', data=query.to_json(), stream=iterator)
         if resp.status == 200:
+            if iterator:
+                return resp.iter_rows(keys=('docs',))
             return resp.get_data()
         elif resp.status == 400:
             raise DatabaseError(messeage='Invalid request')
         else:
             raise DatabaseError(resp.status)
     
+    def find_iter(self, query: FindQuery, page_size:int = 0,
+                  on_page: Optional[Callable[[Dict[str, Any]], None]] = None, lazy:bool = False) -> Iterator[Dict[str, Any]]:
+        """Iterator of all documents matching query, next pages are requested with bookmark.
+        Every page is streamed and documents are parsed one by one.
+        
+        Args:
+            query (FindQuery): query, all options are sent with every page
+            page_size (int): documents in one page, default is query.limit
+            on_page (callable): called after every page with bookmark, warning
+                                and execution_stats (when query.execution_stats is set)
+            lazy (bool): yield Document instances holding raw JSON, parsed on first access
+        
+        Yields:
+            dict: Document
+        
+        Raises:
+            DatabaseError
+        
+        Example:
+            >>> query = FindQuery()
+            >>> query.selector = {'type': 'event'}
+            >>> query.update = False
+            >>> for doc in db.find_iter(query, page_size=500, on_page=lambda page: print(page['bookmark'])):
+            ...     print(doc)
+        """
+        if self.advisor is not None:
+            self.advisor.check(query)
+        data = query.to_json()
+        data['limit'] = page_size or query.limit
+        while True:
+            resp = self.conn.post(path=f'{self.name}/_find', data=data, stream=True)
+            if resp.status != 200:
+                raise DatabaseError(resp.status)
+            page: Dict[str, Any] = {}
+            count = 0
+            for doc in resp.iter_rows(keys=('docs',), raw=lazy, meta=page):
+                count += 1
+                yield Document.from_json(doc, db=self, codec=self.conn.json) if lazy else doc
+            if on_page is not None:
+                on_page(page)
+            if count < data['limit'] or not page.get('bookmark'):
+                break
+            data['bookmark'] = page['bookmark']
+            # skip applies only to first page, next pages start after bookmark
+            data.pop('skip', None)
+    
+    def explain(self, query: FindQuery) -> Dict[str, Any]:
+        """Shows which index is used by query
+        
+        Args:
+            query (FindQuery): query
+        
+        Returns:
+            dict: dbname, index (chosen index, type special for _all_docs), selector, opts, limit, skip, fields, range
+        
+        Raises:
+            DatabaseError
+        """
+        resp = self.conn.post(path=f'{self.name}/_explain', data=query.to_json())
+        if resp.status == 200:
+            return resp.get_data()
+        elif resp.status == 400:
+            raise DatabaseError(400, messeage='Invalid request')
+        else:
+            raise DatabaseError(resp.status)
+    
     def set_index(self, index: IndexQuery) -> Dict[str,str]:
         """Create a new index on a database
 
@@ -356,7 +908,7 @@ class Database:
         
         return ret    
     
-    def purge(self, docinfo:Dict[str, List[str]]):
+    def purge(self, docinfo:Dict[str, List[str]]) -> Dict[str, Any]:
         """A database purge permanently removes the references to documents in the database.
         Normal deletion of a document within CouchDB does not remove the document from the database,
         instead, the document is marked as _deleted=true (and a new revision is created).
@@ -364,19 +916,217 @@ class Database:
         This also means that you can check the status of a document and identify that the document has been deleted by its absence.
         The purge request must include the document IDs, and for each document ID, one or more revisions that must be purged.
         Documents can be previously deleted, but it is not necessary. Revisions must be leaf revisions.
+        
+        Returns:
+            dict: purge_seq and purged - dict of document id and list of purged revisions
         """
         
         resp = self.conn.post(path=f'{self.name}/_purge', data=docinfo)
+        if self.cache is not None:
+            for doc_id in docinfo:
+                self.cache.invalidate(f'{self.name}/{doc_id}')
         if resp.status in (201, 202):
-            ret = resp.get_data()
-            return ret.get('id'), ret.get('rev')
+            return resp.get_data()
         elif resp.status == 400:
-            raise DatabaseError('Bad Request – Invalid database name')
+            raise DatabaseError(400, messeage='Bad Request – Invalid database name')
         elif resp.status == 500:
-            raise DatabaseError('Internal server error or timeout')
+            raise DatabaseError(500, messeage='Internal server error or timeout')
+        else:
+            raise DatabaseError(resp.status)
+    
+    def purge_many(self, docinfo: Union[Dict[str, List[str]], Iterable[Tuple[str, List[str]]]],
+                   chunk_size:int = 100) -> Dict[str, List[str]]:
+        """Purge revisions of many documents in chunks, CouchDB by default accepts
+        100 documents in one purge request
+        
+        Args:
+            docinfo (dict): document id and list of leaf revisions, or iterable of such pairs
+            chunk_size (int): number of documents in one request
+        
+        Returns:
+            dict: document id and list of purged revisions, empty list when nothing was purged
+        
+        Raises:
+            DatabaseError
+        """
+        items = docinfo.items() if isinstance(docinfo, dict) else docinfo
+        results: Dict[str, List[str]] = {}
+        for chunk in _chunks(items, chunk_size):
+            purged = self.purge(dict(chunk)).get('purged', {})
+            for doc_id, _ in chunk:
+                results[doc_id] = purged.get(doc_id, [])
+        return results
     
-    def get_design_docs(self):
-        pass
+    def purge_where(self, selector: Dict[str, Any], chunk_size:int = 100) -> Dict[str, List[str]]:
+        """Purge all leaf revisions (current and conflicting) of documents matching selector.
+        Matching documents are read from _find in pages of chunk_size and purged after every page.
+        _find is requested directly, query_cache and advisor of database are not used.
+        Deleted documents are not returned by _find, use purge_many for them.
+        
+        Args:
+            selector (dict): Mango selector, e.g. {'type': 'session', 'expires': {'$lt': now}}
+            chunk_size (int): number of documents in one request
+        
+        Returns:
+            dict: document id and list of purged revisions
+        
+        Raises:
+            DatabaseError
+        """
+        query = FindQuery()
+        query.selector = selector
+        query.fields = ['_id', '_rev', '_conflicts']
+        query.conflicts = True
+        query.limit = chunk_size
+        body = query.to_json()
+        results: Dict[str, List[str]] = {}
+        while True:
+            resp = self.conn.post(path=f'{self.name}/_find', data=body)
+            if resp.status == 400:
+                raise DatabaseError(400, messeage='Invalid request')
+            elif resp.status != 200:
+                raise DatabaseError(resp.status)
+            page = resp.get_data()
+            if not (docs := page.get('docs', [])):
+                return results
+            purged = self.purge_many([(doc['_id'], [doc['_rev']] + doc.get('_conflicts', []))
+                                      for doc in docs], chunk_size=chunk_size)
+            results.update(purged)
+            # purged documents drop out of results, so same page is requested again,
+            # page where nothing could be purged is skipped with its bookmark
+            if not any(purged.values()):
+                if len(docs) < chunk_size or not page.get('bookmark'):
+                    return results
+                body['bookmark'] = page['bookmark']
+    
+    def get_design_docs(self, include_docs:bool = False) -> List[Dict[str, Any]]:
+        """List design documents of database
+        
+        Args:
+            include_docs (bool): include design documents in rows
+        
+        Returns:
+            list: rows with id, key, value (rev) and doc when include_docs is set
+        
+        Raises:
+            DatabaseError
+        """
+        query = {'include_docs': 'true'} if include_docs else {}
+        resp = self.conn.get(path=f'{self.name}/_design_docs', query=query)
+        if resp.status == 200:
+            return resp.get_data().get('rows', [])
+        else:
+            raise DatabaseError(resp.status)
+    
+    def view(self, ddoc:str, view:str, query: Optional[ViewQuery] = None) -> Dict[str, Any]:
+        """Query map/reduce view, request with keys is sent as POST
+        
+        Args:
+            ddoc (str): design document name, with or without _design/ prefix
+            view (str): view name
+            query (ViewQuery): view options
+        
+        Returns:
+            dict: rows, total_rows and offset (not for reduced views)
+        
+        Raises:
+            DatabaseError
+        
+        Example:
+            >>> db.view('stats', 'by_type', ViewQuery(keys=['a', 'b'], group=True))
+        """
+        query = query or ViewQuery()
+        if self.query_cache is not None:
+            if query.keys is not None:
+                status, data = self._cached_request(self._view_path(ddoc, view), data=query.to_json())
+            else:
+                status, data = self._cached_request(self._view_path(ddoc, view), query=query.to_query())
+            if status == 200:
+                return data
+            raise self._view_error(status)
+        resp = self._view_request(ddoc, view, query)
+        if resp.status == 200:
+            return resp.get_data()
+        else:
+            raise self._view_error(resp.status)
+    
+    def view_iter(self, ddoc:str, view:str, query: Optional[ViewQuery] = None,
+                  meta: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Iterator of view rows parsed one by one from streamed response
+        
+        Args:
+            ddoc (str): design document name
+            view (str): view name
+            query (ViewQuery): view options
+            meta (dict): if given is updated with total_rows and offset after last row
+        
+        Yields:
+            dict: row with id, key, value and doc
+        
+        Raises:
+            DatabaseError
+        """
+        resp = self._view_request(ddoc, view, query or ViewQuery(), stream=True)
+        if resp.status != 200:
+            raise self._view_error(resp.status)
+        yield from resp.iter_rows(keys=('rows',), meta=meta)
+    
+    def view_queries(self, ddoc:str, view:str, queries: List[ViewQuery]) -> List[Dict[str, Any]]:
+        """Run many queries of the same view in one request
+        
+        Args:
+            ddoc (str): design document name
+            view (str): view name
+            queries (list): list of ViewQuery
+        
+        Returns:
+            list: result (rows, total_rows, offset) for every query
+        
+        Raises:
+            DatabaseError
+        """
+        resp = self.conn.post(path=f'{self._view_path(ddoc, view)}/queries',
+                              data={'queries': [query.to_json() for query in queries]})
+        if resp.status == 200:
+            return resp.get_data().get('results', [])
+        else:
+            raise self._view_error(resp.status)
+    
+    def _view_path(self, ddoc:str, view:str) -> str:
+        if not ddoc.startswith('_design/'):
+            ddoc = f'_design/{ddoc}'
+        return f'{self.name}/{ddoc}/_view/{view}'
+    
+    def _view_request(self, ddoc:str, view:str, query: ViewQuery, stream:bool = False) -> Response:
+        if query.keys is not None:
+            # long key lists do not fit into url
+            return self.conn.post(path=self._view_path(ddoc, view), data=query.to_json(), stream=stream)
+        return self.conn.get(path=self._view_path(ddoc, view), query=query.to_query(), stream=stream)
+    
+    def _view_error(self, status:int) -> DatabaseError:
+        if status == 400:
+            return DatabaseError(400, messeage='Invalid request')
+        elif status == 404:
+            return DatabaseError(404, messeage='Specified database, design document or view is missing')
+        return DatabaseError(status)
+    
+    def changes(self, feed:str = 'normal', since:str = '', checkpoint: Optional[Checkpoint] = None, **kwargs: Any) -> ChangesFeed:
+        """Changes feed of database, see ChangesFeed for all options
+        
+        Args:
+            feed (str): normal, longpoll or continuous
+            since (str): start from given sequence, 'now' for only new changes
+            checkpoint (Checkpoint): storage of processed sequence, e.g. LocalDocCheckpoint(db, 'worker')
+        
+        Returns:
+            ChangesFeed: iterator of changes
+        
+        Example:
+            >>> for changes in db.changes('continuous', checkpoint=LocalDocCheckpoint(db, 'indexer'),
+            ...                           include_docs=True, batch_size=100):
+            ...     process(changes)
+        """
+        return ChangesFeed(self, feed=feed, since=since, checkpoint=checkpoint, **kwargs)
     
     def __contains__(self, item:str):
         resp = self.conn.head(path=f'{self.name}/{item}')
@@ -387,18 +1137,9 @@ class Database:
         else:
             raise DatabaseError(resp.status)
 
-    def __iter__(self):
-        self.rows = self.list_documents()
-        self.i = 0
-        return self
-
-    def __next__(self):
-        if self.i <= (len(self.rows)-1):
-            doc = self.rows[self.i]
-            self.i += 1
-            return doc['id']
-        else:
-            raise StopIteration
+    def __iter__(self) -> Iterator[str]:
+        for row in self._all_docs_rows(read_ahead=False):
+            yield row['id']
 
     def __getitem__(self, item:str):
         return self.get(item)
@@ -411,4 +1152,19 @@ class Database:
             self.add(value)
 
 
-        
\ No newline at end of file
+def _row_id(row: Any) -> str:
+    """Id of _all_docs row, parsed or raw JSON"""
+    if isinstance(row, bytes):
+        return Json.loads(object_fields(row, ('id',))['id'])
+    return row['id']
+
+
+def _chunks(items: Iterable[Any], size:int) -> Iterator[List[Any]]:
+    chunk: List[Any] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
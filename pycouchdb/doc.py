@@ -1,16 +1,249 @@
-from collections.abc import MutableMapping
+from __future__ import annotations
+from array import array
+from collections.abc import Mapping, MutableMapping
+from itertools import compress
 from .exceptions import DocumentError
-from .db import Database
-from .json import Json
-from typing import Any, Iterator, Optional, Dict
+from .json import JsonCodec, default_codec
+from .stream import object_fields
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Dict, Sequence, Union, TYPE_CHECKING
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if TYPE_CHECKING:
+    from .db import Database
+
+Column = Union[array, List[Any]]
+_typecodes = {int: 'q', float: 'd'}
+# unique values are not worth sharing
+_unique_fields = ('_id', '_rev')
 
 class DocumentList:
-    pass
+    """Column oriented container of documents for large result sets. Every top level
+    field is kept in one column, ints and floats in typed arrays and other values in
+    lists with equal strings shared, so row costs few bytes per field instead of dict
+    per document. Missing fields and nulls are None, they are left out of rows.
+    Typed column keeps them in separate mask, so sparse numeric field stays in array.
+    Column falls back from array to list when value of other type comes.
+    
+    Args:
+        docs (Iterable): documents (dicts or Documents), e.g. find(query)['docs'] or get_all_docs(lazy=True)
+        fields (list): keep only these fields, lazy Documents are not parsed then
+    
+    Example:
+        >>> sales = DocumentList(db.get_all_docs(lazy=True), fields=['type', 'region', 'amount'])
+        >>> sales = sales.where('type', 'sale')
+        >>> {region: sum(group['amount']) for region, group in sales.group_by('region').items()}
+        {'eu': 1520.5, 'us': 980.0}
+    """
+    def __init__(self, docs: Iterable[Any] = (), fields: Optional[Sequence[str]] = None) -> None:
+        self.fields = list(fields) if fields is not None else None
+        self._columns: Dict[str, Column] = {}
+        # missing values of typed columns, created with first missing value
+        self._missing: Dict[str, bytearray] = {}
+        self._length = 0
+        self._strings: Dict[str, str] = {}
+        self.extend(docs)
+    
+    @classmethod
+    def from_bulk_get(cls, results: List[Dict[str, Any]], fields: Optional[Sequence[str]] = None) -> DocumentList:
+        """From results of Database.get_many, errors are skipped"""
+        return cls((item['ok'] for result in results for item in result.get('docs', []) if 'ok' in item), fields)
+    
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+    
+    def append(self, doc: Mapping) -> None:
+        if self.fields is None:
+            values = doc
+        elif isinstance(doc, Document):
+            values = doc.fields(*self.fields)
+        else:
+            values = {key: doc[key] for key in self.fields if key in doc}
+        for key, value in values.items():
+            if value is None:
+                continue
+            if key not in self._columns:
+                self._columns[key] = self._new_column(key, value)
+            self._append(key, value)
+        self._length += 1
+        for key, column in self._columns.items():
+            if len(column) < self._length:
+                self._append(key, None)
+    
+    def extend(self, docs: Iterable[Mapping]) -> None:
+        for doc in docs:
+            self.append(doc)
+    
+    def _new_column(self, key: str, value: Any) -> Column:
+        # rows before first value of field are missing
+        if (typecode := _typecodes.get(type(value))) is None:
+            return [None] * self._length
+        if self._length:
+            self._missing[key] = bytearray(b'\x01') * self._length
+        return array(typecode, bytes(array(typecode).itemsize * self._length))
+    
+    def _append(self, key: str, value: Any) -> None:
+        column = self._columns[key]
+        if isinstance(column, array):
+            missing = self._missing.get(key)
+            if value is None:
+                if missing is None:
+                    missing = self._missing[key] = bytearray(len(column))
+                missing.append(1)
+                column.append(0)
+                return
+            if type(value) is (int if column.typecode == 'q' else float):
+                try:
+                    column.append(value)
+                    if missing is not None:
+                        missing.append(0)
+                    return
+                except OverflowError:
+                    pass
+            column = self._columns[key] = list(self._cells(key))
+            self._missing.pop(key, None)
+        if type(value) is str and key not in _unique_fields:
+            value = self._strings.setdefault(value, value)
+        column.append(value)
+    
+    def mask(self, field: str, predicate: Callable[[Any], bool]) -> List[bool]:
+        """Result of predicate for every value of field, masks are combined with zip"""
+        return [bool(predicate(value)) for value in self._cells(field)]
+    
+    def filter(self, mask: Iterable[bool]) -> DocumentList:
+        """Rows where mask is true"""
+        mask = list(mask)
+        ret = self._derived(self.fields)
+        for key, column in self._columns.items():
+            selected = compress(column, mask)
+            ret._columns[key] = array(column.typecode, selected) if isinstance(column, array) else list(selected)
+            if (missing := self._missing.get(key)) is not None:
+                ret._missing[key] = bytearray(compress(missing, mask))
+        ret._length = sum(mask[:self._length])
+        return ret
+    
+    def where(self, field: str, predicate: Union[Callable[[Any], bool], Any]) -> DocumentList:
+        """Rows where predicate is true for field, not callable predicate is compared for equality"""
+        if not callable(predicate):
+            value = predicate
+            predicate = lambda item: item == value
+        return self.filter(self.mask(field, predicate))
+    
+    def project(self, *fields: str) -> DocumentList:
+        """Only given fields"""
+        ret = self._derived(list(fields))
+        for key in fields:
+            if (column := self._columns.get(key)) is None:
+                ret._columns[key] = [None] * self._length
+                continue
+            ret._columns[key] = array(column.typecode, column) if isinstance(column, array) else list(column)
+            if (missing := self._missing.get(key)) is not None:
+                ret._missing[key] = bytearray(missing)
+        ret._length = self._length
+        return ret
+    
+    def take(self, indexes: Sequence[int]) -> DocumentList:
+        """Rows with given indexes"""
+        ret = self._derived(self.fields)
+        for key, column in self._columns.items():
+            selected = (column[index] for index in indexes)
+            ret._columns[key] = array(column.typecode, selected) if isinstance(column, array) else list(selected)
+            if (missing := self._missing.get(key)) is not None:
+                ret._missing[key] = bytearray(missing[index] for index in indexes)
+        ret._length = len(indexes)
+        return ret
+    
+    def group_by(self, field: str) -> Dict[Any, DocumentList]:
+        """Rows grouped by value of field, values must be hashable"""
+        groups: Dict[Any, List[int]] = {}
+        for index, value in enumerate(self._cells(field)):
+            groups.setdefault(value, []).append(index)
+        return {value: self.take(indexes) for value, indexes in groups.items()}
+    
+    def column(self, field: str) -> Column:
+        """Values of field, array for ints and floats, list for others and for
+        typed column with missing values, which are None in it"""
+        if (column := self._columns.get(field)) is None:
+            return [None] * self._length
+        if field in self._missing:
+            return list(self._cells(field))
+        return column
+    
+    def _cells(self, field: str) -> Iterable[Any]:
+        # values of column with None for missing ones, without copy of column
+        if (column := self._columns.get(field)) is None:
+            return [None] * self._length
+        if (missing := self._missing.get(field)) is None:
+            return column
+        return (None if flag else value for value, flag in zip(column, missing))
+    
+    def to_numpy(self, *fields: str) -> Dict[str, Any]:
+        """Columns as numpy arrays, int64 and float64 for typed columns and object for others,
+        typed column with missing values is masked array
+        
+        Raises:
+            ImportError: numpy is not installed
+        """
+        if numpy is None:
+            raise ImportError('to_numpy requires numpy')
+        ret: Dict[str, Any] = {}
+        for key in fields or self._columns:
+            column = self._columns.get(key, [None] * self._length)
+            if isinstance(column, array):
+                ret[key] = numpy.frombuffer(column, dtype=column.typecode).copy()
+                if (missing := self._missing.get(key)) is not None:
+                    ret[key] = numpy.ma.masked_array(ret[key], mask=numpy.frombuffer(missing, dtype=bool).copy())
+            else:
+                ret[key] = numpy.array(column, dtype=object)
+        return ret
+    
+    def _derived(self, fields: Optional[List[str]]) -> DocumentList:
+        ret = DocumentList(fields=fields)
+        ret._strings = self._strings
+        return ret
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def __getitem__(self, index: Union[int, str]) -> Any:
+        """Row as dict for int index, column for field name"""
+        if isinstance(index, str):
+            return self.column(index)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('DocumentList index out of range')
+        return {key: column[index] for key, column in self._columns.items()
+                if column[index] is not None and not (key in self._missing and self._missing[key][index])}
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if not self._columns:
+            yield from ({} for _ in range(self._length))
+            return
+        keys = list(self._columns)
+        for values in zip(*(self._cells(key) for key in keys)):
+            yield {key: value for key, value in zip(keys, values) if value is not None}
+    
+    def __repr__(self) -> str:
+        return f'<DocumentList {self._length} rows, columns {self.columns}>'
 
 class Document(MutableMapping):
-    """ Document class"""
+    """Document class
+    
+    Document created with from_json keeps raw JSON bytes and is parsed on first
+    access to its fields, untouched document is serialized back without encoding.
+    
+    Changes made with item assignment, del and pop mark document as dirty,
+    changes inside nested values are not tracked, set dirty for them.
+    """
     def __init__(self, _dict:Optional[Dict[Any,Any]] = None, **kwargs:str) -> None:
-        self._doc:Dict[str, Any] = {}
+        self._data:Dict[str, Any] = {}
+        self._raw: Optional[bytes] = None
+        self._codec: JsonCodec = default_codec
+        self._dirty = False
         
         if _dict is not None:
            self.update(_dict) 
@@ -20,6 +253,45 @@ class Document(MutableMapping):
             
         self._db: Optional[Database] = None
     
+    @classmethod
+    def from_json(cls, raw: bytes, db: Optional[Database] = None, codec: Optional[JsonCodec] = None) -> Document:
+        """Lazy document from raw JSON, parsed on first access to fields
+        
+        Args:
+            raw (bytes): JSON object
+            db (Database): database of document
+            codec (JsonCodec): codec used to parse document
+        """
+        doc = cls()
+        doc._raw = raw
+        doc._db = db
+        if codec is not None:
+            doc._codec = codec
+        elif db is not None:
+            doc._codec = db.conn.json
+        return doc
+    
+    @property
+    def _doc(self) -> Dict[str, Any]:
+        if self._raw is not None:
+            self._data = self._codec.loads(self._raw)
+            self._raw = None
+        return self._data
+    
+    @property
+    def parsed(self) -> bool:
+        """False while lazy document is kept as raw JSON"""
+        return self._raw is None
+    
+    @property
+    def dirty(self) -> bool:
+        """Document was changed since it was loaded or stored"""
+        return self._dirty
+    
+    @dirty.setter
+    def dirty(self, value:bool):
+        self._dirty = value
+    
     @property
     def db(self) -> Database:
         """Database instance"""
@@ -30,11 +302,13 @@ class Document(MutableMapping):
     @db.setter
     def db(self, db_instace: Database):
         self._db = db_instace
+        # document is serialized and parsed by codec of its connection
+        self._codec = db_instace.conn.json
     
     @property
     def id(self) -> str:
         """Document id"""
-        return self._doc.get('_id', '')
+        return self.fields('_id').get('_id', '')
     
     @id.setter
     def id(self, value:str):
@@ -43,7 +317,7 @@ class Document(MutableMapping):
     @property
     def rev(self) -> str:
         """Document revision"""
-        return self._doc.get('_rev', '')
+        return self.fields('_rev').get('_rev', '')
     
     @rev.setter
     def rev(self, value:str):
@@ -51,22 +325,48 @@ class Document(MutableMapping):
     
     @property
     def json(self) -> str:
-        """serialized to json string"""
-        return Json.dumps(self._doc)
+        """serialized to json string by codec of document"""
+        return self.raw.decode('utf8')
+    
+    @property
+    def raw(self) -> bytes:
+        """serialized to json bytes, raw JSON of not parsed document is returned as it is"""
+        if self._raw is not None:
+            return self._raw
+        return self._codec.dumpb(self._doc)
+    
+    def fields(self, *keys:str) -> Dict[str, Any]:
+        """Values of top level fields, not parsed document stays not parsed
+        and only requested fields are decoded
+        
+        Returns:
+            dict: key and value of fields present in document
+        """
+        if self._raw is not None:
+            return {key: self._codec.loads(value) for key, value in object_fields(self._raw, keys).items()}
+        return {key: self._doc[key] for key in keys if key in self._doc}
     
     def pop(self, key:str, default: Any=None) -> Any:
+        if key in self._doc:
+            self._dirty = True
         return self._doc.pop(key, default)
     
     def popitem(self) -> Any:
-        return self._doc.popitem()
+        ret = self._doc.popitem()
+        self._dirty = True
+        return ret
     
     def store(self):
-        """Store document to databse if databse instance is set else raise DocumentError"""
-        self._db.update(self.id, self._doc, rev=self.rev)
+        """Store document to databse if databse instance is set else raise DocumentError.
+        Stored document which was not changed is not sent again."""
+        if not self._dirty and self.rev:
+            return
+        _, self.rev = self.db.update(self.id, self._doc, rev=self.rev)
+        self._dirty = False
         
     def store_to_databse(self, db:Database):
         """Store document to given database instace"""
-        db.update(self.id, self._doc, rev=self.rev)
+        _, self.rev = db.update(self.id, self._doc, rev=self.rev)
     
     def load_from_database(self, db: Database, doc_id:str, doc_rev:str = ''):
         """Load document from given database instance and set db as current"""
@@ -75,6 +375,7 @@ class Document(MutableMapping):
         self.rev = doc.pop("_rev", "")
         self.db = db
         self._doc.update(doc)
+        self._dirty = False
                             
     def __str__(self) -> str:
         return f"<Document {self._doc}>"
@@ -84,9 +385,11 @@ class Document(MutableMapping):
 
     def __setitem__(self, key: str, value: Any):
         self._doc[key] = value
+        self._dirty = True
     
     def __delitem__(self, v: str) -> None:
         del self._doc[v]
+        self._dirty = True
         
     def __len__(self) -> int:
         return len(self._doc)
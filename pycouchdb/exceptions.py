@@ -6,8 +6,9 @@ class ServerError(Exception):
         412: 'Database already exists'
         }
     
-    def __init__(self, code=0, messeage=f'Unknow Error'):
-        self.message = self._codes.get(code, messeage)
+    def __init__(self, code=0, messeage=''):
+        self.code = code
+        self.message = messeage or self._codes.get(code, 'Unknow Error')
         
 
 class DatabaseError(Exception):
@@ -22,14 +23,18 @@ class DatabaseError(Exception):
             500: 'Query execution error'
                }
     
-    def __init__(self, code=0, messeage=f'Unknow Error'):
-        self.message = self._codes.get(code, messeage)   
+    def __init__(self, code=0, messeage=''):
+        self.code = code
+        self.message = messeage or self._codes.get(code, 'Unknow Error')   
 
 
 class DocumentError(Exception):
     _codes = {}
     
-    def __init__(self, code=0, messeage=f'Unknow Error'):
-        self.message = self._codes.get(code, messeage)
+    def __init__(self, code=0, messeage=''):
+        self.code = code
+        self.message = messeage or self._codes.get(code, 'Unknow Error')
 
 
+class IndexWarning(UserWarning):
+    """Query is not covered by index"""
@@ -1,15 +1,123 @@
+import json as _stdlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Type, Union
+
 try:
-    import ujson as json
+    import ujson as _ujson
 except ImportError:
-    import json
-from typing import Any
+    _ujson = None
+
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+json = _ujson or _stdlib
 
 
 class Json:
     @staticmethod
     def loads(s:str) -> Any:
         return json.loads(s)
-    
+
     @staticmethod
     def dumps(obj: Any) -> str:
-        return json.dumps(obj)
\ No newline at end of file
+        return json.dumps(obj)
+
+
+class JsonCodec(ABC):
+    """JSON codec used by connection engines for request and response bodies.
+    Interface works on bytes, only codecs which serialize straight to bytes (orjson)
+    avoid intermediate str, others encode it.
+    Subclass it and implement loads and dumpb for custom codec.
+    """
+    name = ''
+
+    @abstractmethod
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """Parse JSON from bytes (or str)"""
+
+    @abstractmethod
+    def dumpb(self, obj: Any) -> bytes:
+        """Serialize object to UTF-8 JSON bytes"""
+
+
+class StdlibCodec(JsonCodec):
+    """Codec based on json module from standard library, serializes to str and encodes it"""
+    name = 'json'
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return _stdlib.loads(data)
+
+    def dumpb(self, obj: Any) -> bytes:
+        # default encoder is faster than one with compact separators
+        return _stdlib.dumps(obj).encode('utf8')
+
+
+class UjsonCodec(JsonCodec):
+    """Codec based on ujson, serializes to str and encodes it"""
+    name = 'ujson'
+
+    def __init__(self) -> None:
+        if _ujson is None:
+            raise ImportError('ujson is not installed')
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return _ujson.loads(data)
+
+    def dumpb(self, obj: Any) -> bytes:
+        return _ujson.dumps(obj).encode('utf8')
+
+
+class OrjsonCodec(JsonCodec):
+    """Codec based on orjson, serializes straight to bytes.
+    Not used by default, orjson rejects non-str keys and integers above 64 bits.
+    """
+    name = 'orjson'
+
+    def __init__(self) -> None:
+        if _orjson is None:
+            raise ImportError('orjson is not installed')
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return _orjson.loads(data)
+
+    def dumpb(self, obj: Any) -> bytes:
+        return _orjson.dumps(obj)
+
+
+CODECS: Dict[str, Type[JsonCodec]] = {'orjson': OrjsonCodec, 'ujson': UjsonCodec, 'json': StdlibCodec}
+
+
+def get_codec(codec: Optional[Union[str, JsonCodec]] = None) -> JsonCodec:
+    """Codec instance by name, instance is returned as it is
+
+    Args:
+        codec (str|JsonCodec): orjson, ujson or json, ujson when installed or json when None
+
+    Raises:
+        ValueError: unknown codec name
+        ImportError: codec library is not installed
+    """
+    if isinstance(codec, JsonCodec):
+        return codec
+    if codec is None:
+        # orjson is used only when asked for, it does not accept everything json does
+        codec = 'ujson' if _ujson is not None else 'json'
+    if codec not in CODECS:
+        raise ValueError(f'Unknown JSON codec {codec}, use one of {", ".join(CODECS)}')
+    return CODECS[codec]()
+
+
+def available_codecs() -> List[JsonCodec]:
+    """Instances of all codecs which libraries are installed"""
+    ret = []
+    for name in CODECS:
+        try:
+            ret.append(get_codec(name))
+        except ImportError:
+            pass
+    return ret
+
+
+default_codec: JsonCodec = get_codec()
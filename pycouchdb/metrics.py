@@ -0,0 +1,220 @@
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# endpoints under database which are reported by their name
+_db_endpoints = ('_all_docs', '_bulk_docs', '_bulk_get', '_changes', '_find', '_explain', '_index',
+                 '_purge', '_revs_diff', '_missing_revs', '_security', '_compact', '_ensure_full_commit')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def endpoint_of(path: str) -> str:
+    """Class of endpoint used to group requests, e.g. doc, _find, _bulk_docs, _view
+
+    Args:
+        path (str): request path without query
+    """
+    parts = path.strip('/').split('/')
+    if not parts[0]:
+        return 'server'
+    if parts[0].startswith('_'):
+        return parts[0]
+    if len(parts) == 1:
+        return 'db'
+    name = parts[1]
+    if name == '_design':
+        if len(parts) > 3 and parts[3] in ('_view', '_show', '_list', '_update'):
+            return parts[3]
+        return 'design_doc'
+    if name == '_local':
+        return '_local'
+    if name in _db_endpoints:
+        return name
+    return 'attachment' if len(parts) > 2 else 'doc'
+
+
+class RequestEvent:
+    """Single request seen by hooks
+
+    Attributes:
+        method (str): HTTP method
+        path (str): request path
+        endpoint (str): class of endpoint, see endpoint_of
+        sent (int): request body bytes, streamed bodies are not counted
+        status (int): response status, 0 when request failed
+        received (int): response body bytes, streamed bodies are not counted
+        duration (float): seconds until response headers (whole body when it is not streamed)
+        reused (bool): request was sent over kept-alive connection
+        retries (int): number of repeated attempts
+        error (Exception): error of failed request
+    """
+    __slots__ = ('method', 'path', 'endpoint', 'sent', 'status', 'received', 'started', 'duration',
+                 'reused', 'retries', 'error')
+
+    def __init__(self, method: str, path: str, sent: int = 0) -> None:
+        self.method = method
+        self.path = path
+        self.endpoint = endpoint_of(path)
+        self.sent = sent
+        self.status = 0
+        self.received = 0
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.reused = False
+        self.retries = 0
+        self.error: Optional[BaseException] = None
+
+
+class RequestHook:
+    """Base class of connection hooks, override methods which are needed
+
+    Example:
+        >>> class SlowLog(RequestHook):
+        ...     def after_response(self, event):
+        ...         if event.duration > 1:
+        ...             print(event.method, event.path, event.duration)
+        >>> cli.conn.add_hook(SlowLog())
+    """
+    def before_request(self, event: RequestEvent) -> None:
+        pass
+
+    def after_response(self, event: RequestEvent) -> None:
+        pass
+
+    def on_error(self, event: RequestEvent) -> None:
+        pass
+
+
+class _Series:
+    __slots__ = ('buckets', 'count', 'total', 'errors', 'sent', 'received', 'reused', 'retries', 'statuses')
+
+    def __init__(self, size: int) -> None:
+        self.buckets = [0] * size
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.sent = 0
+        self.received = 0
+        self.reused = 0
+        self.retries = 0
+        self.statuses: Dict[int, int] = {}
+
+
+class Metrics(RequestHook):
+    """Collects latency histograms, status codes, transferred bytes, connection
+    reuse and retries for every method and endpoint class
+
+    Args:
+        buckets (Sequence[float]): upper bounds of latency histogram buckets in seconds
+
+    Example:
+        >>> metrics = Metrics()
+        >>> cli.conn.add_hook(metrics)
+        >>> metrics.to_dict()['GET doc']['count']
+        >>> print(metrics.to_prometheus())
+    """
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._lock = Lock()
+        self._series: Dict[Tuple[str, str], _Series] = {}
+
+    def after_response(self, event: RequestEvent) -> None:
+        with self._lock:
+            series = self._get(event)
+            series.buckets[bisect_left(self.buckets, event.duration)] += 1
+            series.count += 1
+            series.total += event.duration
+            series.sent += event.sent
+            series.received += event.received
+            series.reused += event.reused
+            series.retries += event.retries
+            series.statuses[event.status] = series.statuses.get(event.status, 0) + 1
+
+    def on_error(self, event: RequestEvent) -> None:
+        with self._lock:
+            series = self._get(event)
+            series.errors += 1
+            series.sent += event.sent
+            series.retries += event.retries
+
+    def _get(self, event: RequestEvent) -> _Series:
+        key = (event.method, event.endpoint)
+        if (series := self._series.get(key)) is None:
+            # last bucket is +Inf
+            series = self._series[key] = _Series(len(self.buckets) + 1)
+        return series
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Metrics for every "METHOD endpoint"
+
+        Returns:
+            dict: count, sum (seconds), buckets (upper bound and cumulative count), statuses,
+                  errors, sent, received, reused and retries
+        """
+        ret: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for (method, endpoint), series in sorted(self._series.items()):
+                ret[f'{method} {endpoint}'] = {
+                    'count': series.count,
+                    'sum': series.total,
+                    'buckets': dict(zip([*self.buckets, float('inf')], _cumulative(series.buckets))),
+                    'statuses': dict(series.statuses),
+                    'errors': series.errors,
+                    'sent': series.sent,
+                    'received': series.received,
+                    'reused': series.reused,
+                    'retries': series.retries,
+                }
+        return ret
+
+    def to_prometheus(self, prefix: str = 'pycouchdb') -> str:
+        """Metrics in Prometheus text exposition format"""
+        lines: List[str] = []
+        counters = (('errors', 'request_errors_total', 'Failed requests'),
+                    ('sent', 'request_bytes_total', 'Request body bytes'),
+                    ('received', 'response_bytes_total', 'Response body bytes'),
+                    ('reused', 'connections_reused_total', 'Requests sent over kept-alive connection'),
+                    ('retries', 'request_retries_total', 'Repeated request attempts'))
+        with self._lock:
+            items = sorted(self._series.items())
+            name = f'{prefix}_request_duration_seconds'
+            lines += [f'# HELP {name} Request latency', f'# TYPE {name} histogram']
+            for (method, endpoint), series in items:
+                labels = f'method="{method}",endpoint="{endpoint}"'
+                bounds = [_number(bound) for bound in self.buckets] + ['+Inf']
+                for bound, count in zip(bounds, _cumulative(series.buckets)):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{{labels}}} {_number(series.total)}')
+                lines.append(f'{name}_count{{{labels}}} {series.count}')
+
+            name = f'{prefix}_responses_total'
+            lines += [f'# HELP {name} Responses by status code', f'# TYPE {name} counter']
+            for (method, endpoint), series in items:
+                for status, count in sorted(series.statuses.items()):
+                    lines.append(f'{name}{{method="{method}",endpoint="{endpoint}",status="{status}"}} {count}')
+
+            for attr, metric, text in counters:
+                name = f'{prefix}_{metric}'
+                lines += [f'# HELP {name} {text}', f'# TYPE {name} counter']
+                for (method, endpoint), series in items:
+                    lines.append(f'{name}{{method="{method}",endpoint="{endpoint}"}} {getattr(series, attr)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _cumulative(counts: List[int]) -> List[int]:
+    ret: List[int] = []
+    total = 0
+    for count in counts:
+        total += count
+        ret.append(total)
+    return ret
+
+
+def _number(value: float) -> str:
+    return repr(float(value))
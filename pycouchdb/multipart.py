@@ -0,0 +1,141 @@
+import re
+from .json import JsonCodec, default_codec
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_boundary = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+_filename = re.compile(r'filename="?([^";]+)"?', re.IGNORECASE)
+
+
+class MultipartParser:
+    """Incremental parser for multipart bodies (multipart/mixed, multipart/related).
+    Body is fed in chunks and every part is returned with its headers and raw
+    body as soon as closing boundary arrives, only current part is kept in memory.
+
+    Args:
+        boundary (str): boundary from Content-Type header
+
+    Example:
+        >>> parser = MultipartParser(boundary_of(resp.get_headers()['Content-Type']))
+        >>> for chunk in resp.iter_bytes():
+        ...     for headers, body in parser.feed(chunk):
+        ...         print(headers['content-type'], len(body))
+    """
+    def __init__(self, boundary: str) -> None:
+        self._first = b'--' + boundary.encode()
+        self._delimiter = b'\r\n' + self._first
+        self._buffer = bytearray()
+        self._scanned = 0
+        self._state = 'preamble'
+
+    @property
+    def done(self) -> bool:
+        return self._state == 'end'
+
+    def feed(self, chunk: bytes) -> List[Tuple[Dict[str, str], bytes]]:
+        """Parse next chunk of body
+
+        Returns:
+            list: (headers with lowercase names, body) of parts completed in this chunk
+        """
+        parts: List[Tuple[Dict[str, str], bytes]] = []
+        if self._state == 'end':
+            return parts
+        self._buffer += chunk
+        while True:
+            if self._state == 'preamble':
+                if (index := self._buffer.find(self._first)) < 0:
+                    # keep only tail which can be start of boundary
+                    del self._buffer[:max(0, len(self._buffer) - len(self._first))]
+                    break
+                del self._buffer[:index + len(self._first)]
+                self._state = 'delimiter'
+            elif self._state == 'delimiter':
+                if len(self._buffer) < 2:
+                    break
+                if self._buffer[:2] == b'--':
+                    self._state = 'end'
+                    self._buffer.clear()
+                    break
+                if (index := self._buffer.find(b'\r\n')) < 0:
+                    break
+                # transport padding after boundary is ignored
+                del self._buffer[:index + 2]
+                self._scanned = 0
+                self._state = 'part'
+            else:
+                index = self._buffer.find(self._delimiter, self._scanned)
+                if index < 0:
+                    self._scanned = max(0, len(self._buffer) - len(self._delimiter))
+                    break
+                parts.append(_split_part(bytes(self._buffer[:index])))
+                del self._buffer[:index + len(self._delimiter)]
+                self._state = 'delimiter'
+        return parts
+
+
+def _split_part(part: bytes) -> Tuple[Dict[str, str], bytes]:
+    if part.startswith(b'\r\n'):
+        return {}, part[2:]
+    head, _, body = part.partition(b'\r\n\r\n')
+    headers: Dict[str, str] = {}
+    for line in head.decode('latin-1').split('\r\n'):
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return headers, body
+
+
+def boundary_of(content_type: str) -> str:
+    """Boundary parameter of multipart Content-Type
+
+    Raises:
+        ValueError: content type has no boundary
+    """
+    if (match := _boundary.search(content_type)) is None:
+        raise ValueError(f'No boundary in {content_type}')
+    return match.group(1)
+
+
+def iter_parts(chunks: Iterable[bytes], content_type: str) -> Iterator[Tuple[Dict[str, str], bytes]]:
+    """Yield (headers, body) of parts from iterable of body chunks"""
+    parser = MultipartParser(boundary_of(content_type))
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+
+
+def related_document(body: bytes, content_type: str, codec: Optional[JsonCodec] = None) -> Dict[str, Any]:
+    """Document from multipart/related part, first part is document JSON and next
+    parts are attachments marked with follows, their raw bodies are set as data"""
+    parts = iter_parts([body], content_type)
+    headers, doc_body = next(parts)
+    doc = (codec or default_codec).loads(doc_body)
+    following = [name for name, att in doc.get('_attachments', {}).items() if att.get('follows')]
+    for index, (headers, att_body) in enumerate(parts):
+        if (match := _filename.search(headers.get('content-disposition', ''))) is not None:
+            name = match.group(1)
+        elif index < len(following):
+            name = following[index]
+        else:
+            continue
+        att = doc.setdefault('_attachments', {}).setdefault(name, {})
+        att.pop('follows', None)
+        att['data'] = att_body
+    return doc
+
+
+def iter_documents(chunks: Iterable[bytes], content_type: str,
+                   codec: Optional[JsonCodec] = None) -> Iterator[Dict[str, Any]]:
+    """Yield documents from multipart/mixed response of _bulk_get or open_revs,
+    or from multipart/related response of single document.
+    Attachment bodies are bytes in _attachments[name]['data'], error parts are returned as they are.
+    JSON parts are parsed with codec, default one when not given.
+    """
+    loads = (codec or default_codec).loads
+    if content_type.lower().startswith('multipart/related'):
+        yield related_document(b''.join(chunks), content_type, codec)
+        return
+    for headers, body in iter_parts(chunks, content_type):
+        part_type = headers.get('content-type', 'application/json')
+        if part_type.lower().startswith('multipart/related'):
+            yield related_document(body, part_type, codec)
+        else:
+            yield loads(body)
@@ -1,20 +1,47 @@
-from typing import Dict, Any, List
+from .json import Json
+from typing import Dict, Any, List, Optional, Union
 
 
 class FindQuery:
+    """Query for _find, attributes are sent only when they differ from CouchDB defaults
+
+    Attributes:
+        selector (dict): Mango selector
+        limit (int): maximum number of documents, page size for find_iter
+        skip (int): skip first documents
+        sort (list): sort syntax, e.g. [{'name': 'asc'}]
+        fields (list): fields returned for every document
+        use_index (str or list): design document or [design document, index name]
+        conflicts (bool): include _conflicts of documents
+        r (int): read quorum
+        bookmark (str): start after page with this bookmark
+        update (bool): False to return results without waiting for index update
+        stable (bool): use the same set of shard replicas for every request
+        stale (str): 'ok' is same as stable=True and update=False
+        execution_stats (bool): include execution statistics in response
+    """
     def __init__(self) -> None:
         self.selector: Dict[str, Dict[str, Any]] = {}
         self.limit: int = 25
         self.skip: int = 0
         self.sort: List[Dict[Any, Any]] = []
         self.fields: List[str] = []
-        self.use_index: List[str] = []
+        self.use_index: Union[str, List[str]] = []
+        self.conflicts: bool = False
         self.r: int = 1
         self.bookmark: str = ''
-        self.update: bool = False
+        self.update: bool = True
         self.stable: bool = False
         self.stale: str = ''
-        self.execution_status: bool = False
+        self.execution_stats: bool = False
+
+    @property
+    def execution_status(self) -> bool:
+        return self.execution_stats
+
+    @execution_status.setter
+    def execution_status(self, value: bool):
+        self.execution_stats = value
 
     def to_json(self) -> Dict[str, Any]:
         ret: Dict[str, Any] = {}
@@ -32,7 +59,28 @@ class FindQuery:
             ret['fields'] = self.fields
         
         if self.use_index:
-            ret['']
+            ret['use_index'] = self.use_index
+        
+        if self.conflicts:
+            ret['conflicts'] = True
+        
+        if self.r != 1:
+            ret['r'] = self.r
+        
+        if self.bookmark:
+            ret['bookmark'] = self.bookmark
+        
+        if not self.update:
+            ret['update'] = False
+        
+        if self.stable:
+            ret['stable'] = True
+        
+        if self.stale:
+            ret['stale'] = self.stale
+        
+        if self.execution_stats:
+            ret['execution_stats'] = True
         
         return ret
     
@@ -46,4 +94,77 @@ class IndexQuery:
     def to_json(self) -> Dict[str, Any]:
         return {"index": {"fields": self.fields.copy()},
                 "name": self.name,
-                "type": self.type}
\ No newline at end of file
+                "type": self.type}
+
+
+class ViewQuery:
+    """Options of map/reduce view query, attributes left as None are not sent
+
+    Attributes:
+        key: only rows with this key
+        keys (list): only rows with given keys, sent in body of POST request
+        start_key: first key of range
+        end_key: last key of range
+        start_key_doc_id (str): first document id for rows with start_key
+        end_key_doc_id (str): last document id for rows with end_key
+        inclusive_end (bool): include rows with end_key
+        descending (bool): reverse order of rows
+        limit (int): maximum number of rows
+        skip (int): skip first rows
+        reduce (bool): False to skip reduce function
+        group (bool): group results by key
+        group_level (int): group results by first elements of array keys
+        include_docs (bool): include documents in rows
+        conflicts (bool): include _conflicts of included documents
+        update (str): 'true', 'false' or 'lazy'
+        stable (bool): use the same set of shard replicas for every request
+        update_seq (bool): include update_seq of view index in response
+
+    Example:
+        >>> query = ViewQuery(start_key=['2021', 1], end_key=['2021', {}], group_level=2)
+        >>> db.view('stats', 'by_month', query)
+    """
+    _json_keys = ('key', 'keys', 'start_key', 'end_key')
+    _fields = ('key', 'keys', 'start_key', 'end_key', 'start_key_doc_id', 'end_key_doc_id',
+               'inclusive_end', 'descending', 'limit', 'skip', 'reduce', 'group', 'group_level',
+               'include_docs', 'conflicts', 'update', 'stable', 'update_seq')
+
+    def __init__(self, **kwargs: Any) -> None:
+        self.key: Any = None
+        self.keys: Optional[List[Any]] = None
+        self.start_key: Any = None
+        self.end_key: Any = None
+        self.start_key_doc_id: Optional[str] = None
+        self.end_key_doc_id: Optional[str] = None
+        self.inclusive_end: Optional[bool] = None
+        self.descending: Optional[bool] = None
+        self.limit: Optional[int] = None
+        self.skip: Optional[int] = None
+        self.reduce: Optional[bool] = None
+        self.group: Optional[bool] = None
+        self.group_level: Optional[int] = None
+        self.include_docs: Optional[bool] = None
+        self.conflicts: Optional[bool] = None
+        self.update: Optional[str] = None
+        self.stable: Optional[bool] = None
+        self.update_seq: Optional[bool] = None
+        for name, value in kwargs.items():
+            if name not in self._fields:
+                raise TypeError(f'Unknown view option {name}')
+            setattr(self, name, value)
+
+    def to_json(self) -> Dict[str, Any]:
+        """Options for body of POST request and for queries endpoint"""
+        return {name: getattr(self, name) for name in self._fields if getattr(self, name) is not None}
+
+    def to_query(self) -> Dict[str, str]:
+        """Options for query string, keys are JSON encoded"""
+        ret: Dict[str, str] = {}
+        for name, value in self.to_json().items():
+            if name in self._json_keys:
+                ret[name] = Json.dumps(value)
+            elif isinstance(value, bool):
+                ret[name] = 'true' if value else 'false'
+            else:
+                ret[name] = str(value)
+        return ret
@@ -13,7 +13,8 @@
 # limitations under the License.
 
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from .changes import Checkpoint, DbUpdatesWatcher, iter_lines
 from .connections.urllibcon import UrllibConn
 from .exceptions import ServerError
      
@@ -88,6 +89,21 @@ class Server:
         raise NotImplementedError
 
     def db_updates(self, feed:str="", timeout:int=60, heartbeat:int=60000, since:str=""):
+        """Events of all databases in the CouchDB instance.
+        
+        Args:
+            feed (str): normal, longpoll or continuous
+            timeout (int): milliseconds after which server closes response
+            heartbeat (int): milliseconds between empty lines
+            since (str): return only updates since given sequence
+        
+        Returns:
+            dict: results and last_seq, for continuous feed iterator of events
+                  until server closes response, the last one with last_seq
+        
+        Raises:
+            ServerError
+        """
         args: Dict[str, Any] = dict()
         if feed:
             args['feed'] = feed
@@ -97,9 +113,24 @@ class Server:
             args['heartbeat'] = heartbeat
         if since:
             args['since'] = since
-        if (resp := self.conn.get(path='_db_updates', query=args)).status != 200:
+        if (resp := self.conn.get(path='_db_updates', query=args, stream=True)).status != 200:
             raise ServerError(resp.status)
+        if feed == 'continuous':
+            return (self.conn.json.loads(line) for line in iter_lines(resp.iter_bytes()) if line.strip())
         return resp.get_data()
+    
+    def watch_db_updates(self, since:str = "", checkpoint: Optional[Checkpoint] = None, **kwargs: Any) -> DbUpdatesWatcher:
+        """Long-running watcher of _db_updates dispatching events to per-database handlers,
+        see DbUpdatesWatcher
+        
+        Args:
+            since (str): start sequence, 'now' if empty and there is no checkpoint
+            checkpoint (Checkpoint): storage for processed sequence
+        
+        Returns:
+            DbUpdatesWatcher:
+        """
+        return DbUpdatesWatcher(self.conn, since=since, checkpoint=checkpoint, **kwargs)
 
     def membership(self):
         """Displays the nodes that are part of the cluster as cluster_nodes.
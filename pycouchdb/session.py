@@ -0,0 +1,174 @@
+from __future__ import annotations
+from .doc import Document
+from .exceptions import DatabaseError, DocumentError
+from typing import Any, Dict, Iterable, List, Optional, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .db import Database
+
+
+class Session:
+    """Unit of work over database. Documents are loaded through identity map,
+    so there is one Document instance for every id in session, changes are
+    tracked and commit writes only added, changed and deleted documents in
+    one _bulk_docs request.
+
+    Args:
+        db (Database): database
+
+    Example:
+        >>> with db.session() as session:
+        ...     user = session.get('john')
+        ...     user['email'] = 'john.doe@localhost'
+        ...     session.add({'_id': 'jane', 'name': 'jane'})
+        ...     session.delete('bob')
+        >>> # committed at the end of block
+    """
+    def __init__(self, db: Database) -> None:
+        self.db = db
+        self._identity: Dict[str, Document] = {}
+        self._new: List[Document] = []
+        # id and rev of deleted documents, rev is looked up on commit when unknown
+        self._deleted: Dict[str, str] = {}
+
+    def get(self, doc_id: str) -> Optional[Document]:
+        """Document from identity map, loaded from database on first access
+
+        Returns:
+            Document: None when document does not exist or was deleted in session
+        """
+        if doc_id in self._deleted:
+            return None
+        if (doc := self._identity.get(doc_id)) is None:
+            data = self.db.get(doc_id)
+            if not data:
+                return None
+            doc = self._identity[doc_id] = self._loaded(Document(data))
+        return doc
+
+    def get_many(self, ids: Iterable[str]) -> List[Document]:
+        """Documents from identity map, missing ones are loaded with one _bulk_get request
+
+        Returns:
+            list: Documents in order of ids, not existing and deleted ones are skipped
+        """
+        ids = [doc_id for doc_id in ids if doc_id not in self._deleted]
+        missing = [{'id': doc_id} for doc_id in dict.fromkeys(ids) if doc_id not in self._identity]
+        if missing:
+            for result in self.db.get_many(missing, lazy=True):
+                for item in result.get('docs', []):
+                    if (doc := item.get('ok')) is not None and not doc.fields('_deleted'):
+                        self._identity[result['id']] = self._loaded(doc)
+        return [self._identity[doc_id] for doc_id in ids if doc_id in self._identity]
+
+    def add(self, doc: Union[Dict[str, Any], Document]) -> Document:
+        """Add new document to session, it is created on commit
+
+        Args:
+            doc (dict): document, without _id server generates it
+
+        Returns:
+            Document: instance tracked by session
+
+        Raises:
+            DocumentError: other instance of document with this id is in session
+        """
+        if not isinstance(doc, Document):
+            doc = Document(doc)
+        doc.db = self.db
+        doc.dirty = True
+        if not doc.id:
+            self._new.append(doc)
+            return doc
+        if self._identity.get(doc.id, doc) is not doc:
+            raise DocumentError(messeage=f'Document {doc.id} is already in session')
+        self._deleted.pop(doc.id, None)
+        self._identity[doc.id] = doc
+        return doc
+
+    def delete(self, doc: Union[str, Document]) -> None:
+        """Mark document for deletion on commit
+
+        Args:
+            doc (str|Document): Document or its id
+        """
+        if isinstance(doc, Document):
+            if not doc.id:
+                # new document is just not created
+                self._new = [new for new in self._new if new is not doc]
+                return
+            doc_id, rev = doc.id, doc.rev
+        else:
+            doc_id, rev = doc, ''
+        if (known := self._identity.pop(doc_id, None)) is not None:
+            rev = known.rev
+        self._deleted[doc_id] = rev
+
+    @property
+    def dirty(self) -> List[Document]:
+        """Documents which will be written by commit, without deleted ones"""
+        return [doc for doc in self._identity.values() if doc.dirty] + self._new
+
+    def commit(self) -> Dict[str, Dict[str, Any]]:
+        """Write dirty, new and deleted documents with one _bulk_docs request.
+        Stored documents get new revision and are clean, rejected ones stay
+        dirty, so they can be fixed and committed again.
+
+        Returns:
+            dict: id and result with error and reason for every rejected document, empty when all were written
+
+        Raises:
+            DatabaseError
+        """
+        docs = self.dirty
+        unknown = [doc_id for doc_id, rev in self._deleted.items() if not rev]
+        if unknown:
+            self._deleted.update(self.db._current_revs(unknown))
+        stubs = [{'_id': doc_id, '_rev': rev, '_deleted': True} for doc_id, rev in self._deleted.items() if rev]
+        # documents which do not exist in database are already deleted
+        self._deleted = {doc_id: rev for doc_id, rev in self._deleted.items() if rev}
+        if not docs and not stubs:
+            return {}
+
+        results = self.db.update_many(docs + stubs)
+        errors: Dict[str, Dict[str, Any]] = {}
+        for doc, result in zip(docs, results):
+            if 'error' in result:
+                errors[result.get('id') or doc.id] = result
+                continue
+            if not doc.id:
+                doc.id = result['id']
+                self._identity[doc.id] = doc
+            doc.rev = result['rev']
+            doc.dirty = False
+        self._new = [doc for doc in self._new if not doc.id]
+        for stub, result in zip(stubs, results[len(docs):]):
+            if 'error' in result:
+                errors[stub['_id']] = result
+            else:
+                del self._deleted[stub['_id']]
+        return errors
+
+    def clear(self) -> None:
+        """Forget all documents and not committed changes"""
+        self._identity.clear()
+        self._new.clear()
+        self._deleted.clear()
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._identity
+
+    def __enter__(self) -> Session:
+        return self
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        if exc_type is not None:
+            return
+        if errors := self.commit():
+            conflict = any(result.get('error') == 'conflict' for result in errors.values())
+            raise DatabaseError(409 if conflict else 0, messeage=f"Documents not stored: {', '.join(errors)}")
+
+    def _loaded(self, doc: Document) -> Document:
+        doc.db = self.db
+        doc.dirty = False
+        return doc
@@ -0,0 +1,216 @@
+import re
+from .json import JsonCodec, default_codec
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+ROW_KEYS = ('rows', 'docs', 'results')
+
+_structural = re.compile(rb'[\[\]{}",:]')
+_string_end = re.compile(rb'["\\]')
+_whitespace = b' \t\r\n'
+
+
+class RowParser:
+    """Incremental parser for CouchDB responses with list of rows.
+    Body is fed in chunks of bytes and every complete element of the
+    rows array ({"rows": [...]}, {"docs": [...]}, {"results": [...]} or
+    top level array) is returned as soon as its last byte arrives, so
+    memory use depends on size of single row not on size of response.
+    Remaining fields of envelope (total_rows, bookmark, last_seq ...)
+    are available in meta after close.
+
+    Args:
+        keys (tuple): names of top level keys holding rows
+        raw (bool): return rows as bytes with JSON instead of parsed objects
+        codec (JsonCodec): codec parsing rows, default one when not given
+
+    Example:
+        >>> parser = RowParser()
+        >>> for chunk in chunks:
+        ...     for row in parser.feed(chunk):
+        ...         print(row)
+        >>> parser.close()
+        >>> parser.meta['total_rows']
+    """
+    def __init__(self, keys: Tuple[str, ...] = ROW_KEYS, raw:bool = False, codec: Optional[JsonCodec] = None) -> None:
+        self.keys = {key.encode() for key in keys}
+        self.raw = raw
+        self._loads = (codec or default_codec).loads
+        self.meta: Dict[str, Any] = {}
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # depth of rows array, 0 when outside of it
+        self._rows_depth = 0
+        self._row = bytearray()
+        self._envelope = bytearray()
+        self._string = bytearray()
+        self._key = b''
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Parse next chunk of body
+
+        Returns:
+            list: rows completed in this chunk
+        """
+        rows: List[Any] = []
+        pos = 0
+        start = 0
+        end = len(chunk)
+        while pos < end:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                if (match := _string_end.search(chunk, pos)) is None:
+                    self._capture_string(chunk, pos, end)
+                    pos = end
+                    break
+                self._capture_string(chunk, pos, match.start())
+                pos = match.end()
+                if match.group() == b'\\':
+                    self._escape = True
+                else:
+                    self._in_string = False
+                continue
+
+            if (match := _structural.search(chunk, pos)) is None:
+                break
+            char = match.group()
+            pos = match.end()
+
+            if char == b'"':
+                self._in_string = True
+                self._string.clear()
+            elif char == b':':
+                if self._depth == 1:
+                    self._key = bytes(self._string)
+            elif char in b'[{':
+                self._depth += 1
+                if char == b'[' and not self._rows_depth and (
+                        self._depth == 1 or (self._depth == 2 and self._key in self.keys)):
+                    # rows array starts, keep envelope with empty array
+                    self._flush(chunk, start, pos)
+                    self._rows_depth = self._depth
+                    start = pos
+            elif char in b']}':
+                if self._rows_depth and self._depth == self._rows_depth:
+                    self._flush(chunk, start, pos - 1)
+                    self._emit_row(rows)
+                    self._rows_depth = 0
+                    start = pos - 1
+                self._depth -= 1
+            elif char == b',':
+                if self._rows_depth and self._depth == self._rows_depth:
+                    self._flush(chunk, start, pos - 1)
+                    self._emit_row(rows)
+                    start = pos
+
+        self._flush(chunk, start, end)
+        return rows
+
+    def close(self) -> None:
+        """Finish parsing, envelope without rows is parsed into meta
+
+        Raises:
+            ValueError: body was incomplete
+        """
+        if self._depth or self._in_string:
+            raise ValueError('Incomplete JSON body')
+        envelope = bytes(self._envelope).strip()
+        if envelope.startswith(b'{'):
+            self.meta = self._loads(envelope)
+            for key in self.keys:
+                self.meta.pop(key.decode(), None)
+
+    def _capture_string(self, chunk: bytes, start:int, end:int) -> None:
+        # only keys of top level object are needed
+        if self._depth == 1:
+            self._string += chunk[start:end]
+
+    def _flush(self, chunk: bytes, start:int, end:int) -> None:
+        if self._rows_depth:
+            self._row += chunk[start:end]
+        else:
+            self._envelope += chunk[start:end]
+
+    def _emit_row(self, rows: List[Any]) -> None:
+        row = bytes(self._row).strip(_whitespace)
+        self._row.clear()
+        if row:
+            rows.append(row if self.raw else self._loads(row))
+
+
+def iter_rows(chunks: Iterable[bytes], keys: Tuple[str, ...] = ROW_KEYS, raw:bool = False, meta: Any = None,
+              codec: Optional[JsonCodec] = None) -> Iterator[Any]:
+    """Yield rows from iterable of body chunks, see RowParser
+
+    Args:
+        chunks (Iterable[bytes]): body chunks
+        keys (tuple): names of top level keys holding rows
+        raw (bool): yield rows as bytes with JSON
+        meta (dict): if given is updated with envelope fields after last row
+        codec (JsonCodec): codec parsing rows
+    """
+    parser = RowParser(keys, raw=raw, codec=codec)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    parser.close()
+    if meta is not None:
+        meta.update(parser.meta)
+
+
+def object_fields(raw: bytes, keys: Iterable[str]) -> Dict[str, bytes]:
+    """Raw JSON of values of top level keys of object without parsing it.
+    Scanning stops when all keys are found, so fields at the beginning of
+    large document (like _id and _rev) are cheap.
+
+    Args:
+        raw (bytes): JSON object
+        keys (Iterable[str]): wanted keys
+
+    Returns:
+        dict: key and raw JSON of its value, for keys present in object
+
+    Raises:
+        ValueError: object is incomplete
+    """
+    wanted = {key.encode(): key for key in keys}
+    ret: Dict[str, bytes] = {}
+    depth = 0
+    pos = 0
+    key = b''
+    current: Optional[bytes] = None
+    value_start = 0
+    while wanted:
+        if (match := _structural.search(raw, pos)) is None:
+            raise ValueError('Incomplete JSON object')
+        char = match.group()
+        pos = match.end()
+        if char == b'"':
+            start = pos
+            while True:
+                if (end := _string_end.search(raw, pos)) is None:
+                    raise ValueError('Incomplete JSON object')
+                pos = end.end()
+                if end.group() == b'"':
+                    break
+                # skip escaped char
+                pos += 1
+            if depth == 1:
+                key = raw[start:pos - 1]
+        elif char == b':':
+            if depth == 1 and key in wanted:
+                current = key
+                value_start = pos
+        elif char in b'[{':
+            depth += 1
+        else:
+            if char != b',':
+                depth -= 1
+            if current is not None and (depth == 0 or (char == b',' and depth == 1)):
+                ret[wanted.pop(current)] = raw[value_start:match.start()].strip(_whitespace)
+                current = None
+            if depth == 0:
+                break
+    return ret
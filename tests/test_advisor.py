@@ -0,0 +1,37 @@
+from pycouchdb.advisor import analyze, selector_fields
+from pycouchdb.query import FindQuery
+
+all_docs = {'ddoc': None, 'name': '_all_docs', 'type': 'special', 'def': {'fields': [{'_id': 'asc'}]}}
+by_type = {'ddoc': '_design/type', 'name': 'type', 'type': 'json', 'def': {'fields': [{'type': 'asc'}]}}
+by_type_date = {'ddoc': '_design/td', 'name': 'type-date', 'type': 'json',
+                'def': {'fields': [{'type': 'asc'}, {'date': 'asc'}]}}
+
+
+def query(selector, sort=[]) -> FindQuery:
+    ret = FindQuery()
+    ret.selector = selector
+    ret.sort = sort
+    return ret
+
+
+def test_selector_fields():
+    fields = selector_fields({'type': 'event', 'date': {'$gt': 5}, 'user': {'name': 'x'},
+                              '$and': [{'n': {'$eq': 1}}], '$or': [{'a': 1}]})
+    assert fields == {'type': True, 'date': False, 'user.name': True, 'n': True}
+
+
+def test_full_scan_proposes_index():
+    advice = analyze(query({'date': {'$gt': 5}, 'type': 'event'}, [{'date': 'asc'}]), all_docs, [all_docs])
+    assert advice.full_scan and not advice.ok
+    assert advice.proposed.fields == ['type', 'date']
+
+
+def test_partial_index_and_existing_index():
+    advice = analyze(query({'type': 'event', 'date': {'$gt': 5}}), by_type, [all_docs, by_type, by_type_date])
+    assert advice.partial and advice.uncovered == ['date']
+    assert advice.use_index == ['_design/td', 'type-date']
+
+
+def test_covered():
+    advice = analyze(query({'type': 'event', 'date': {'$gt': 5}}), by_type_date, [by_type_date])
+    assert advice.ok and advice.proposed is None
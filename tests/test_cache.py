@@ -0,0 +1,62 @@
+from pycouchdb.cache import Cache, QueryCache
+from pycouchdb.json import StdlibCodec
+
+
+def test_lru_by_count():
+    cache = Cache(max_items=2)
+    cache.put('db/a', {'_id': 'a', '_rev': '1-a'})
+    cache.put('db/b', {'_id': 'b', '_rev': '1-b'})
+    assert cache.lookup('db/a')[0].rev == '1-a'
+    cache.put('db/c', {'_id': 'c', '_rev': '1-c'})
+    assert cache.lookup('db/b') == (None, False)
+    assert len(cache) == 2
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_by_bytes():
+    cache = Cache(max_bytes=100)
+    cache.put('db/a', {'_id': 'a', 'data': 'x' * 40})
+    cache.put('db/b', {'_id': 'b', 'data': 'x' * 40})
+    assert cache.lookup('db/a') == (None, False)
+    cache.put('db/big', {'_id': 'big', 'data': 'x' * 200})
+    assert cache.lookup('db/big') == (None, False)
+    assert cache.stats()['bytes'] <= 100
+
+
+def test_fresh_and_copies():
+    cache = Cache(fresh_for=60)
+    cache.put('db/a', {'_id': 'a', '_rev': '1-a', 'v': 1})
+    entry, fresh = cache.lookup('db/a')
+    assert fresh
+    doc = entry.load()
+    doc['v'] = 2
+    assert cache.revalidated(entry)['v'] == 1
+    cache.invalidate('db/a')
+    stats = cache.stats()
+    assert (stats['hits'], stats['revalidations'], stats['invalidations'], stats['items']) == (1, 1, 1, 0)
+
+
+def test_codec_of_entry():
+    class Counting(StdlibCodec):
+        calls = 0
+
+        def loads(self, data):
+            self.calls += 1
+            return super().loads(data)
+
+    codec = Counting()
+    cache = Cache()
+    cache.put('db/a', {'_id': 'a', '_rev': '1-a'}, codec=codec)
+    entry, _ = cache.lookup('db/a')
+    assert entry.data == codec.dumpb({'_id': 'a', '_rev': '1-a'})
+    assert entry.load() == {'_id': 'a', '_rev': '1-a'}
+    assert codec.calls == 1
+
+
+def test_query_cache_key_and_etag():
+    cache = QueryCache()
+    key = cache.key('db/_find', data={'selector': {'a': 1, 'b': 2}, 'limit': 25})
+    assert key == cache.key('db/_find', data={'limit': 25, 'selector': {'b': 2, 'a': 1}})
+    assert key != cache.key('db/_find', data={'limit': 25, 'selector': {'a': 2, 'b': 1}})
+    cache.put(key, {'docs': []}, rev='"etag-1"')
+    assert cache.lookup(key)[0].rev == '"etag-1"'
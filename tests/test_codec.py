@@ -0,0 +1,40 @@
+import pytest
+from pycouchdb.json import JsonCodec, StdlibCodec, available_codecs, get_codec
+from pycouchdb.stream import RowParser
+
+doc = {'_id': 'zażółć', 'n': [1, 2.5, None, True], 'nested': {'a': 'b/c'}}
+
+
+@pytest.mark.parametrize('codec', available_codecs(), ids=lambda codec: codec.name)
+def test_bytes_round_trip(codec: JsonCodec):
+    data = codec.dumpb(doc)
+    assert isinstance(data, bytes)
+    assert codec.loads(data) == doc
+    assert codec.loads(data.decode()) == doc
+
+
+def test_get_codec():
+    stdlib = StdlibCodec()
+    assert get_codec(stdlib) is stdlib
+    assert get_codec('json').name == 'json'
+    assert get_codec().name in ('ujson', 'json')
+    with pytest.raises(ValueError):
+        get_codec('yaml')
+    with pytest.raises(TypeError):
+        JsonCodec()
+
+
+def test_row_parser_codec():
+    class Counting(StdlibCodec):
+        calls = 0
+
+        def loads(self, data):
+            self.calls += 1
+            return super().loads(data)
+
+    codec = Counting()
+    parser = RowParser(codec=codec)
+    rows = parser.feed(b'{"total_rows": 2, "rows": [{"id": "a"}, {"id": "b"}]}')
+    parser.close()
+    assert rows == [{'id': 'a'}, {'id': 'b'}]
+    assert codec.calls == 3
@@ -0,0 +1,29 @@
+#!/usr/bin/python3
+import pytest
+from pycouchdb.json import Json, available_codecs
+
+pytest.importorskip('pytest_benchmark')
+
+# typical _bulk_docs request and response
+bulk_docs = {'docs': [{'_id': f'{i:06d}', 'type': 'event', 'name': f'event {i}', 'value': i * 1.5,
+                       'tags': ['a', 'b', 'c'], 'meta': {'source': 'sensor', 'ok': True}} for i in range(1000)]}
+bulk_result = [{'ok': True, 'id': f'{i:06d}', 'rev': f'1-{i:032x}'} for i in range(1000)]
+bulk_result_body = Json.dumps(bulk_result).encode('utf8')
+
+
+def str_round_trip():
+    # previous path: str from Json, encoded for request and decoded before parsing response
+    Json.dumps(bulk_docs).encode('utf8')
+    return Json.loads(bulk_result_body.decode())
+
+
+def test_str_round_trip(benchmark):
+    assert len(benchmark(str_round_trip)) == 1000
+
+
+@pytest.mark.parametrize('codec', available_codecs(), ids=lambda codec: codec.name)
+def test_bytes_round_trip(benchmark, codec):
+    def round_trip():
+        codec.dumpb(bulk_docs)
+        return codec.loads(bulk_result_body)
+    assert len(benchmark(round_trip)) == 1000
@@ -0,0 +1,60 @@
+import gzip
+from pycouchdb.connections.compression import GzipCodec, Transfer
+
+body = b'{"rows": [' + b','.join(b'{"id": "%d", "value": null}' % i for i in range(500)) + b']}'
+
+
+def test_encode_body():
+    codec = GzipCodec(enabled=True, min_size=1024)
+    headers = {}
+    data = codec.encode_body(body, headers)
+    assert headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(data) == body
+
+    headers = {}
+    assert codec.encode_body(b'{"a": 1}', headers) == b'{"a": 1}'
+    assert 'Content-Encoding' not in headers
+    # streamed bodies are sent as they are
+    chunks = iter([body])
+    assert codec.encode_body(chunks, headers) is chunks
+
+    stats = codec.stats()
+    assert stats['requests'] == 3
+    assert stats['sent_raw'] == len(body) + 8
+    assert stats['sent'] == len(data) + 8
+
+
+def test_disabled_codec_counts_only():
+    codec = GzipCodec()
+    headers = {}
+    assert codec.request_headers() == {}
+    assert codec.encode_body(body, headers) == body
+    assert headers == {}
+    assert codec.decode_body(body, '') == body
+    assert codec.stats()['received'] == codec.stats()['received_raw'] == len(body)
+
+
+def test_decode_streamed():
+    codec = GzipCodec(enabled=True)
+    compressed = gzip.compress(body)
+    assert codec.decode_body(compressed, 'gzip') == body
+    for size in (1, 7, 100, len(compressed)):
+        chunks = [compressed[i:i + size] for i in range(0, len(compressed), size)]
+        assert b''.join(codec.iter_decoded(chunks, 'gzip')) == body
+    stats = codec.stats()
+    assert stats['received'] == 5 * len(compressed)
+    assert stats['received_raw'] == 5 * len(body)
+
+
+def test_transfer_of_request():
+    codec = GzipCodec(enabled=True)
+    transfer = Transfer()
+    data = codec.encode_body(body, {}, transfer)
+    compressed = gzip.compress(body)
+    chunks = [compressed[i:i + 100] for i in range(0, len(compressed), 100)]
+    assert b''.join(codec.iter_decoded(chunks, 'gzip', transfer)) == body
+    assert (transfer.sent, transfer.sent_raw) == (len(data), len(body))
+    assert (transfer.received, transfer.received_raw) == (len(compressed), len(body))
+    assert transfer.duration > 0
+    # codec counters include the request too
+    assert codec.stats()['received'] == len(compressed)
@@ -0,0 +1,151 @@
+import json
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+import pytest
+from pycouchdb.cache import QueryCache
+from pycouchdb.connections import Response
+from pycouchdb.db import Database
+from pycouchdb.json import default_codec
+from pycouchdb.query import FindQuery, ViewQuery
+
+
+class FakeResponse(Response):
+    def __init__(self, status: int, data: Any, headers: Dict[str, str] = {}) -> None:
+        self._status = status
+        self.body = json.dumps(data).encode()
+        self.headers = headers
+
+    @property
+    def status(self) -> int:
+        return self._status
+
+    def get_data(self) -> Any:
+        return self.json.loads(self.body)
+
+    def get_headers(self) -> Dict[str, str]:
+        return self.headers
+
+    def iter_bytes(self, chunk_size: int = 65536) -> Iterator[bytes]:
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+
+class FakeConn:
+    """Connection answering requests with handlers registered for method and path"""
+    json = default_codec
+
+    def __init__(self) -> None:
+        self.handlers: Dict[Tuple[str, str], Callable[..., FakeResponse]] = {}
+        self.requests: List[Tuple[str, str]] = []
+
+    def request(self, method: str, path: str, **kwargs) -> FakeResponse:
+        self.requests.append((method, path))
+        return self.handlers[(method, path)](**kwargs)
+
+    def get(self, path: str, **kwargs) -> FakeResponse:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> FakeResponse:
+        return self.request('POST', path, **kwargs)
+
+
+class Forbidden:
+    """Advisor failing every check"""
+    def check(self, query) -> None:
+        raise AssertionError('advisor used')
+
+
+@pytest.fixture
+def conn() -> FakeConn:
+    return FakeConn()
+
+
+def test_purge_where(conn):
+    # documents l* can not be purged, they fill whole pages before rest of matches
+    docs = {f'l{i}': '1-a' for i in range(4)}
+    docs.update({f'm{i}': '1-a' for i in range(3)})
+    bookmarks = []
+
+    def find(data=None, **kwargs) -> FakeResponse:
+        bookmarks.append(data.get('bookmark'))
+        after = data.get('bookmark') or ''
+        page = [{'_id': doc_id, '_rev': rev} for doc_id, rev in sorted(docs.items()) if doc_id > after]
+        page = page[:data['limit']]
+        return FakeResponse(200, {'docs': page, 'bookmark': page[-1]['_id'] if page else 'nil'})
+
+    def purge(data=None, **kwargs) -> FakeResponse:
+        purged = {doc_id: revs for doc_id, revs in data.items() if doc_id.startswith('m')}
+        for doc_id in purged:
+            del docs[doc_id]
+        return FakeResponse(201, {'purge_seq': None, 'purged': purged})
+
+    conn.handlers[('POST', 'db/_find')] = find
+    conn.handlers[('POST', 'db/_purge')] = purge
+    db = Database('db', conn, query_cache=QueryCache())
+    db.advisor = Forbidden()
+    results = db.purge_where({'type': 'session'}, chunk_size=2)
+    assert {doc_id for doc_id, revs in results.items() if revs} == {'m0', 'm1', 'm2'}
+    assert sorted(docs) == ['l0', 'l1', 'l2', 'l3']
+    # two pages without purged documents are skipped with bookmark
+    assert bookmarks == [None, 'l1', 'l3', 'l3', 'l3']
+    assert len(db.query_cache) == 0
+
+
+def all_docs_handler(ids: List[str], requests: List[Dict[str, Any]]) -> Callable[..., FakeResponse]:
+    def all_docs(query=None, stream=False, **kwargs) -> FakeResponse:
+        requests.append(dict(query, stream=stream))
+        start = json.loads(query['startkey']) if 'startkey' in query else ''
+        rows = [{'id': doc_id, 'key': doc_id, 'value': {'rev': '1-a'}} for doc_id in ids if doc_id >= start]
+        if 'include_docs' in query:
+            for row in rows:
+                row['doc'] = {'_id': row['id'], '_rev': '1-a'}
+        return FakeResponse(200, {'total_rows': len(ids), 'offset': 0, 'rows': rows[:query['limit']]},
+                            headers={'ETag': '"all"'})
+    return all_docs
+
+
+def test_full_scan_not_cached(conn):
+    ids = [f'doc{i:02}' for i in range(7)]
+    requests: List[Dict[str, Any]] = []
+    conn.handlers[('GET', 'db/_all_docs')] = all_docs_handler(ids, requests)
+    db = Database('db', conn, query_cache=QueryCache())
+    assert list(db) == ids
+    # iteration streams pages one after another, without background thread
+    assert len(requests) == 1 and requests[0]['stream']
+    assert [doc['_id'] for doc in db.get_all_docs(page_size=3)] == ids
+    assert [row['id'] for row in db.list_documents(page_size=3)] == ids
+    assert len(requests) == 7
+    assert len(db.query_cache) == 0
+
+
+def test_view_cached_with_etag(conn):
+    sent = []
+
+    def view(query=None, headers={}, **kwargs) -> FakeResponse:
+        sent.append(headers.get('If-None-Match'))
+        if headers.get('If-None-Match') == '"v1"':
+            return FakeResponse(304, None)
+        return FakeResponse(200, {'rows': [{'key': 'a', 'value': 3}]}, headers={'ETag': '"v1"'})
+
+    conn.handlers[('GET', 'db/_design/stats/_view/by_type')] = view
+    db = Database('db', conn, query_cache=QueryCache())
+    query = ViewQuery(group=True)
+    assert db.view('stats', 'by_type', query) == db.view('_design/stats', 'by_type', query)
+    assert sent == [None, '"v1"']
+    assert db.query_cache.stats()['revalidations'] == 1
+
+
+def test_find_not_cached(conn):
+    sent = []
+
+    def find(data=None, headers={}, stream=False, **kwargs) -> FakeResponse:
+        sent.append((headers.get('If-None-Match'), stream))
+        return FakeResponse(200, {'docs': [{'_id': 'a'}, {'_id': 'b'}], 'bookmark': 'b'})
+
+    conn.handlers[('POST', 'db/_find')] = find
+    db = Database('db', conn, query_cache=QueryCache())
+    query = FindQuery()
+    query.selector = {'type': 'event'}
+    assert db.find(query)['bookmark'] == 'b'
+    assert [doc['_id'] for doc in db.find(query, iterator=True)] == ['a', 'b']
+    assert sent == [(None, False), (None, True)]
+    assert len(db.query_cache) == 0
@@ -1,5 +1,6 @@
+import json
 import pytest
-from pycouchdb.doc import Document
+from pycouchdb.doc import Document, DocumentList
 
 @pytest.fixture
 def doc() -> Document:
@@ -47,4 +48,78 @@ def test_items(doc: Document):
     result = 0
     for _,v in doc.items():
         result += v
-    assert result == 6
\ No newline at end of file
+    assert result == 6
+
+
+def test_lazy_document():
+    raw = b'{"_id":"a","_rev":"1-x","n":1,"body":{"deep":[1,2]}}'
+    doc = Document.from_json(raw)
+    assert doc.id == 'a' and doc.rev == '1-x'
+    assert doc.fields('n', 'missing') == {'n': 1}
+    assert not doc.parsed
+    assert doc.raw is raw
+    assert doc['body']['deep'] == [1, 2]
+    assert doc.parsed
+    doc['n'] = 2
+    assert json.loads(doc.raw) == {'_id': 'a', '_rev': '1-x', 'n': 2, 'body': {'deep': [1, 2]}}
+
+
+def test_dirty_tracking(doc: Document):
+    assert doc.dirty
+    doc.dirty = False
+    doc.pop('nonexist')
+    assert not doc.dirty
+    doc.pop('a')
+    assert doc.dirty
+    doc.dirty = False
+    del doc['b']
+    assert doc.dirty
+    lazy = Document.from_json(b'{"_id":"a","_rev":"1-x"}')
+    assert not lazy.dirty
+    lazy['n'] = 1
+    assert lazy.dirty
+
+
+def test_document_list_columns():
+    docs = [{'_id': str(i), 'type': 'sale' if i % 3 else 'refund', 'region': ['eu', 'us'][i % 2],
+             'amount': i * 1.5, 'qty': i} for i in range(30)]
+    docs[4]['note'] = 'late field'
+    dl = DocumentList(docs)
+    assert len(dl) == 30
+    assert dl.columns == ['_id', 'type', 'region', 'amount', 'qty', 'note']
+    assert dl['qty'].typecode == 'q' and dl['amount'].typecode == 'd'
+    assert dl[4] == docs[4] and dl[-1] == docs[-1]
+    assert list(dl) == docs
+
+    sales = dl.where('type', 'sale')
+    assert len(sales) == 20
+    totals = {region: sum(group['qty']) for region, group in sales.group_by('region').items()}
+    assert totals == {'us': sum(i for i in range(30) if i % 3 and i % 2), 'eu': sum(i for i in range(30) if i % 3 and not i % 2)}
+    mask = [big and eu for big, eu in zip(dl.mask('qty', lambda qty: qty > 20), dl.mask('region', lambda r: r == 'eu'))]
+    assert list(dl.filter(mask)['qty']) == [22, 24, 26, 28]
+    assert dl.project('qty')[3] == {'qty': 3}
+
+
+def test_document_list_fallback_and_fields():
+    mixed = DocumentList([{'a': 1}, {'a': 'x'}, {'a': 2 ** 70}])
+    assert mixed['a'] == [1, 'x', 2 ** 70]
+    lazy = Document.from_json(b'{"_id":"a","type":"sale","body":{"big":[1,2,3]}}')
+    dl = DocumentList([lazy], fields=['type'])
+    assert dl[0] == {'type': 'sale'}
+    assert not lazy.parsed
+
+
+def test_document_list_missing_values():
+    docs = [{'qty': 1, 'amount': None}, {'amount': 2.5}, {'qty': 3}, {'qty': None, 'amount': 1.0}]
+    dl = DocumentList(docs)
+    # sparse fields stay in typed arrays, missing values are kept in mask
+    assert dl._columns['qty'].typecode == 'q' and dl._columns['amount'].typecode == 'd'
+    assert dl['qty'] == [1, None, 3, None] and dl['amount'] == [None, 2.5, None, 1.0]
+    assert list(dl) == [{'qty': 1}, {'amount': 2.5}, {'qty': 3}, {'amount': 1.0}]
+    assert dl[3] == {'amount': 1.0}
+    assert list(dl.where('qty', None)) == [{'amount': 2.5}, {'amount': 1.0}]
+    assert list(dl.group_by('qty')[3]) == [{'qty': 3}]
+    assert dl.take([2, 1])['amount'] == [None, 2.5]
+    assert dl.project('qty')['qty'] == [1, None, 3, None]
+    dl.append({'qty': 'many'})
+    assert dl['qty'] == [1, None, 3, None, 'many']
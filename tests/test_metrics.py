@@ -0,0 +1,41 @@
+import pytest
+from pycouchdb.metrics import Metrics, RequestEvent, endpoint_of
+
+
+@pytest.mark.parametrize('path, endpoint', [
+    ('', 'server'), ('_all_dbs', '_all_dbs'), ('db', 'db'), ('db/doc', 'doc'), ('db/doc/file.png', 'attachment'),
+    ('db/_bulk_docs', '_bulk_docs'), ('db/_find', '_find'), ('db/_design/app/_view/by_type', '_view'),
+    ('db/_design/app', 'design_doc'), ('db/_local/checkpoint', '_local')])
+def test_endpoint_of(path: str, endpoint: str):
+    assert endpoint_of(path) == endpoint
+
+
+def event(duration: float, status: int = 200) -> RequestEvent:
+    ret = RequestEvent('GET', 'db/doc', sent=10)
+    ret.duration = duration
+    ret.status = status
+    ret.received = 100
+    ret.reused = True
+    return ret
+
+
+def test_metrics():
+    metrics = Metrics(buckets=(0.01, 0.1))
+    for duration, status in ((0.005, 200), (0.05, 200), (0.5, 404)):
+        metrics.after_response(event(duration, status))
+    metrics.on_error(event(1.0))
+    ret = metrics.to_dict()['GET doc']
+    assert ret['count'] == 3
+    assert ret['buckets'] == {0.01: 1, 0.1: 2, float('inf'): 3}
+    assert ret['statuses'] == {200: 2, 404: 1}
+    assert ret['errors'] == 1
+    assert ret['sent'] == 40 and ret['received'] == 300 and ret['reused'] == 3
+
+    text = metrics.to_prometheus()
+    assert '# TYPE pycouchdb_request_duration_seconds histogram' in text
+    assert 'pycouchdb_request_duration_seconds_bucket{method="GET",endpoint="doc",le="0.1"} 2' in text
+    assert 'pycouchdb_request_duration_seconds_count{method="GET",endpoint="doc"} 3' in text
+    assert 'pycouchdb_responses_total{method="GET",endpoint="doc",status="404"} 1' in text
+    assert 'pycouchdb_request_errors_total{method="GET",endpoint="doc"} 1' in text
+    metrics.reset()
+    assert metrics.to_dict() == {}
@@ -0,0 +1,35 @@
+import json
+from pycouchdb.multipart import MultipartParser, iter_documents
+
+att = bytes(range(256)) * 4
+doc = {'_id': 'a', '_rev': '1-x', '_attachments': {'blob.bin': {'content_type': 'application/octet-stream',
+                                                                 'length': len(att), 'follows': True}}}
+related = (b'--inner\r\nContent-Type: application/json\r\n\r\n' + json.dumps(doc).encode() +
+           b'\r\n--inner\r\nContent-Disposition: attachment; filename="blob.bin"\r\n'
+           b'Content-Type: application/octet-stream\r\n\r\n' + att + b'\r\n--inner--')
+body = (b'--outer\r\nContent-Type: multipart/related; boundary="inner"\r\n\r\n' + related +
+        b'\r\n--outer\r\nContent-Type: application/json\r\n\r\n{"_id": "b", "_rev": "1-y"}'
+        b'\r\n--outer\r\nContent-Type: application/json\r\n\r\n{"id": "c", "rev": "1-z", "error": "not_found"}'
+        b'\r\n--outer--')
+
+
+def chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_documents_with_attachments():
+    for size in (1, 5, 64, len(body)):
+        docs = list(iter_documents(chunks(body, size), 'multipart/mixed; boundary="outer"'))
+        assert [d.get('_id', d.get('id')) for d in docs] == ['a', 'b', 'c']
+        assert docs[0]['_attachments']['blob.bin']['data'] == att
+        assert 'follows' not in docs[0]['_attachments']['blob.bin']
+        assert docs[2]['error'] == 'not_found'
+
+
+def test_parts_emitted_before_end():
+    parser = MultipartParser('outer')
+    parts = parser.feed(body[:body.index(b'{"_id": "b"') + 5])
+    assert len(parts) == 1 and parts[0][0]['content-type'].startswith('multipart/related')
+    assert not parser.done
+    parser.feed(body[body.index(b'{"_id": "b"') + 5:])
+    assert parser.done
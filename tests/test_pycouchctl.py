@@ -0,0 +1,101 @@
+import json
+import pytest
+import pycouchctl
+
+
+class FakeDb:
+    def __init__(self, docs=None) -> None:
+        self.docs = docs or []
+        self.page_sizes = []
+
+    def add_many(self, docs, new_edits=True):
+        self.docs.extend(docs)
+        return []
+
+    def get_all_docs(self, page_size=1000):
+        self.page_sizes.append(page_size)
+        return (dict(doc) for doc in self.docs)
+
+
+class FakeClient:
+    def __init__(self, names, dbs=None) -> None:
+        self.names = set(names)
+        self.calls = []
+        self.db = FakeDb()
+        self.dbs = dbs or {}
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def delete(self, name):
+        self.calls.append(('delete', name))
+        self.names.discard(name)
+
+    def create(self, name):
+        self.calls.append(('create', name))
+        self.names.add(name)
+
+    def get_db(self, name):
+        return self.dbs.get(name, self.db)
+
+
+def test_load_missing_dump_keeps_database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = FakeClient(['nosuchdump'])
+    with pytest.raises(FileNotFoundError):
+        pycouchctl.load('nosuchdump', client)
+    assert client.calls == []
+
+
+def test_load_ndjson(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    docs = [{'_id': str(i), '_rev': f'1-{i}', 'n': i} for i in range(5)]
+    (tmp_path / 'users.ndjson').write_text('\n'.join(json.dumps(doc) for doc in docs))
+    client = FakeClient(['users'])
+    pycouchctl.load('users', client, chunk_size=2, workers=1)
+    assert client.calls == [('delete', 'users'), ('create', 'users')]
+    assert client.db.docs == [{'_id': str(i), 'n': i} for i in range(5)]
+
+
+def sample_docs(name, count=5):
+    return [{'_id': f'{name}-{i}', '_rev': f'1-{i}', 'n': i, 'name': 'ž' * i} for i in range(count)]
+
+
+@pytest.mark.parametrize('compress', [None, 'gzip', 'zstd'])
+def test_dump_ndjson_round_trip(tmp_path, monkeypatch, compress):
+    if compress == 'zstd':
+        pytest.importorskip('zstandard')
+    monkeypatch.chdir(tmp_path)
+    docs = sample_docs('users')
+    client = FakeClient(['users'], dbs={'users': FakeDb(docs)})
+    pycouchctl.dump_ndjson('users', client, compress=compress, page_size=2)
+    assert client.dbs['users'].page_sizes == [2]
+    assert (tmp_path / pycouchctl.dump_path('users', compress)).exists()
+    assert list(pycouchctl.read_docs('users')) == [{k: v for k, v in doc.items() if k != '_rev'} for doc in docs]
+
+
+def test_dump_ndjson_preserve_revs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    docs = sample_docs('users')
+    client = FakeClient(['users'], dbs={'users': FakeDb(docs)})
+    pycouchctl.dump_ndjson('users', client, compress='gzip', preserve_revs=True)
+    assert list(pycouchctl.read_docs('users')) == docs
+
+
+def test_read_docs_lines_across_reads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pycouchctl, 'READ_SIZE', 7)
+    docs = sample_docs('users', count=20)
+    client = FakeClient(['users'], dbs={'users': FakeDb(docs)})
+    pycouchctl.dump_ndjson('users', client, preserve_revs=True)
+    assert list(pycouchctl.read_docs('users')) == docs
+
+
+def test_dump_ndjson_many(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    names = [f'db{i}' for i in range(4)]
+    dbs = {name: FakeDb(sample_docs(name, count=50)) for name in names}
+    client = FakeClient(names, dbs=dbs)
+    pycouchctl.dump_ndjson_many(names, client, compress='gzip', preserve_revs=True, jobs=3)
+    for name in names:
+        assert list(pycouchctl.read_docs(name)) == dbs[name].docs
@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Tuple
+import pytest
+
+pycurl = pytest.importorskip('pycurl')
+from pycouchdb.connections.pycurlconn import PyCurlConn
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # client ports of accepted connections, one entry for every new connection
+    ports: List[int] = []
+
+    def setup(self) -> None:
+        super().setup()
+        self.ports.append(self.client_address[1])
+
+    def do_GET(self) -> None:
+        if self.path.startswith('/feed'):
+            # continuous feed, lines come slowly
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(3):
+                line = json.dumps({'seq': i}).encode() + b'\n'
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                self.wfile.flush()
+                time.sleep(0.5 if self.path == '/feed' else 3)
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        if self.path.startswith('/missing'):
+            # close without response, so transfer fails
+            self.close_connection = True
+            return
+        body = json.dumps({'path': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server() -> Iterator[Tuple[ThreadingHTTPServer, PyCurlConn]]:
+    Handler.ports = []
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    conn = PyCurlConn(f'http://127.0.0.1:{srv.server_port}')
+    yield srv, conn
+    conn.close()
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_handle_reused(server):
+    _, conn = server
+    assert [conn.get(f'db/{i}').get_data()['path'] for i in range(5)] == [f'/db/{i}' for i in range(5)]
+    curl = conn._local.curl
+    conn.get('db/5')
+    assert conn._local.curl is curl
+    # all requests of thread went over one kept-alive connection
+    assert len(Handler.ports) == 1
+
+
+def test_handle_per_thread(server):
+    _, conn = server
+    conn.get('db/0')
+    handles = []
+
+    def worker() -> None:
+        conn.get('db/1')
+        handles.append(conn._local.curl)
+        conn.close()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert handles[0] is not conn._local.curl
+    # connections are not shared between handles
+    assert len(Handler.ports) == 2
+
+
+def test_perform_many(server):
+    _, conn = server
+    requests = [{'method': 'GET', 'path': f'db/{i}'} for i in range(20)]
+    responses = conn.perform_many(requests, max_in_flight=4)
+    assert [resp.get_data()['path'] for resp in responses] == [f'/db/{i}' for i in range(20)]
+    assert len(Handler.ports) <= 4
+    # handles of multi are kept for next call
+    assert len(conn._local.multi_handles) == 4
+    conn.perform_many(requests[:4], max_in_flight=4)
+    assert len(conn._local.multi_handles) == 4
+
+
+def test_perform_many_error(server):
+    _, conn = server
+    requests = [{'path': 'db/0'}, {'path': 'missing'}, {'path': 'db/2'}]
+    with pytest.raises(pycurl.error):
+        conn.perform_many(requests)
+    # failed handle is returned to free ones and works for next requests
+    responses = conn.perform_many([{'path': f'db/{i}'} for i in range(3)])
+    assert [resp.status for resp in responses] == [200] * 3
+
+
+def test_stream(server):
+    srv, conn = server
+    conn = PyCurlConn(f'http://127.0.0.1:{srv.server_port}', timeout=1)
+    started = time.perf_counter()
+    resp = conn.get('feed', stream=True)
+    assert resp.status == 200
+    arrived = []
+    for chunk in resp.iter_bytes():
+        arrived.append(time.perf_counter() - started)
+        # other requests of thread work while feed is read
+        assert conn.get('db/0').status == 200
+    # lines are not buffered until end of body, whole feed is longer than timeout
+    assert arrived[0] < 0.5
+    assert arrived[-1] > 1
+    assert resp.transfer.received == sum(len(json.dumps({'seq': i})) + 1 for i in range(3))
+
+
+def test_stream_stalled(server):
+    srv, _ = server
+    conn = PyCurlConn(f'http://127.0.0.1:{srv.server_port}', timeout=1)
+    resp = conn.get('feed-stalled', stream=True)
+    with pytest.raises(pycurl.error):
+        list(resp.iter_bytes())
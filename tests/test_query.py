@@ -0,0 +1,26 @@
+import json
+from pycouchdb.query import FindQuery, ViewQuery
+
+
+def test_find_query_options():
+    query = FindQuery()
+    query.selector = {'type': 'a'}
+    query.use_index = ['_design/idx', 'type']
+    query.update = False
+    query.execution_stats = True
+    query.bookmark = 'g1'
+    assert query.to_json() == {'selector': {'type': 'a'}, 'limit': 25, 'use_index': ['_design/idx', 'type'],
+                               'bookmark': 'g1', 'update': False, 'execution_stats': True}
+
+
+def test_view_query_string():
+    query = ViewQuery(start_key=['a', 1], end_key=['a', {}], group_level=2, reduce=True, update='lazy')
+    ret = query.to_query()
+    assert json.loads(ret['start_key']) == ['a', 1]
+    assert json.loads(ret['end_key']) == ['a', {}]
+    assert (ret['group_level'], ret['reduce'], ret['update']) == ('2', 'true', 'lazy')
+    assert ViewQuery(key='x').to_query() == {'key': '"x"'}
+
+
+def test_view_query_body():
+    assert ViewQuery(keys=[1, 2], include_docs=True).to_json() == {'keys': [1, 2], 'include_docs': True}
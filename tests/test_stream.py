@@ -0,0 +1,49 @@
+import json
+from pycouchdb.stream import RowParser, iter_rows, object_fields
+
+body = json.dumps({'total_rows': 3, 'offset': 0,
+                   'rows': [{'id': 'a', 'value': {'rev': '1-a'}},
+                            {'id': 'b,]', 'value': {'rev': '1-b', 'x': [1, {'y': '"}'}]}},
+                            {'id': 'c', 'value': None}]}).encode()
+
+
+def chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_rows_in_small_chunks():
+    for size in (1, 2, 7, len(body)):
+        meta = {}
+        rows = list(iter_rows(chunks(body, size), meta=meta))
+        assert [row['id'] for row in rows] == ['a', 'b,]', 'c']
+        assert meta == {'total_rows': 3, 'offset': 0}
+
+
+def test_rows_emitted_before_end():
+    parser = RowParser()
+    first = parser.feed(body[:body.index(b'"b,]"')])
+    assert first == [{'id': 'a', 'value': {'rev': '1-a'}}]
+
+
+def test_docs_with_bookmark():
+    data = b'{"docs":[{"_id":"1"},{"_id":"2"}],"bookmark":"g1A\\"x","warning":"no index"}'
+    meta = {}
+    docs = list(iter_rows(chunks(data, 3), keys=('docs',), meta=meta))
+    assert docs == [{'_id': '1'}, {'_id': '2'}]
+    assert meta == {'bookmark': 'g1A"x', 'warning': 'no index'}
+
+
+def test_top_level_array_raw():
+    rows = list(iter_rows([b'[{"ok":true} ,', b' {"id":"x"}', b']'], raw=True))
+    assert rows == [b'{"ok":true}', b'{"id":"x"}']
+
+
+def test_empty_rows():
+    assert list(iter_rows([b'{"rows": [ ], "total_rows": 0}'])) == []
+
+
+def test_object_fields():
+    raw = b'{"_id": "a\\"b", "_rev":"1-x", "v": {"x": [1, {"y": "}"}]}, "s": "a,b", "last": [1,2] }'
+    assert object_fields(raw, ['_id', '_rev']) == {'_id': b'"a\\"b"', '_rev': b'"1-x"'}
+    assert object_fields(raw, ['v', 'last', 's', 'missing']) == {
+        'v': b'{"x": [1, {"y": "}"}]}', 's': b'"a,b"', 'last': b'[1,2]'}